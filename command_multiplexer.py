@@ -0,0 +1,159 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Union
+
+# command priorities, lower values are served first
+STOP = 0
+QUERY = 1
+MOTION = 2
+
+
+def get_priority(method_name: str) -> int:
+    """
+    Get the default priority of a connection method.
+
+    :param method_name: name of the method
+    :return: STOP for commands stopping real-time control, QUERY for getters, MOTION for everything else
+    """
+    if method_name.startswith("realTime_stop"):
+        return STOP
+    if method_name.startswith("get"):
+        return QUERY
+    return MOTION
+
+
+class CommandMultiplexer:
+    """
+    Class to share one robot connection between several threads. A single thread owns the connection and serves
+    the submitted commands one at a time, so commands and replies of different callers never interleave.
+    Commands are served by priority and, within the same priority, in submission order. A command is never
+    interrupted: queries submitted during a motion are served as soon as it ends, before any motion still queued.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._serve, name="robot-io", daemon=True)
+        self._thread.start()
+
+    def submit(self, command: Union[str, Callable], *args, priority: int = None, **kwargs) -> Future:
+        """
+        Submit command to be run by the thread owning the connection.
+
+        :param command: name of a connection method, or function receiving the connection as first argument
+        :param args: arguments of the command
+        :param priority: STOP, QUERY or MOTION, by default taken from the method name (MOTION for functions)
+        :param kwargs: keyword arguments of the command
+        :return: future with the result of the command
+        """
+        if isinstance(command, str):
+            if priority is None:
+                priority = get_priority(command)
+            method_name = command
+
+            def command(connection, *method_args, **method_kwargs):
+                return getattr(connection, method_name)(*method_args, **method_kwargs)
+
+        elif priority is None:
+            priority = MOTION
+
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise OSError("Connection is closed")
+            self._queue.put((priority, next(self._counter), (future, command, args, kwargs)))
+        return future
+
+    def call(self, command: Union[str, Callable], *args, priority: int = None, **kwargs):
+        """
+        Run command and wait for its result.
+
+        :param command: name of a connection method, or function receiving the connection as first argument
+        :param args: arguments of the command
+        :param priority: STOP, QUERY or MOTION, by default taken from the method name (MOTION for functions)
+        :param kwargs: keyword arguments of the command
+        :return: result of the command
+        """
+        # commands issued from inside another command run straight away, waiting would block the connection
+        if threading.current_thread() is self._thread:
+            if isinstance(command, str):
+                return getattr(self._connection, command)(*args, **kwargs)
+            return command(self._connection, *args, **kwargs)
+        return self.submit(command, *args, priority=priority, **kwargs).result()
+
+    def __getattr__(self, name: str):
+        """
+        Expose connection methods as blocking calls, so the multiplexer can replace the connection.
+
+        :param name: name of the connection method
+        :return: function running the method through the queue
+        """
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if not callable(getattr(self._connection, name)):
+            raise AttributeError(f"{name} is not a command")
+
+        def method(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+
+        return method
+
+    def close(self) -> None:
+        """
+        Close the connection once the commands already submitted are served. Commands submitted afterwards fail.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            closing = Future()
+            self._queue.put((MOTION + 1, next(self._counter), (closing, lambda connection: connection.close(), (), {})))
+            self._queue.put((MOTION + 1, next(self._counter), None))
+        if threading.current_thread() is self._thread:
+            return
+        self._thread.join()
+        closing.result()
+
+    def abort(self) -> None:
+        """
+        Drop the connection at once, without waiting for the command being served. Commands still queued fail.
+        """
+        with self._lock:
+            self._closed = True
+            self._connection.abort()
+            while not self._queue.empty():
+                _, _, job = self._queue.get_nowait()
+                if job is not None and job[0].set_running_or_notify_cancel():
+                    job[0].set_exception(OSError("Connection was dropped"))
+            self._queue.put((MOTION + 1, next(self._counter), None))
+
+    def is_closed(self) -> bool:
+        """
+        Check if the connection was closed or dropped.
+
+        :return: True if no more commands are accepted
+        """
+        return self._closed
+
+    def _serve(self) -> None:
+        """
+        Serve submitted commands until the multiplexer is closed.
+        """
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            future, command, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = command(self._connection, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+from command_multiplexer import QUERY
+
+# time in seconds between heartbeats while the connection is idle
+HEARTBEAT_PERIOD = 0.5
+# time in seconds a heartbeat may take before the link is considered dead
+DEAD_LINK_TIMEOUT = 2.0
+# first and maximum time in seconds between reconnection attempts, doubled after each failure
+BACKOFF_START = 0.2
+BACKOFF_MAX = 5.0
+
+
+class ConnectionSupervisor:
+    """
+    Class to keep the connection with the robot alive. Heartbeats (a position request) are sent while the
+    connection is idle and their round trip time is measured. If a heartbeat fails or takes longer than
+    dead_link_timeout, the connection is dropped and reopened with exponential backoff.
+    Commands block the connection while they run, so a motion is never mistaken for a dead link: the timeout only
+    counts once the heartbeat itself is being served. A link dying during a command is detected by the socket
+    instead, whose keepalive fails the command once the link stays silent for dead_link_timeout, so the heartbeat is
+    served and fails in turn.
+    """
+
+    def __init__(self, robot, heartbeat_period: float = HEARTBEAT_PERIOD,
+                 dead_link_timeout: float = DEAD_LINK_TIMEOUT, backoff_start: float = BACKOFF_START,
+                 backoff_max: float = BACKOFF_MAX):
+        self.robot = robot
+        self.heartbeat_period = heartbeat_period
+        self.dead_link_timeout = dead_link_timeout
+        self.backoff_start = backoff_start
+        self.backoff_max = backoff_max
+
+        self.state = "up"
+        self.rtt = None
+        self.reconnections = 0
+        self.failed_attempts = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Start supervising the connection on a background thread.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._supervise, name="robot-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop supervising the connection.
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def get_status(self) -> dict:
+        """
+        Get status of the link.
+
+        :return: state ("up" or "reconnecting"), last round trip time in seconds, number of reconnections and
+        failed attempts since the link went down
+        """
+        return {"state": self.state, "rtt": self.rtt, "reconnections": self.reconnections,
+                "failed_attempts": self.failed_attempts}
+
+    def _supervise(self) -> None:
+        """
+        Send heartbeats while the link is up and reconnect when it goes down.
+        """
+        backoff = self.backoff_start
+        while not self._stop.wait(self.heartbeat_period if self.state == "up" else backoff):
+            if self.state == "up":
+                if not self._heartbeat():
+                    self.robot.drop_connection()
+                    self.state = "reconnecting"
+                    backoff = self.backoff_start
+                continue
+
+            # any failure, e.g. a garbled reply while reconnecting, is a failed attempt
+            try:
+                self.robot.reconnect()
+            except Exception:
+                self.failed_attempts += 1
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+            self.state = "up"
+            self.reconnections += 1
+            self.failed_attempts = 0
+
+    def _heartbeat(self) -> bool:
+        """
+        Send a heartbeat and measure its round trip time.
+
+        :return: True if the robot answered in time
+        """
+        connection = self.robot.connection
+        if connection is None or connection.is_closed():
+            return False
+
+        served_at = []
+
+        def heartbeat(robot_connection):
+            served_at.append(time.perf_counter())
+            # a closed connection answers with an empty reply instead of failing
+            if not robot_connection.getEEFPos():
+                raise OSError("No reply from the robot")
+
+        try:
+            future = connection.submit(heartbeat, priority=QUERY)
+        except OSError:
+            return False
+
+        # wait while other commands are served, the timeout starts once the heartbeat is sent
+        while True:
+            try:
+                future.result(timeout=self.heartbeat_period)
+                break
+            except TimeoutError:
+                if self._stop.is_set():
+                    return True
+                if served_at and time.perf_counter() - served_at[0] > self.dead_link_timeout:
+                    return False
+            except Exception:
+                # a failed or garbled reply, e.g. one that can not be parsed, means the link is dead
+                return False
+
+        self.rtt = time.perf_counter() - served_at[0]
+        return True
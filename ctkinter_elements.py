@@ -1,3 +1,6 @@
+import math
+from typing import Callable
+
 import customtkinter
 
 SMALL_Y_PAD = 5
@@ -212,6 +215,286 @@ class CTkBoxList(customtkinter.CTkScrollableFrame):
         delete.destroy()
 
 
+# Box list with the same up, down and delete options that only renders the rows inside the viewport (plus a small
+# overscan). Elements are kept as data and rendered into recycled rows with the given create and update functions
+class CTkVirtualBoxList(customtkinter.CTkFrame):
+    def __init__(self, master, create_row: Callable, update_row: Callable, row_height: int = 40, overscan: int = 2,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.items = []
+        self.create_row = create_row
+        self.update_row = update_row
+        self.row_height = row_height
+        self.overscan = overscan
+
+        # scrolled amount and height of the visible area
+        self._offset = 0
+        self._viewport_height = 0
+
+        # recycled rows (container, element, buttons), index and item currently rendered in each row
+        self._rows = []
+        self._row_index = []
+        self._row_item = []
+
+        # configure grid layout
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        # area where rows are placed
+        self.viewport = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=0, column=0, sticky="nsew")
+        self.viewport.bind("<Configure>", self._resize_event)
+
+        # scrollbar to move through the elements
+        self.scrollbar = customtkinter.CTkScrollbar(self, command=self._scrollbar_event)
+        self.scrollbar.grid(row=0, column=1, padx=SMALL_HALF_X_PAD, sticky="ns")
+
+        # scroll with the mouse wheel while the pointer is over the list, the wheel is only bound meanwhile so no
+        # global handler outlives the list
+        self._wheel_bindings = []
+        self.bind("<Enter>", lambda e: self._bind_mouse_wheel(), add="+")
+        self.bind("<Leave>", self._leave_event, add="+")
+        self.bind("<Destroy>", lambda e: self._unbind_mouse_wheel() if e.widget is self else None, add="+")
+
+    def set_items(self, items: list) -> None:
+        """
+        Replace every element of the box list.
+
+        :param items: elements to render
+        """
+        self.items = list(items)
+        self.refresh()
+
+    def insert_item(self, item) -> None:
+        """
+        Add new element at the end of the box list and scroll to it.
+
+        :param item: element to add
+        """
+        self.items.append(item)
+        self._offset = self._max_offset()
+        self.refresh()
+
+    def update_item(self, index: int, item, refresh: bool = True) -> None:
+        """
+        Replace element at given index. Only its row is rendered again, if visible.
+
+        :param index: index of the element
+        :param item: new element
+        :param refresh: if False the viewport is only updated on the next refresh
+        """
+        self.items[index] = item
+        if refresh:
+            self.refresh()
+
+    def splice_items(self, start: int, end: int, items: list, refresh: bool = True) -> None:
+        """
+        Replace elements from index start (inclusive) to end (exclusive) by the given elements.
+        Used to insert (start == end) and delete (empty items) elements.
+
+        :param start: index of the first element to replace
+        :param end: index after the last element to replace
+        :param items: new elements
+        :param refresh: if False the viewport is only updated on the next refresh
+        """
+        self.items[start:end] = items
+        if refresh:
+            self.refresh()
+
+    def reset(self) -> None:
+        """
+        Reset box list. Removes every element, rows are kept to be reused.
+        """
+        self.items = []
+        self._offset = 0
+        self.refresh()
+
+    def _up_event(self, index: int) -> None:
+        """
+        Swap element with the previous element.
+
+        :param index: index of the element
+        """
+        if index > 0:
+            self.items[index - 1], self.items[index] = self.items[index], self.items[index - 1]
+            self.refresh()
+
+    def _down_event(self, index: int) -> None:
+        """
+        Swap element with the next element.
+
+        :param index: index of the element
+        """
+        if index < len(self.items) - 1:
+            self.items[index + 1], self.items[index] = self.items[index], self.items[index + 1]
+            self.refresh()
+
+    def delete_element(self, index: int) -> None:
+        """
+        Delete element with a given index.
+
+        :param index: index of the element to delete
+        """
+        self.items.pop(index)
+        self._offset = min(self._offset, self._max_offset())
+        self.refresh()
+
+    def _max_offset(self) -> int:
+        """
+        Get the maximum amount the list can be scrolled.
+
+        :return: maximum offset
+        """
+        return max(0, len(self.items) * self.row_height - self._viewport_height)
+
+    def _scroll_to(self, offset: float) -> None:
+        """
+        Scroll to the given offset.
+
+        :param offset: amount scrolled from the top
+        """
+        offset = int(min(max(0, offset), self._max_offset()))
+        if offset != self._offset:
+            self._offset = offset
+            self.refresh()
+
+    def _scrollbar_event(self, *args) -> None:
+        """
+        Handle scrollbar commands ("moveto", fraction) and ("scroll", amount, "units" or "pages").
+        """
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self.items) * self.row_height)
+        elif args[0] == "scroll":
+            step = self._viewport_height if args[2] == "pages" else self.row_height
+            self._scroll_to(self._offset + int(args[1]) * step)
+
+    def _bind_mouse_wheel(self) -> None:
+        """
+        Bind the mouse wheel of the whole application to the list.
+        """
+        if self._wheel_bindings:
+            return
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self._wheel_bindings.append((sequence, self.bind_all(sequence, self._mouse_wheel_event, add="+")))
+
+    def _unbind_mouse_wheel(self) -> None:
+        """
+        Remove the mouse wheel bindings of the list, keeping the bindings of other widgets.
+        """
+        for sequence, funcid in self._wheel_bindings:
+            script = self.tk.call("bind", "all", sequence)
+            self.tk.call("bind", "all", sequence, "\n".join(line for line in script.split("\n") if funcid not in line))
+            self.deletecommand(funcid)
+        self._wheel_bindings = []
+
+    def _leave_event(self, event) -> None:
+        """
+        Unbind the mouse wheel once the pointer leaves the list, moving onto a row of the list does not count.
+        """
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self)):
+            self._unbind_mouse_wheel()
+
+    def _mouse_wheel_event(self, event) -> None:
+        """
+        Scroll one row per mouse wheel step if the pointer is over the list.
+        """
+        if not str(event.widget).startswith(str(self.viewport)):
+            return
+        if event.num == 5 or event.delta < 0:
+            self._scroll_to(self._offset + self.row_height)
+        elif event.num == 4 or event.delta > 0:
+            self._scroll_to(self._offset - self.row_height)
+
+    def _resize_event(self, event) -> None:
+        """
+        Create rows to fill the new viewport height.
+        """
+        self._viewport_height = self._reverse_widget_scaling(event.height)
+        number_of_rows = math.ceil(self._viewport_height / self.row_height) + self.overscan
+        if number_of_rows > len(self._rows):
+            while len(self._rows) < number_of_rows:
+                self._generate_row()
+
+            # row assigned to each element changed, render everything again
+            self._row_item = [None] * len(self._rows)
+            for container, _, _ in self._rows:
+                container.place_forget()
+        self._offset = min(self._offset, self._max_offset())
+        self.refresh()
+
+    def _generate_row(self) -> None:
+        """
+        Generate a recyclable row with an element and the buttons to manage it.
+        """
+        row = len(self._rows)
+
+        # container of the element and buttons
+        container = customtkinter.CTkFrame(self.viewport, height=self.row_height, fg_color="transparent")
+        container.grid_columnconfigure(0, weight=1)
+        container.grid_rowconfigure(0, weight=1)
+
+        element = self.create_row(container)
+        element.grid(row=0, column=0, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
+
+        # button to swap element with the previous
+        up_button = customtkinter.CTkButton(container, width=28, height=28, text=u"\u2191",
+                                            command=lambda r=row: self._up_event(self._row_index[r]))
+        up_button.grid(row=0, column=1, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
+
+        # button to swap element with the next
+        down_button = customtkinter.CTkButton(container, width=28, height=28, text=u"\u2193",
+                                              command=lambda r=row: self._down_event(self._row_index[r]))
+        down_button.grid(row=0, column=2, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
+
+        # button to delete element
+        delete_button = customtkinter.CTkButton(container, width=28, height=28, text="X", fg_color=RED_COLORS,
+                                                hover_color=RED_HOVER,
+                                                command=lambda r=row: self.delete_element(self._row_index[r]))
+        delete_button.grid(row=0, column=3, padx=SMALL_X_PAD, pady=SMALL_Y_PAD)
+
+        self._rows.append((container, element, (up_button, down_button, delete_button)))
+        self._row_index.append(None)
+        self._row_item.append(None)
+
+    def refresh(self) -> None:
+        """
+        Render the elements inside the viewport. Each element always uses the same row while visible, so scrolling
+        only renders the rows that come into view and unchanged elements are not rendered again.
+        """
+        if not self._rows:
+            return
+
+        first = self._offset // self.row_height
+        last = min(len(self.items), first + len(self._rows))
+        visible_rows = set()
+        for index in range(first, last):
+            row = index % len(self._rows)
+            visible_rows.add(row)
+            container, element, _ = self._rows[row]
+            item = self.items[index]
+
+            # render element only if the row displays something else
+            if self._row_item[row] != item:
+                self.update_row(element, item)
+                self._row_item[row] = item
+            self._row_index[row] = index
+            container.place(x=0, y=index * self.row_height - self._offset, relwidth=1.0, height=self.row_height)
+
+        # hide rows without element
+        for row, (container, _, _) in enumerate(self._rows):
+            if row not in visible_rows and self._row_index[row] is not None:
+                container.place_forget()
+                self._row_index[row] = None
+
+        # update scrollbar
+        total = len(self.items) * self.row_height
+        if total > 0:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + self._viewport_height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+
 # 2 button input window
 class CTkOkCancel(customtkinter.CTkToplevel):
 
@@ -1,4 +1,5 @@
 from typing import Union
+import hashlib
 import os
 import json
 
@@ -18,6 +19,17 @@ class FileManager:
         """
         return os.path.exists(os.path.join(self.path, f"{file_name}.json"))
 
+    def list_files(self) -> list:
+        """
+        Get names of every file in the directory.
+
+        :return: sorted list of file names without extension
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(entry.name[:-len(".json")] for entry in os.scandir(self.path)
+                      if entry.is_file() and entry.name.endswith(".json"))
+
     def save_file(self, file_name: str, file_data: Union[list, dict]) -> None:
         """
         Save given data to the specified file.
@@ -42,6 +54,20 @@ class FileManager:
         else:
             raise FileNotFoundError(f"There is no file {file_name}.json")
 
+    def load_file_and_hash(self, file_name: str) -> tuple[Union[list, dict], str]:
+        """
+        Load file and compute the hash of its content.
+
+        :param file_name: name of the file to load from
+        :return: data read on the specified file and sha256 digest of the file's content
+        """
+        if self.file_exists(file_name):
+            with open(os.path.join(self.path, f"{file_name}.json"), "rb") as file:
+                content = file.read()
+            return json.loads(content), hashlib.sha256(content).hexdigest()
+        else:
+            raise FileNotFoundError(f"There is no file {file_name}.json")
+
     def delete_file(self, file_name: str) -> None:
         """
         Delete file with given name.
@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import time
+
+# reference for the startup report, taken before any heavy import
+STARTUP_START = time.perf_counter()
+
 import customtkinter
 
 from program_data import ProgramData
@@ -17,6 +22,11 @@ BIG_HALF_Y_PAD = (20, 0)
 BIG_HALF_X_PAD = (30, 0)
 BIG_X_PAD = (30, 30)
 
+# maximum time in seconds from startup until the first frame is drawn
+TIME_TO_FIRST_FRAME_BUDGET = 1.5
+# time in seconds between checks that an aborted program ended, while closing
+SHUTDOWN_POLL_PERIOD = 0.05
+
 
 class App(customtkinter.CTk):
     def __init__(self, robotic_system: RoboticSystem):
@@ -51,6 +61,29 @@ class App(customtkinter.CTk):
 
         self.message_display.grid(row=2, column=1, columnspan=2, padx=BIG_X_PAD, pady=BIG_Y_PAD, sticky="nsew")
 
+    def report_startup(self, checkpoints: list) -> None:
+        """
+        Report the duration of each startup phase once the first frame is drawn.
+        Informs the user if the time-to-first-frame budget is exceeded.
+
+        :param checkpoints: list of (phase name, time.perf_counter() at the end of the phase)
+        """
+        self.update_idletasks()
+        checkpoints = checkpoints + [("first frame", time.perf_counter())]
+
+        print("Startup report:")
+        previous = STARTUP_START
+        for phase, timestamp in checkpoints:
+            print(f"  {phase:<15} {(timestamp - previous) * 1000:8.1f} ms")
+            previous = timestamp
+
+        time_to_first_frame = checkpoints[-1][1] - STARTUP_START
+        print(f"  {'total':<15} {time_to_first_frame * 1000:8.1f} ms "
+              f"(budget {TIME_TO_FIRST_FRAME_BUDGET * 1000:.0f} ms)")
+        if time_to_first_frame > TIME_TO_FIRST_FRAME_BUDGET:
+            self.message_display.display_message(f"Startup took {time_to_first_frame:.2f} s, above the budget of "
+                                                 f"{TIME_TO_FIRST_FRAME_BUDGET:.2f} s")
+
     def destroy(self):
         """
         Handle app closing event. Informs if there are unsaved elements.
@@ -62,16 +95,25 @@ class App(customtkinter.CTk):
             if not exit_dialog.get_input():
                 return
 
-        # Stop connection if open
+        # Abort the program being run and wait for it to end, the current move ends first, then stop connection if
+        # open
+        if self.robotic_system.is_program_running():
+            self.robotic_system.abort_program()
+            while self.robotic_system.is_program_running():
+                time.sleep(SHUTDOWN_POLL_PERIOD)
         if self.robotic_system.is_robot_connected():
             self.robotic_system.stop_robot_connection()
         super().destroy()
 
 
 if __name__ == '__main__':
+    startup_checkpoints = [("imports", time.perf_counter())]
     robot = RobotCommunication("tools.json")
     task_data = TaskData("task_data")
     program_data = ProgramData("program_data")
     robotic_system = RoboticSystem(robot, task_data, program_data)
+    startup_checkpoints.append(("data", time.perf_counter()))
     app = App(robotic_system)
+    startup_checkpoints.append(("window", time.perf_counter()))
+    app.after_idle(app.report_startup, startup_checkpoints)
     app.mainloop()
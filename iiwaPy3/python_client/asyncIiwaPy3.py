@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio client for the KUKA Sunrise Toolbox server, with the same surface as iiwaPy3.
+
+Every method is a coroutine. Commands are serialized on the connection by a lock, so several tasks can share one
+client. Motions return once the robot confirms the end of the motion, every reply is awaited with a timeout and
+any call can be cancelled. Cancelling a motion does not stop the robot, it only stops waiting for it: the replies
+still due are discarded before the next command is sent, so the connection stays in sync.
+"""
+import asyncio
+import math
+
+from .GeneralPurpose import getDoubleFromString
+
+# default time in seconds to wait for a reply, motions wait for their confirmation without limit
+REPLY_TIMEOUT = 5.0
+
+
+def _format_frame(x):
+    """
+    Format values the way the server expects them, rounded up to 0.1 um (or 0.1 mrad).
+
+    :param x: values to format
+    :return: values terminated by underscores
+    """
+    num = 10000
+    return ''.join(str(math.ceil(value * num) / num) + '_' for value in x)
+
+
+def _check_length(name, values, size):
+    if len(values) != size:
+        raise ValueError(f'{name} shall be an array of {size} elements')
+
+
+def _rotate(theta, r, s, n, c):
+    cos_ = math.cos(theta)
+    sin_ = math.sin(theta)
+    return [r * cos_ * s[i] + r * sin_ * n[i] + c[i] for i in range(3)]
+
+
+class asyncIiwaPy3:
+
+    def __init__(self, reader, writer, trans=(0, 0, 0, 0, 0, 0), timeout=REPLY_TIMEOUT):
+        self.reader = reader
+        self.writer = writer
+        self.TCPtrans = trans
+        self.timeout = timeout
+        self._lock = asyncio.Lock()
+
+        # replies of cancelled or timed out commands that are still to arrive
+        self._unread = 0
+
+    @classmethod
+    async def connect(cls, ip, trans=(0, 0, 0, 0, 0, 0), port=30001, timeout=REPLY_TIMEOUT):
+        """
+        Open a connection and mount the TCP transform if one is given.
+
+        :param ip: ip of the robot
+        :param trans: TCP transform in the flange frame (x, y, z, alfa, beta, gamma), in mm and rad
+        :param port: port of the server
+        :param timeout: default time in seconds to wait for a reply
+        :return: connected client
+        """
+        _check_length('TCP transform', trans, 6)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        client = cls(reader, writer, trans, timeout)
+        if any(num != 0 for num in trans):
+            reply = await client._command('TFtrans_' + '_'.join(str(num) for num in trans))
+            if reply.find('done') == -1:
+                await client.close()
+                raise OSError('Could not mount the specified TCP transform')
+        return client
+
+    async def close(self):
+        """
+        Ask the server to end the session and wait for the socket to close.
+        """
+        async with self._lock:
+            try:
+                self.writer.write(b'end\n')
+                await self.writer.drain()
+            except OSError:
+                pass
+            self.writer.close()
+            try:
+                await asyncio.wait_for(self.writer.wait_closed(), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+    async def _read_reply(self, timeout):
+        reply = await asyncio.wait_for(self.reader.readline(), timeout)
+        if not reply:
+            raise ConnectionError('Connection closed by the robot')
+        return reply.decode('utf-8')
+
+    async def _exchange(self, command, replies=1, timeout=None):
+        """
+        Send command and read its replies, the caller holds the lock.
+
+        :param command: command without line terminator
+        :param replies: number of replies the command produces
+        :param timeout: time in seconds to wait for the last reply, the others use the default timeout
+        :return: last reply
+        """
+        # discard replies of commands that were cancelled, e.g. the confirmation of a motion still running
+        while self._unread:
+            await self._read_reply(None)
+            self._unread -= 1
+
+        pending = replies
+        try:
+            self.writer.write((command + '\n').encode())
+            await self.writer.drain()
+            reply = ''
+            while pending:
+                reply = await self._read_reply(timeout if pending == 1 else self.timeout)
+                pending -= 1
+            return reply
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self._unread += pending
+            raise
+
+    async def _command(self, command, replies=1, timeout=-1):
+        """
+        Send command and wait for its last reply.
+
+        :param command: command without line terminator
+        :param replies: number of replies the command produces
+        :param timeout: time in seconds to wait for the last reply, None to wait without limit, -1 for the default
+        :return: last reply
+        """
+        if timeout == -1:
+            timeout = self.timeout
+        async with self._lock:
+            return await self._exchange(command, replies, timeout)
+
+    async def _motion(self, setup, motion, timeout=None):
+        """
+        Send the commands of a blocking motion and wait for its confirmation.
+
+        :param setup: commands that prepare the motion
+        :param motion: command that starts the motion
+        :param timeout: time in seconds to wait for the end of the motion, None to wait without limit
+        """
+        async with self._lock:
+            for command in setup:
+                await self._exchange(command, timeout=self.timeout)
+            # the motion is acknowledged first and confirmed once finished
+            await self._exchange(motion, replies=2, timeout=timeout)
+
+    async def _get(self, command, size):
+        return getDoubleFromString(await self._command(command), size)
+
+    async def send(self, data):
+        self.writer.write(data.encode())
+        await self.writer.drain()
+
+    # PTP motion
+    """
+    Joint space motion
+    """
+
+    async def movePTPJointSpace(self, jpos, relVel, timeout=None):
+        _check_length('Joints positions', jpos, 7)
+        _check_length('Relative velocity', relVel, 1)
+        await self._motion(['jRelVel_' + str(relVel[0]) + '_', 'jp_' + _format_frame(jpos)], 'doPTPinJS', timeout)
+
+    async def movePTPHomeJointSpace(self, relVel, timeout=None):
+        await self.movePTPJointSpace([0, 0, 0, 0, 0, 0, 0], relVel, timeout)
+
+    async def movePTPTransportPositionJointSpace(self, relVel, timeout=None):
+        jpos = [0, 0, 0, 25 * math.pi / 180, 0, 90 * math.pi / 180, 0]
+        await self.movePTPJointSpace(jpos, relVel, timeout)
+
+    """
+    Cartesian linear  motion
+    """
+
+    async def movePTPLineEEF(self, pos, vel, timeout=None):
+        _check_length('Position', pos, 6)
+        _check_length('Velocity', vel, 1)
+        await self._motion(['jRelVel_' + str(vel[0]) + '_', 'cArtixanPosition_' + _format_frame(pos[:3]) +
+                            ''.join(str(value) + '_' for value in pos[3:])], 'doPTPinCS', timeout)
+
+    async def movePTPLineEefRelBase(self, pos, vel, timeout=None):
+        _check_length('Position', pos, 3)
+        _check_length('Velocity', vel, 1)
+        await self._motion(['jRelVel_' + str(vel[0]) + '_', 'cArtixanPosition_' + _format_frame(pos) + '0_0_0_'],
+                           'doPTPinCSRelBase', timeout)
+
+    async def movePTPLineEefRelEef(self, pos, vel, timeout=None):
+        _check_length('Position', pos, 3)
+        _check_length('Velocity', vel, 1)
+        await self._motion(['jRelVel_' + str(vel[0]) + '_', 'cArtixanPosition_' + _format_frame(pos) + '0_0_0_'],
+                           'doPTPinCSRelEEF', timeout)
+
+    """
+    Circular motion
+    """
+
+    async def movePTPCirc1OrintationInter(self, f1, f2, vel, timeout=None):
+        _check_length('The first frame', f1, 6)
+        _check_length('The second frame', f2, 6)
+        _check_length('Relative velocity', vel, 1)
+        await self._motion(['jRelVel_' + str(vel[0]) + '_', 'cArtixanPositionCirc1_' + _format_frame(f1),
+                            'cArtixanPositionCirc2_' + _format_frame(f2)], 'doPTPinCSCircle1_', timeout)
+
+    async def movePTPArc_AC(self, theta, c, k, vel, timeout=None):
+        _check_length('Angle of an arc', theta, 1)
+        _check_length('Center of circle', c, 3)
+        _check_length('Orientation vector', k, 3)
+        _check_length('Relative velocity', vel, 1)
+        pos = await self.getEEFPos()
+        r = math.sqrt(sum((c[i] - pos[i]) ** 2 for i in range(3)))
+        norm_k = math.sqrt(sum(value ** 2 for value in k))
+        if r == 0:
+            raise ValueError('radius can not be zero')
+        if theta[0] == 0:
+            raise ValueError('angle can not be zero')
+        if norm_k == 0:
+            raise ValueError('Norm of direction vector k shall not be zero')
+        k = [value / norm_k for value in k]
+        s = [(pos[i] - c[i]) / r for i in range(3)]
+        n = [(k[1] * s[2] - k[2] * s[1]), (k[2] * s[0] - k[0] * s[2]), (k[0] * s[1] - k[1] * s[0])]
+        c1 = _rotate(theta[0] / 2, r, s, n, c) + list(pos[3:6])
+        c2 = _rotate(theta[0], r, s, n, c) + list(pos[3:6])
+        await self.movePTPCirc1OrintationInter(c1, c2, vel, timeout)
+
+    async def movePTPArcXY_AC(self, theta, c, vel, timeout=None):
+        _check_length('Center of rotation', c, 2)
+        pos = await self.getEEFPos()
+        await self.movePTPArc_AC(theta, [c[0], c[1], pos[2]], [0, 0, 1], vel, timeout)
+
+    async def movePTPArcXZ_AC(self, theta, c, vel, timeout=None):
+        _check_length('Center of rotation', c, 2)
+        pos = await self.getEEFPos()
+        await self.movePTPArc_AC(theta, [c[0], pos[1], c[1]], [0, 1, 0], vel, timeout)
+
+    async def movePTPArcYZ_AC(self, theta, c, vel, timeout=None):
+        _check_length('Center of rotation', c, 2)
+        pos = await self.getEEFPos()
+        await self.movePTPArc_AC(theta, [pos[0], c[0], c[1]], [1, 0, 0], vel, timeout)
+
+    # realtime motion control
+    async def realTime_stopImpedanceJoints(self):
+        await self._command('stopDirectServoJoints')
+
+    async def realTime_startDirectServoCartesian(self):
+        await self._command('stDcEEf_')
+
+    async def realTime_stopDirectServoCartesian(self):
+        await self._command('stopDirectServoJoints')
+
+    async def realTime_stopDirectServoJoints(self):
+        await self._command('stopDirectServoJoints')
+
+    async def realTime_startDirectServoJoints(self):
+        await self._command('startDirectServoJoints')
+
+    async def realTime_startImpedanceJoints(self, weightOfTool, cOMx, cOMy, cOMz, cStiness, rStifness, nStifness):
+        values = (weightOfTool, cOMx, cOMy, cOMz, cStiness, rStifness, nStifness)
+        await self._command('startSmartImpedanceJoints_' + ''.join(str(value) + '_' for value in values))
+
+    # Joint space servo command
+    async def sendJointsPositions(self, x):
+        _check_length('Joint positions', x, 7)
+        await self._command('jp_' + _format_frame(x))
+
+    async def sendJointsPositionsGetMTorque(self, x):
+        _check_length('Joint positions', x, 7)
+        return getDoubleFromString(await self._command('jpMT_' + _format_frame(x)), 7)
+
+    async def sendJointsPositionsGetExTorque(self, x):
+        _check_length('Joint positions', x, 7)
+        return getDoubleFromString(await self._command('jpExT_' + _format_frame(x)), 7)
+
+    async def sendJointsPositionsGetActualEEFpos(self, x):
+        _check_length('Joint positions', x, 7)
+        return getDoubleFromString(await self._command('jpEEfP_' + _format_frame(x)), 6)
+
+    async def sendJointsPositionsGetEEF_Force_rel_EEF(self, x):
+        _check_length('Joint positions', x, 7)
+        return getDoubleFromString(await self._command('DcSeCarEEfFrelEEF_' + _format_frame(x)), 6)
+
+    async def sendJointsPositionsGetActualJpos(self, x):
+        _check_length('Joint positions', x, 7)
+        return getDoubleFromString(await self._command('jpJP_' + _format_frame(x)), 7)
+
+    # Crtesian space servo command
+    async def _sendEEfPosition(self, cmd, x, size):
+        _check_length('EEF position', x, 6)
+        # micro-meter accuracy for the position, the orientation is sent as it is
+        reply = await self._command(cmd + ''.join(str(math.ceil(value * 1000) / 1000) + '_' for value in x[:3]) +
+                                    ''.join(str(value) + '_' for value in x[3:]))
+        return getDoubleFromString(reply, size)
+
+    async def sendEEfPosition(self, x):
+        _check_length('EEF position', x, 6)
+        await self._command('DcSeCarW_' + _format_frame(x[:3]) + ''.join(str(value) + '_' for value in x[3:]))
+
+    async def sendEEfPositionGetExTorque(self, x):
+        return await self._sendEEfPosition('DcSeCarExT_', x, 7)
+
+    async def sendEEfPositionGetActualEEFpos(self, x):
+        return await self._sendEEfPosition('DcSeCarEEfP_', x, 6)
+
+    async def sendEEfPositionGetActualJpos(self, x):
+        return await self._sendEEfPosition('DcSeCarJP_', x, 7)
+
+    async def sendEEfPositionGetEEF_Force_rel_EEF(self, x):
+        return await self._sendEEfPosition('DcSeCarEEfP_', x, 6)
+
+    async def sendEEfPositionGetMTorque(self, x):
+        return await self._sendEEfPosition('DcSeCarMT_', x, 7)
+
+    """
+    Precise hand guiding
+    """
+
+    async def preciseHandGuiding(self, weight_tool, centre_mass, timeout=None):
+        _check_length('Centre of mass', centre_mass, 3)
+        centre_mass = [value / 1000 for value in centre_mass]
+        if math.sqrt(sum(value ** 2 for value in centre_mass)) > 0.5:
+            raise ValueError('Centre of mass must not have a norm bigger than 500 mm')
+        num = 10000
+        values = [-1 * weight_tool] + centre_mass
+
+        # the reply arrives once the user terminates hand guiding
+        reply = await self._command('preciseHandGuiding1_' + '_'.join(str(math.ceil(value * num) / num)
+                                                                      for value in values), timeout=timeout)
+        if reply != 'done\n':
+            raise OSError('Unexpected error occurred while hand guiding')
+
+    # getters
+    async def getEEFPos(self):
+        return await self._get('Eef_pos', 6)
+
+    async def getEEF_Force(self):
+        return await self._get('Eef_force', 3)
+
+    async def getEEFCartizianPosition(self):
+        return await self._get('Eef_pos', 3)
+
+    async def getEEF_Moment(self):
+        return await self._get('Eef_moment', 3)
+
+    async def getJointsPos(self):
+        return await self._get('getJointsPositions', 7)
+
+    async def getJointsExternalTorques(self):
+        return await self._get('Torques_ext_J', 7)
+
+    async def getJointsMeasuredTorques(self):
+        return await self._get('Torques_m_J', 7)
+
+    async def getMeasuredTorqueAtJoint(self, x):
+        if x not in range(1, 8):
+            raise ValueError('Joint index shall be an integer from 1 to 7')
+        return (await self.getJointsMeasuredTorques())[x - 1]
+
+    async def getEEFCartizianOrientation(self):
+        return (await self.getEEFPos())[3:6]
+
+    # get pin states
+    async def _getPinState(self, pin):
+        return float(await self._command('getPin' + str(pin)))
+
+    async def getPin3State(self):
+        return await self._getPinState(3)
+
+    async def getPin4State(self):
+        return await self._getPinState(4)
+
+    async def getPin10State(self):
+        return await self._getPinState(10)
+
+    async def getPin13State(self):
+        return await self._getPinState(13)
+
+    async def getPin16State(self):
+        return await self._getPinState(16)
+
+    # setters
+    async def setBlueOff(self):
+        await self._command('blueOff')
+
+    async def setBlueOn(self):
+        await self._command('blueOn')
+
+    async def setPin1Off(self):
+        await self._command('pin1off')
+
+    async def setPin1On(self):
+        await self._command('pin1on')
+
+    async def setPin2Off(self):
+        await self._command('pin2off')
+
+    async def setPin2On(self):
+        await self._command('pin2on')
+
+    async def setPin11Off(self):
+        await self._command('pin11off')
+
+    async def setPin11On(self):
+        await self._command('pin11on')
+
+    async def setPin12Off(self):
+        await self._command('pin12off')
+
+    async def setPin12On(self):
+        await self._command('pin12on')
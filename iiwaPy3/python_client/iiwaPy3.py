@@ -11,12 +11,12 @@ class iiwaPy3:
     realtime = 0
     generalPurpose = 0
 
-    def __init__(self, ip, trans=(0, 0, 0, 0, 0, 0)):
-        print('This is a python3 wrapper for the KUKA Sunrise Toolbox')
-        print('For more info visit:')
-        print('https://github.com/Modi1987/KST-Kuka-Sunrise-Toolbox')
-        port = 30001
-        self.soc = mySock((ip, port), trans)
+    def __init__(self, ip, trans=(0, 0, 0, 0, 0, 0), port=30001, verbose=True, link_timeout=None):
+        if verbose:
+            print('This is a python3 wrapper for the KUKA Sunrise Toolbox')
+            print('For more info visit:')
+            print('https://github.com/Modi1987/KST-Kuka-Sunrise-Toolbox')
+        self.soc = mySock((ip, port), trans, verbose, link_timeout=link_timeout)
         self.set = Setters(self.soc)
         self.get = Getters(self.soc)
         self.sender = Senders(self.soc)
@@ -27,6 +27,9 @@ class iiwaPy3:
     def close(self):
         self.soc.close()
 
+    def abort(self):
+        self.soc.abort()
+
     def send(self, data):
         self.soc.send(data)
 
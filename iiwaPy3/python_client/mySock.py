@@ -4,8 +4,15 @@ Created on Mon Mar 26 17:21:02 2018
 Updated on Mon Oct 21 15:51:03 2019
 @author: Mohammad SAFEEA
 """
+import math
 import socket
-import time
+
+# time in seconds allowed for the server to accept the connection and answer the readiness probe
+READY_TIMEOUT = 5.0
+# time in seconds the link may stay silent before keepalive probes are sent
+KEEPALIVE_IDLE = 1
+# time in seconds allowed for the server to close its side of the connection after the end command
+CLOSE_TIMEOUT = 1.0
 
 
 class mySock:
@@ -13,7 +20,8 @@ class mySock:
       - coded for clarity, not efficiency
     '''
 
-    def __init__(self, tup, trans=(0, 0, 0, 0, 0, 0)):
+    def __init__(self, tup, trans=(0, 0, 0, 0, 0, 0), verbose=True, ready_timeout=READY_TIMEOUT, link_timeout=None):
+        self.verbose = verbose
         try:
             LENGTH = len(trans)
         except:
@@ -24,11 +32,13 @@ class mySock:
             print('Program terminated')
             return
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.sock.connect(tup)
-        except:
-            print('Error, could not establish a connection to the robot')
-        time.sleep(1)
+            self.sock = socket.create_connection(tup, timeout=ready_timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if link_timeout is not None:
+                self.setLinkTimeout(link_timeout)
+        except OSError:
+            raise OSError('Error, could not establish a connection to the robot')
+        self.waitUntilReady(ready_timeout)
         # self.buff = StringIO.StringIO(2048)  
         # Update the transform of the TCP if one is specified
         flag = False
@@ -37,16 +47,18 @@ class mySock:
                 flag = True
                 break
         if not flag:
-            print('No TCP transform in Flange Frame is defined,')
-            print('The following (default) TCP transform is utilized')
-            print(trans)
+            if self.verbose:
+                print('No TCP transform in Flange Frame is defined,')
+                print('The following (default) TCP transform is utilized')
+                print(trans)
             return
         else:
             # Rrint info about the current operation
-            print('Trying to mount the following TCP transform:')
-            stringTuple = ('x (mm)', 'y (mm)', 'z (mm)', 'alfa (rad)', 'beta (rad)', 'gamma (rad)')
-            for i in range(6):
-                print(stringTuple[i] + ': ' + str(trans[i]))
+            if self.verbose:
+                print('Trying to mount the following TCP transform:')
+                stringTuple = ('x (mm)', 'y (mm)', 'z (mm)', 'alfa (rad)', 'beta (rad)', 'gamma (rad)')
+                for i in range(6):
+                    print(stringTuple[i] + ': ' + str(trans[i]))
             # Try to mount the TCP
             daMessage = 'TFtrans'
             for num in trans:
@@ -62,7 +74,7 @@ class mySock:
                 # print(returnAckNack)
                 if returnAckNack.find('done') == -1:
                     print('Error could not mount the specified Tool')
-                else:
+                elif self.verbose:
                     print('Specified TCP transform mounted successfully')
             except:
                 print('Error, (exception) could not mount the specified TCP')
@@ -77,8 +89,57 @@ class mySock:
         confirmationMessage = daBytes.decode('utf-8')
         return confirmationMessage
 
+    def waitUntilReady(self, timeout):
+        # the server is ready once it answers a position request, instead of waiting a fixed time
+        self.sock.settimeout(timeout)
+        try:
+            self.send('Eef_pos\n')
+            if not self.receive():
+                raise OSError('Error, the robot closed the connection')
+        except OSError:
+            self.sock.close()
+            raise OSError('Error, the robot did not answer')
+        # motions block for as long as they take, replies are awaited without limit
+        self.sock.settimeout(None)
+
+    def setLinkTimeout(self, timeout):
+        # replies are awaited without limit, so a link dying silently is detected by the kernel instead:
+        # keepalive probes are sent once the link is silent and unanswered probes or data fail the socket
+        interval = 1
+        count = max(math.ceil(timeout / interval), 1)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+        elif hasattr(socket, 'TCP_KEEPALIVE'):
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, KEEPALIVE_IDLE)
+        if hasattr(socket, 'TCP_KEEPINTVL'):
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+        if hasattr(socket, 'TCP_KEEPCNT'):
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+        if hasattr(socket, 'TCP_USER_TIMEOUT'):
+            # bounds unacknowledged data and, with keepalive, unanswered probes to the timeout itself
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(timeout * 1000))
+        if hasattr(socket, 'SIO_KEEPALIVE_VALS'):
+            self.sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, KEEPALIVE_IDLE * 1000, interval * 1000))
+
     def close(self):
         endCommand = 'end\n'
-        self.send(endCommand)
-        time.sleep(1)  # sleep for one seconds
+        try:
+            self.send(endCommand)
+            self.sock.shutdown(socket.SHUT_WR)
+            # wait until the server closes its side, the end command has then been processed
+            self.sock.settimeout(CLOSE_TIMEOUT)
+            while self.sock.recv(1024):
+                pass
+        except OSError:
+            pass
+        finally:
+            self.sock.close()
+
+    def abort(self):
+        # drop the connection at once, unblocking any thread waiting for a reply
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.sock.close()
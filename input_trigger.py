@@ -0,0 +1,124 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from io_image import INPUT_PINS
+
+# times per second the input is read while waiting
+POLL_RATE = 20
+
+# how a wait ended
+INPUT = "input"
+TRIGGER = "trigger"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+class InputTrigger:
+    """
+    Class to wait for the signal to continue a program, from a digital input of the robot, such as a foot pedal or
+    a PLC output, or from a local trigger set by another thread. The input is read at a fixed rate by requests
+    served by the connection thread between other commands, and the local trigger ends the wait at once.
+    """
+
+    def __init__(self, submit: Callable[..., Future], pin: int = None, state: bool = True, edge: bool = False,
+                 rate: float = POLL_RATE, timeout: float = None):
+        """
+        :param submit: function submitting a connection command to the thread owning the connection
+        :param pin: number of the input pin, if None only the local trigger ends a wait
+        :param state: state of the input that ends a wait
+        :param edge: if True the input must change to the state during the wait, so a pedal held down does not end
+        the next wait too
+        :param rate: times per second the input is read
+        :param timeout: longest wait in seconds, if None wait until the signal
+        """
+        if pin is not None and pin not in INPUT_PINS:
+            raise ValueError(f"Pin {pin} is not an input, inputs are pins {', '.join(str(p) for p in INPUT_PINS)}")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("Timeout must be positive")
+
+        self.pin = pin
+        self.state = state
+        self.edge = edge
+        self.period = 1 / rate
+        self.timeout = timeout
+
+        self._submit = submit
+        self._lock = threading.Lock()
+        self._result = None
+        self._signal = threading.Event()
+
+    def trigger(self) -> None:
+        """
+        End the current wait, the program continues.
+        """
+        self._set(TRIGGER)
+
+    def cancel(self) -> None:
+        """
+        End the current wait and the following ones until reset, the program stops.
+        """
+        self._set(CANCELLED)
+
+    def reset(self) -> None:
+        """
+        Forget a trigger or cancellation not consumed by a wait.
+        """
+        with self._lock:
+            self._result = None
+            self._signal.clear()
+
+    def wait(self) -> str:
+        """
+        Wait for the input, the local trigger or the timeout. A trigger set before the wait started is ignored, a
+        cancellation is not.
+
+        :return: INPUT, TRIGGER, TIMEOUT or CANCELLED
+        """
+        with self._lock:
+            if self._result == TRIGGER:
+                self._result = None
+                self._signal.clear()
+
+        start = time.perf_counter()
+        next_tick = start
+        previous = None
+        while not self._signal.is_set():
+            if self.pin is not None:
+                state = bool(self._submit(f"getPin{self.pin}State").result())
+                if state == self.state and (not self.edge or previous == (not self.state)):
+                    self._set(INPUT)
+                    break
+                previous = state
+
+            now = time.perf_counter()
+            if self.timeout is not None and now - start >= self.timeout:
+                self._set(TIMEOUT)
+                break
+
+            # wait for the next reading at a fixed rate, the local trigger ends the wait at once
+            next_tick = max(next_tick + self.period, now)
+            wake = [next_tick] if self.pin is not None else []
+            if self.timeout is not None:
+                wake.append(start + self.timeout)
+            self._signal.wait(max(min(wake) - now, 0) if wake else None)
+
+        # a cancellation holds for the following waits
+        with self._lock:
+            result = self._result
+            if result != CANCELLED:
+                self._result = None
+                self._signal.clear()
+        return result
+
+    def _set(self, result: str) -> None:
+        """
+        End the current wait with the given result, unless it already ended.
+
+        :param result: how the wait ended
+        """
+        with self._lock:
+            if self._result is None:
+                self._result = result
+            self._signal.set()
@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+# digital inputs of the robot the client can read
+INPUT_PINS = (3, 10, 13, 16)
+# digital outputs of the robot the client can set
+OUTPUT_PINS = (1, 2, 11, 12)
+
+
+class IOImage:
+    """
+    Class keeping an image of the robot's digital I/O. Every input is read by a single job on the thread owning the
+    connection, one pin after the other with no other command in between, and the inputs are cached as one bitmask,
+    bit n being pin n, with the time they were read.
+    Output writes requested while the robot is busy are merged into a single job: the last state requested for each
+    pin is kept, pins already in the requested state are not written unless the write is forced, and pins are
+    switched off before others are switched on so two outputs are never on by mistake in between.
+    """
+
+    def __init__(self, submit: Callable[[Callable], Future]):
+        """
+        :param submit: function submitting a job, receiving the connection, to the thread owning the connection
+        """
+        self._submit = submit
+        self._lock = threading.RLock()
+
+        # inputs and the time they were read, None before the first read
+        self._inputs = 0
+        self._inputs_time = None
+
+        # outputs written by this image, pins never written have an unknown state
+        self._outputs = 0
+        self._known_outputs = 0
+        self._outputs_time = None
+
+        # output states waiting to be written, the pins written even if already in that state and the future of the
+        # job writing them
+        self._pending = {}
+        self._forced = set()
+        self._batch = None
+
+        # future of the running read, shared by every read requested meanwhile
+        self._reading = None
+
+    def read_inputs(self, max_age: float = None) -> tuple[int, float]:
+        """
+        Get every input, reading them from the robot unless the cached ones are recent enough.
+
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: bitmask of the inputs and the time they were read
+        """
+        with self._lock:
+            if max_age is not None and self._inputs_time is not None and time.time() - self._inputs_time <= max_age:
+                return self._inputs, self._inputs_time
+
+            # reads requested while another one runs share its result
+            if self._reading is None or self._reading.done():
+                self._reading = self._submit(self._read_all)
+            reading = self._reading
+        return reading.result()
+
+    def get_input(self, pin: int, max_age: float = None) -> bool:
+        """
+        Get the state of an input.
+
+        :param pin: number of the pin
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: True if the pin is on
+        """
+        if pin not in INPUT_PINS:
+            raise ValueError(f"Pin {pin} is not an input, inputs are pins {', '.join(str(p) for p in INPUT_PINS)}")
+        return bool(self.read_inputs(max_age)[0] >> pin & 1)
+
+    def write_outputs(self, states: dict, force: bool = False) -> Future:
+        """
+        Request output states without waiting.
+
+        :param states: state of each pin to write, True for on
+        :param force: if True the pins are written even if the image has them in the requested state already, for
+        outputs that may have been changed outside the image
+        :return: future completed once the job carrying these states ends
+        """
+        for pin in states:
+            if pin not in OUTPUT_PINS:
+                raise ValueError(f"Pin {pin} is not an output, outputs are pins "
+                                 f"{', '.join(str(p) for p in OUTPUT_PINS)}")
+
+        with self._lock:
+            self._pending.update({pin: bool(state) for pin, state in states.items()})
+            if force:
+                self._forced.update(states)
+
+            # the waiting job picks up the states when it starts
+            if self._batch is not None:
+                return self._batch
+
+            batch = Future()
+            try:
+                job = self._submit(self._write_pending)
+            except OSError:
+                self._pending = {}
+                self._forced = set()
+                raise
+            self._batch = batch
+            job.add_done_callback(lambda done_job: self._job_done(done_job, batch))
+            return batch
+
+    def get_outputs(self) -> tuple[int, int, float]:
+        """
+        Get the outputs written through this image.
+
+        :return: bitmask of the outputs, bitmask of the outputs whose state is known and the time of the last write
+        """
+        with self._lock:
+            return self._outputs, self._known_outputs, self._outputs_time
+
+    def clear(self) -> None:
+        """
+        Forget the cached states, e.g. after a reconnection.
+        """
+        with self._lock:
+            self._inputs = 0
+            self._inputs_time = None
+            self._outputs = 0
+            self._known_outputs = 0
+            self._outputs_time = None
+
+    def _job_done(self, job: Future, batch: Future) -> None:
+        """
+        Fail the write if its job was dropped before running, e.g. because the connection was lost.
+
+        :param job: future of the submitted job
+        :param batch: future of the write
+        """
+        with self._lock:
+            if self._batch is not batch:
+                return
+            self._pending = {}
+            self._forced = set()
+            self._batch = None
+        if batch.set_running_or_notify_cancel():
+            batch.set_exception(OSError("Output write was dropped") if job.cancelled() else job.exception())
+
+    def _read_all(self, connection) -> tuple[int, float]:
+        """
+        Read every input, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        :return: bitmask of the inputs and the time they were read
+        """
+        inputs = 0
+        for pin in INPUT_PINS:
+            if getattr(connection, f"getPin{pin}State")():
+                inputs |= 1 << pin
+        read_time = time.time()
+
+        with self._lock:
+            self._inputs, self._inputs_time = inputs, read_time
+        return inputs, read_time
+
+    def _write_pending(self, connection) -> None:
+        """
+        Write the pending output states, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        with self._lock:
+            states = self._pending
+            forced = self._forced
+            batch = self._batch
+            self._pending = {}
+            self._forced = set()
+            self._batch = None
+
+        if not batch.set_running_or_notify_cancel():
+            return
+        try:
+            # pins already in the requested state are skipped unless forced, pins switched off go first
+            changes = [(pin, state) for pin, state in states.items() if pin in forced or
+                       not self._known_outputs >> pin & 1 or bool(self._outputs >> pin & 1) != state]
+            changes.sort(key=lambda change: change[1])
+            for pin, state in changes:
+                getattr(connection, f"setPin{pin}{'On' if state else 'Off'}")()
+                with self._lock:
+                    self._outputs = self._outputs | 1 << pin if state else self._outputs & ~(1 << pin)
+                    self._known_outputs |= 1 << pin
+                    self._outputs_time = time.time()
+        except BaseException as e:
+            batch.set_exception(e)
+        else:
+            batch.set_result(len(changes))
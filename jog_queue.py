@@ -0,0 +1,101 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+
+class JogQueue:
+    """
+    Class to merge relative movements requested while the robot is busy. Requested offsets accumulate per axis and
+    are sent as a single movement once the robot is free. If a request reverses the direction of an axis, the
+    pending offset of that axis is stale and is replaced instead of accumulated.
+    """
+
+    def __init__(self, submit: Callable[[Callable], Future]):
+        """
+        :param submit: function submitting a job, receiving the connection, to the thread owning the connection
+        """
+        self._submit = submit
+        self._lock = threading.RLock()
+        self._pending = [0.0, 0.0, 0.0]
+        self._velocity = None
+
+        # future of the movement that will carry the pending offsets, None if no movement is waiting to start
+        self._batch = None
+
+    def add(self, offset: list, velocity: float) -> Future:
+        """
+        Request a movement relative to the base.
+
+        :param offset: EEF position shift relative to base [x, y, z]
+        :param velocity: velocity in [mm/s], the last requested velocity is used for merged requests
+        :return: future completed once the movement carrying this request ends
+        """
+        with self._lock:
+            for i in range(3):
+                if self._pending[i] * offset[i] < 0:
+                    self._pending[i] = offset[i]
+                else:
+                    self._pending[i] += offset[i]
+            self._velocity = velocity
+
+            # the waiting movement picks up the offsets when it starts
+            if self._batch is not None:
+                return self._batch
+
+            batch = Future()
+            try:
+                job = self._submit(self._move_pending)
+            except OSError:
+                self._pending = [0.0, 0.0, 0.0]
+                raise
+            self._batch = batch
+            job.add_done_callback(lambda done_job: self._job_done(done_job, batch))
+            return batch
+
+    def get_pending(self) -> list:
+        """
+        Get the offsets not yet sent to the robot.
+
+        :return: pending EEF position shift relative to base [x, y, z]
+        """
+        with self._lock:
+            return list(self._pending)
+
+    def _job_done(self, job: Future, batch: Future) -> None:
+        """
+        Fail the movement if its job was dropped before running, e.g. because the connection was lost.
+
+        :param job: future of the submitted job
+        :param batch: future of the movement
+        """
+        with self._lock:
+            if self._batch is not batch:
+                return
+            self._pending = [0.0, 0.0, 0.0]
+            self._batch = None
+        if batch.set_running_or_notify_cancel():
+            batch.set_exception(OSError("Movement was dropped") if job.cancelled() else job.exception())
+
+    def _move_pending(self, connection) -> None:
+        """
+        Move the robot by the pending offsets, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        with self._lock:
+            offset = self._pending
+            velocity = self._velocity
+            batch = self._batch
+            self._pending = [0.0, 0.0, 0.0]
+            self._batch = None
+
+        if not batch.set_running_or_notify_cancel():
+            return
+        try:
+            # requests that cancel each other out do not move the robot
+            if any(offset):
+                connection.movePTPLineEefRelBase(offset, [velocity])
+        except BaseException as e:
+            batch.set_exception(e)
+        else:
+            batch.set_result(offset)
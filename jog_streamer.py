@@ -0,0 +1,90 @@
+import threading
+import time
+
+# rate in Hz at which setpoints are streamed while jogging
+JOG_RATE = 50
+# time in seconds to ramp from stop to full velocity and back
+JOG_RAMP_TIME = 0.2
+# time in seconds without a refresh after which the jog is released, in case the release never arrives
+JOG_DEADMAN_TIME = 0.25
+
+
+class JogStreamer:
+    """
+    Class to jog the robot's EEF continuously. While jogging, the robot is in direct servo mode and receives small
+    incremental setpoints at a fixed rate along the jog direction. Velocity ramps up on start and down on release,
+    so the robot stops within JOG_RAMP_TIME of the release. The jog must be refreshed while it is held: without a
+    refresh for deadman_time it is released, so a lost release or a frozen interface never leaves the robot moving.
+    """
+
+    def __init__(self, direction: list, velocity: float, rate: float = JOG_RATE, ramp_time: float = JOG_RAMP_TIME,
+                 deadman_time: float = JOG_DEADMAN_TIME):
+        self.direction = direction
+        self.velocity = velocity
+        self.period = 1 / rate
+        self.acceleration = velocity / ramp_time if ramp_time > 0 else float("inf")
+        self.deadman_time = deadman_time
+
+        self._released = threading.Event()
+        self._refreshed = time.perf_counter()
+
+    def refresh(self) -> None:
+        """
+        Confirm the jog is still held, must be called more often than every deadman_time.
+        """
+        self._refreshed = time.perf_counter()
+
+    def release(self) -> None:
+        """
+        Stop jogging, the robot ramps down to a stop.
+        """
+        self._released.set()
+
+    def is_released(self) -> bool:
+        """
+        Check if the jog was released.
+
+        :return: True if the jog is stopping or stopped
+        """
+        return self._released.is_set()
+
+    def __call__(self, connection) -> None:
+        """
+        Stream setpoints until released, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        pose = connection.getEEFPos()
+        if len(pose) != 6:
+            raise OSError("Could not read the robot position")
+
+        connection.realTime_startDirectServoCartesian()
+        try:
+            speed = 0.0
+            next_tick = time.perf_counter()
+            while True:
+                # a jog no longer refreshed is released
+                if time.perf_counter() - self._refreshed > self.deadman_time:
+                    self._released.set()
+
+                # ramp the speed towards the velocity while held and towards zero once released
+                if self._released.is_set():
+                    speed = max(speed - self.acceleration * self.period, 0.0)
+                    if speed == 0.0:
+                        break
+                else:
+                    speed = min(speed + self.acceleration * self.period, self.velocity)
+
+                for i in range(3):
+                    pose[i] += self.direction[i] * speed * self.period
+                connection.sendEEfPosition(pose)
+
+                # keep a fixed rate, without accumulating the time spent sending
+                next_tick += self.period
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_tick = time.perf_counter()
+        finally:
+            connection.realTime_stopDirectServoCartesian()
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+# rate in Hz at which setpoints are streamed along a blended path
+PATH_RATE = 50
+# time in seconds over which velocity changes are spread, rounding the corners of the path
+BLEND_TIME = 0.3
+# velocity in [rad/s] at which the EEF orientation changes
+ANGULAR_VELOCITY = 0.5
+
+
+def plan_path(start: list, waypoints: list, velocities: list, rate: float = PATH_RATE,
+              blend_time: float = BLEND_TIME, angular_velocity: float = ANGULAR_VELOCITY) -> np.ndarray:
+    """
+    Plan a continuous path through the waypoints. Each segment is run at its velocity and the setpoints are then
+    averaged over blend_time, so the robot starts and stops smoothly and rounds every waypoint instead of stopping
+    at it. The corner is cut by at most about a quarter of the distance covered in blend_time.
+
+    :param start: current position of the robot [x, y, z, a, b, c]
+    :param waypoints: positions to go through [x, y, z, a, b, c], the last one is reached exactly
+    :param velocities: velocity in [mm/s] of the segment ending at each waypoint
+    :param rate: setpoints per second
+    :param blend_time: time in seconds over which velocity changes are spread
+    :param angular_velocity: velocity in [rad/s] at which the orientation changes
+    :return: setpoints, one per row
+    """
+    poses = np.array([start] + list(waypoints), dtype=float)
+    # orientation angles are unwrapped so a turn through +-pi is not taken the long way round
+    poses[:, 3:] = np.unwrap(poses[:, 3:], axis=0)
+
+    # time at which each waypoint is reached, limited by the linear and the angular velocity of the segment
+    steps = np.diff(poses, axis=0)
+    durations = np.maximum(np.linalg.norm(steps[:, :3], axis=1) / np.asarray(velocities, dtype=float),
+                           np.abs(steps[:, 3:]).max(axis=1) / angular_velocity)
+    knots = np.concatenate(([0.0], np.cumsum(durations)))
+
+    # sample the path at a fixed rate, the last waypoint included
+    times = np.append(np.arange(0, knots[-1], 1 / rate), knots[-1])
+    path = np.column_stack([np.interp(times, knots, poses[:, i]) for i in range(6)])
+
+    # moving average, padded with the ends so the robot starts and ends at rest
+    window = max(int(round(blend_time * rate)), 1)
+    padded = np.concatenate((np.repeat(path[:1], window - 1, axis=0), path, np.repeat(path[-1:], window - 1, axis=0)))
+    cumulative = np.concatenate((np.zeros((1, 6)), np.cumsum(padded, axis=0)))
+    setpoints = (cumulative[window:] - cumulative[:-window]) / window
+    setpoints[:, 3:] = (setpoints[:, 3:] + np.pi) % (2 * np.pi) - np.pi
+    return setpoints
+
+
+class PathStreamer:
+    """
+    Class to move the robot's EEF along several waypoints in one continuous motion. The path is planned when the
+    robot's position is known and streamed in direct servo mode at a fixed rate. Streaming can be stopped from
+    another thread, the robot then holds the last setpoint sent.
+    """
+
+    def __init__(self, waypoints: list, velocities: list, rate: float = PATH_RATE, blend_time: float = BLEND_TIME):
+        """
+        :param waypoints: positions to go through [x, y, z, a, b, c]
+        :param velocities: velocity in [mm/s] of the segment ending at each waypoint
+        :param rate: setpoints per second
+        :param blend_time: time in seconds over which velocity changes are spread
+        """
+        self.waypoints = waypoints
+        self.velocities = velocities
+        self.period = 1 / rate
+        self.blend_time = blend_time
+
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """
+        Stop streaming before the next setpoint, from any thread.
+        """
+        self._stop.set()
+
+    def is_stopped(self) -> bool:
+        """
+        Check if streaming was stopped before the end of the path.
+
+        :return: True if stopped
+        """
+        return self._stop.is_set()
+
+    def __call__(self, connection) -> None:
+        """
+        Stream the path, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        if self._stop.is_set():
+            return
+        pose = connection.getEEFPos()
+        if len(pose) != 6:
+            raise OSError("Could not read the robot position")
+        path = plan_path(pose, self.waypoints, self.velocities, 1 / self.period, self.blend_time)
+
+        connection.realTime_startDirectServoCartesian()
+        try:
+            next_tick = time.perf_counter()
+            for setpoint in path:
+                if self._stop.is_set():
+                    break
+                connection.sendEEfPosition(setpoint.tolist())
+
+                # keep a fixed rate, without accumulating the time spent sending
+                next_tick += self.period
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    self._stop.wait(delay)
+                else:
+                    next_tick = time.perf_counter()
+        finally:
+            connection.realTime_stopDirectServoCartesian()
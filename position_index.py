@@ -0,0 +1,283 @@
+import numpy as np
+
+# edge in [mm] of the cells positions are hashed into, queries look at the cells around the query point
+CELL_SIZE = 10.0
+# rings of cells searched for the nearest position before scanning every position at once
+MAX_SEARCH_RINGS = 8
+
+
+def orientation_difference(orientations: np.ndarray, orientation: np.ndarray) -> np.ndarray:
+    """
+    Get the largest difference between the angles of each orientation and the given one, wrapped to [0, pi].
+
+    :param orientations: orientations [a, b, c] in [rad], one per row
+    :param orientation: orientation to compare with [a, b, c] in [rad]
+    :return: largest angle difference of each orientation
+    """
+    difference = np.abs((orientations - orientation + np.pi) % (2 * np.pi) - np.pi)
+    return difference.max(axis=1) if len(difference) else np.zeros(0)
+
+
+class PositionIndex:
+    """
+    Class to find positions by location across tasks. Positions are hashed into a grid of cubic cells over their
+    X, Y and Z coordinates, so a query only looks at the positions in the cells around it. Coordinates are kept
+    in arrays, one row per position, so every candidate is checked at once. Removed rows are reused.
+    Orientations are compared angle by angle, which is a close approximation for small tolerances.
+    """
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        """
+        :param cell_size: edge in [mm] of the grid cells
+        """
+        self.cell_size = cell_size
+
+        self._keys = []
+        self._rows = {}
+        self._free = []
+        self._cells = {}
+        self._xyz = np.zeros((0, 3))
+        self._abc = np.zeros((0, 3))
+        self._used = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, task: str, position: str, cartesian: list) -> None:
+        """
+        Add a position to the index, replacing it if it was already indexed.
+
+        :param task: name of the task
+        :param position: name of the position
+        :param cartesian: cartesian coordinates of the position [x, y, z, a, b, c]
+        """
+        key = (task, position)
+        if key in self._rows:
+            self.remove(task, position)
+
+        if self._free:
+            row = self._free.pop()
+            self._keys[row] = key
+        else:
+            row = len(self._keys)
+            self._keys.append(key)
+            # arrays grow by doubling, so adding n positions copies them O(log n) times
+            if row >= len(self._used):
+                capacity = max(2 * len(self._used), 64)
+                self._xyz = np.resize(self._xyz, (capacity, 3))
+                self._abc = np.resize(self._abc, (capacity, 3))
+                self._used = np.concatenate((self._used, np.zeros(capacity - len(self._used), dtype=bool)))
+
+        self._xyz[row] = cartesian[:3]
+        self._abc[row] = cartesian[3:6]
+        self._used[row] = True
+        self._rows[key] = row
+        self._cells.setdefault(self._cell(self._xyz[row]), set()).add(row)
+
+    def remove(self, task: str, position: str) -> None:
+        """
+        Remove a position from the index.
+
+        :param task: name of the task
+        :param position: name of the position
+        """
+        row = self._rows.pop((task, position), None)
+        if row is None:
+            return
+        cell = self._cell(self._xyz[row])
+        self._cells[cell].discard(row)
+        if not self._cells[cell]:
+            del self._cells[cell]
+        self._used[row] = False
+        self._keys[row] = None
+        self._free.append(row)
+
+    def remove_task(self, task: str) -> None:
+        """
+        Remove every position of a task from the index.
+
+        :param task: name of the task
+        """
+        for key in [key for key in self._rows if key[0] == task]:
+            self.remove(*key)
+
+    def nearest(self, cartesian: list, orientation_tolerance: float = None, max_distance: float = None,
+                exclude: tuple = None) -> tuple:
+        """
+        Find the position closest to the given coordinates.
+
+        :param cartesian: coordinates to search from [x, y, z] or [x, y, z, a, b, c]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :param max_distance: largest distance in [mm], if None any distance
+        :param exclude: (task, position) not to be returned, e.g. the position being searched from
+        :return: task, position and distance in [mm], None if there is no position
+        """
+        point = np.asarray(cartesian[:3], dtype=float)
+        centre = self._cell(point)
+
+        # look at growing rings of cells, a match is final once no unsearched cell can be closer
+        rings = MAX_SEARCH_RINGS if max_distance is None else min(int(max_distance // self.cell_size) + 1,
+                                                                  MAX_SEARCH_RINGS)
+        best = None
+        for ring in range(rings + 1):
+            rows = self._rows_in_ring(centre, ring)
+            match = self._closest(rows, point, cartesian, orientation_tolerance, exclude)
+            if match is not None and (best is None or match[1] < best[1]):
+                best = match
+            if best is not None and best[1] <= ring * self.cell_size:
+                break
+        else:
+            # the grid search did not settle, scan every position at once
+            if max_distance is None or max_distance > rings * self.cell_size:
+                best = self._closest(np.flatnonzero(self._used), point, cartesian, orientation_tolerance, exclude)
+
+        if best is None or (max_distance is not None and best[1] > max_distance):
+            return None
+        return self._keys[best[0]] + (best[1],)
+
+    def within(self, cartesian: list, distance: float, orientation_tolerance: float = None) -> list:
+        """
+        Find the positions within the given distance of the coordinates.
+
+        :param cartesian: coordinates to search from [x, y, z] or [x, y, z, a, b, c]
+        :param distance: largest distance in [mm]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :return: task, position and distance in [mm] of each position found, closest first
+        """
+        point = np.asarray(cartesian[:3], dtype=float)
+        lower = self._cell(point - distance)
+        upper = self._cell(point + distance)
+
+        # small distances only look at their cells, large ones scan every position at once
+        if np.prod(np.subtract(upper, lower) + 1) < len(self._cells):
+            rows = np.array([row for x in range(lower[0], upper[0] + 1) for y in range(lower[1], upper[1] + 1)
+                             for z in range(lower[2], upper[2] + 1) for row in self._cells.get((x, y, z), ())],
+                            dtype=int)
+        else:
+            rows = np.flatnonzero(self._used)
+
+        distances = np.linalg.norm(self._xyz[rows] - point, axis=1)
+        mask = distances <= distance
+        if orientation_tolerance is not None:
+            mask &= orientation_difference(self._abc[rows], np.asarray(cartesian[3:6])) <= orientation_tolerance
+        order = np.argsort(distances[mask], kind="stable")
+        return [self._keys[row] + (float(d),) for row, d in zip(rows[mask][order], distances[mask][order])]
+
+    def duplicates(self, distance: float, orientation_tolerance: float = None) -> list:
+        """
+        Find every pair of positions within the given distance of each other. Positions are sorted by cells at least
+        as large as the distance, and the candidates of every position in each of the neighbouring cells are found
+        with a single search over the sorted cells.
+
+        :param distance: largest distance in [mm]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :return: both (task, position) and the distance in [mm] of each pair
+        """
+        rows = np.flatnonzero(self._used)
+        if len(rows) < 2:
+            return []
+
+        # number each cell, with room around the occupied ones for the neighbouring cells, cells are sized from the
+        # distance so only the adjacent ones are searched however large it is
+        cell_size = max(self.cell_size, distance)
+        reach = int(np.ceil(distance / cell_size))
+        cells = np.floor(self._xyz[rows] / cell_size).astype(np.int64)
+        cells -= cells.min(axis=0) - reach
+        size = cells.max(axis=0) + reach + 1
+        codes = (cells[:, 0] * size[1] + cells[:, 1]) * size[2] + cells[:, 2]
+        order = np.argsort(codes, kind="stable")
+        rows, codes = rows[order], codes[order]
+
+        first, second = [], []
+        for x in range(-reach, reach + 1):
+            for y in range(-reach, reach + 1):
+                for z in range(-reach, reach + 1):
+                    # each pair of cells is visited once, from the cell with the lowest number
+                    offset = (x * size[1] + y) * size[2] + z
+                    if offset < 0:
+                        continue
+                    starts = np.searchsorted(codes, codes + offset, side="left")
+                    counts = np.searchsorted(codes, codes + offset, side="right") - starts
+                    i = np.repeat(np.arange(len(codes)), counts)
+                    j = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                    if offset == 0:
+                        i, j = i[i < j], j[i < j]
+                    first.append(i)
+                    second.append(j)
+        i, j = rows[np.concatenate(first)], rows[np.concatenate(second)]
+
+        distances = np.linalg.norm(self._xyz[i] - self._xyz[j], axis=1)
+        mask = distances <= distance
+        if orientation_tolerance is not None:
+            angles = np.abs((self._abc[i] - self._abc[j] + np.pi) % (2 * np.pi) - np.pi)
+            mask &= angles.max(axis=1) <= orientation_tolerance
+        return [(self._keys[a], self._keys[b], float(d)) for a, b, d in zip(i[mask], j[mask], distances[mask])]
+
+    def inside_box(self, lower: list, upper: list) -> list:
+        """
+        Find the positions inside an axis-aligned box.
+
+        :param lower: lowest corner of the box [x, y, z]
+        :param upper: highest corner of the box [x, y, z]
+        :return: task and position of each position inside the box
+        """
+        first = self._cell(np.asarray(lower, dtype=float))
+        last = self._cell(np.asarray(upper, dtype=float))
+
+        # small boxes only look at their cells, large ones scan every position at once
+        if np.prod(np.maximum(np.subtract(last, first) + 1, 0)) < len(self._cells):
+            rows = np.array([row for x in range(first[0], last[0] + 1) for y in range(first[1], last[1] + 1)
+                             for z in range(first[2], last[2] + 1) for row in self._cells.get((x, y, z), ())],
+                            dtype=int)
+        else:
+            rows = np.flatnonzero(self._used)
+        mask = np.all((self._xyz[rows] >= lower) & (self._xyz[rows] <= upper), axis=1)
+        return [self._keys[row] for row in rows[mask]]
+
+    def _cell(self, point: np.ndarray) -> tuple:
+        """
+        Get the grid cell containing a point.
+
+        :param point: coordinates [x, y, z]
+        :return: integer cell coordinates
+        """
+        return tuple(int(value) for value in np.floor(point / self.cell_size))
+
+    def _rows_in_ring(self, centre: tuple, ring: int) -> np.ndarray:
+        """
+        Get the rows in the cells at the given ring around the centre cell, ring 0 being the centre cell.
+
+        :param centre: centre cell
+        :param ring: distance in cells from the centre
+        :return: rows of the positions in the ring
+        """
+        rows = []
+        for x in range(-ring, ring + 1):
+            for y in range(-ring, ring + 1):
+                # only the faces of the ring's cube, inner cells were searched before
+                steps = range(-ring, ring + 1) if max(abs(x), abs(y)) == ring else (-ring, ring) if ring else (0,)
+                for z in steps:
+                    rows.extend(self._cells.get((centre[0] + x, centre[1] + y, centre[2] + z), ()))
+        return np.array(rows, dtype=int)
+
+    def _closest(self, rows: np.ndarray, point: np.ndarray, cartesian: list, orientation_tolerance: float,
+                 exclude: tuple) -> tuple:
+        """
+        Get the closest of the given rows matching the orientation.
+
+        :param rows: candidate rows
+        :param point: coordinates [x, y, z]
+        :param cartesian: coordinates with orientation
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :param exclude: (task, position) not to be returned
+        :return: row and distance, None if no row matches
+        """
+        if exclude is not None and exclude in self._rows:
+            rows = rows[rows != self._rows[exclude]]
+        if orientation_tolerance is not None:
+            rows = rows[orientation_difference(self._abc[rows], np.asarray(cartesian[3:6])) <= orientation_tolerance]
+        if len(rows) == 0:
+            return None
+        distances = np.linalg.norm(self._xyz[rows] - point, axis=1)
+        closest = int(np.argmin(distances))
+        return int(rows[closest]), float(distances[closest])
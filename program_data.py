@@ -24,6 +24,9 @@ class ProgramData:
         self.program_name = None
         self.program_saved = None
 
+        # change counter, incremented on every change to the program or its saved state
+        self.revision = 0
+
     def _validate_program(self, program) -> None:
         """
         Validate if program follows the correct structure.
@@ -54,6 +57,7 @@ class ProgramData:
         self.program_name = encoded_program
         self.program = []
         self.program_saved = False
+        self.revision += 1
 
     def load_program(self, encoded_program: str) -> None:
         """
@@ -72,6 +76,7 @@ class ProgramData:
             self.program = self.file_manager.load_file(encoded_program)
             self.program_name = encoded_program
             self.program_saved = True
+            self.revision += 1
         else:
             raise FileNotFoundError(f"There is no file {encoded_program}.json")
 
@@ -83,6 +88,7 @@ class ProgramData:
         self.program = None
         self.program_name = None
         self.program_saved = None
+        self.revision += 1
 
     @check_open_program
     def get_tasks(self) -> list:
@@ -102,6 +108,7 @@ class ProgramData:
         """
         self.program.append(encoded_task_name)
         self.program_saved = False
+        self.revision += 1
 
     @check_open_program
     def delete_task(self, index: int) -> None:
@@ -113,6 +120,7 @@ class ProgramData:
         if 0 <= index < len(self.program):
             self.program.pop(index)
             self.program_saved = False
+            self.revision += 1
         else:
             raise ValueError(f"There is no task with index {index} in program {self.program_name}")
 
@@ -129,11 +137,25 @@ class ProgramData:
             self.program[index_1] = self.program[index_2]
             self.program[index_2] = temp
             self.program_saved = False
+            self.revision += 1
         elif index_1 < 0 or index_1 >= len(self.program):
             raise ValueError(f"There is no task with index {index_1} in program {self.program_name}")
         else:
             raise ValueError(f"There is no task with index {index_2} in program {self.program_name}")
 
+    @check_open_program
+    def reorder_tasks(self, order: list) -> None:
+        """
+        Reorder the tasks of the program.
+
+        :param order: index of the current task to place at each index
+        """
+        if sorted(order) != list(range(len(self.program))):
+            raise ValueError(f"Order must contain each task index of program {self.program_name} once")
+        self.program = [self.program[index] for index in order]
+        self.program_saved = False
+        self.revision += 1
+
     @check_open_program
     def save_program(self) -> None:
         """
@@ -141,6 +163,7 @@ class ProgramData:
         """
         self.file_manager.save_file(self.program_name, self.program)
         self.program_saved = True
+        self.revision += 1
 
     @check_open_program
     def is_up_to_date(self) -> None:
@@ -148,3 +171,11 @@ class ProgramData:
         Returns weather program is up to date.
         """
         return self.program_saved
+
+    def get_revision(self) -> int:
+        """
+        Get the change counter, incremented on every change to the program.
+
+        :return: current revision
+        """
+        return self.revision
@@ -1,7 +1,14 @@
+import difflib
+import threading
+import tkinter
+from concurrent.futures import Future, InvalidStateError
+
 import customtkinter
 
-from ctkinter_elements import CTkBoxList, CTkMessageDisplay, CTkFloatSpinbox, CTkOkCancel
-from robotic_system import RoboticSystem
+from ctkinter_elements import CTkVirtualBoxList, CTkMessageDisplay, CTkFloatSpinbox, CTkOkCancel
+from robotic_system import RoboticSystem, MIN_SPEED_OVERRIDE
+from io_image import INPUT_PINS
+from task_data import RELATIVE_VELOCITY
 
 customtkinter.set_appearance_mode("System")  # Modes: "System" (standard), "Dark", "Light"
 customtkinter.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
@@ -25,15 +32,71 @@ RED_COLORS = ('#dc3545', '#a82835')
 BLUE_COLORS = ('#3B8ED0', '#1F6AA5')
 GREEN_COLORS = '#198754'
 
+# time in milliseconds between updates of the connection lamp
+LINK_LAMP_PERIOD = 500
+
+# time in milliseconds a move button must be held before jogging starts, a shorter click moves the set amount
+JOG_HOLD_DELAY = 250
+# time in milliseconds between checks of a movement running in the background
+MOVE_POLL_PERIOD = 50
+# keys that jog the robot while held: axis and direction
+JOG_KEYS = {"Right": (0, True), "Left": (0, False), "Up": (1, True), "Down": (1, False), "Prior": (2, True),
+            "Next": (2, False)}
+
+# a new position closer than this distance in [mm] and angle in [rad] to an existing one is reported as a duplicate
+DUPLICATE_DISTANCE = 1.0
+DUPLICATE_ORIENTATION = 0.01
+# smallest estimated saving in seconds for which a reordering of the operations is proposed
+MIN_ORDER_SAVING = 0.05
+# velocity in [mm/s] at which the robot goes to a selected position, scaled by the speed override
+GO_TO_VELOCITY = 20
+# longest time in seconds a program waits for a robot input before asking the user to continue
+WAIT_INPUT_TIMEOUT = 60
+
 BLUE_HOVER = ('#36719F', '#144870')
 ORANGE_HOVER = "#b87818"
 RED_HOVER = "#85202A"
 
 
-# Class inherited from CTkBoxList to communicate with program_data class
-class CTkProgramBoxList(CTkBoxList):
+# Frame displaying a task name and a lamp with the task's state
+class CTkTaskState(customtkinter.CTkFrame):
+    def __init__(self, master, task: str = "", state: int = 0, **kwargs):
+        super().__init__(master, height=28, width=200, **kwargs)
+
+        # configure grid layout
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        # label to indicate state
+        self.state_label = customtkinter.CTkLabel(self, text="", width=20, height=20, corner_radius=10)
+        self.state_label.grid(row=0, column=0, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
+
+        # label to display the task name
+        self.task_name_label = customtkinter.CTkLabel(self, text="", anchor="w")
+        self.task_name_label.grid(row=0, column=1, padx=SMALL_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
+
+        self.set(task, state)
+
+    def set(self, task: str, state: int) -> None:
+        """
+        Display the given task and state.
+
+        :param task: name of the task
+        :param state: state of the task (0 if exists, 1 if exists and not up to date, 2 if does not exist)
+        """
+        if state == 0:
+            self.state_label.configure(fg_color=GREEN_COLORS)
+        elif state == 1:
+            self.state_label.configure(fg_color=ORANGE_COLORS)
+        elif state == 2:
+            self.state_label.configure(fg_color=RED_COLORS)
+        self.task_name_label.configure(text=task)
+
+
+# Class inherited from CTkVirtualBoxList to communicate with program_data class. Elements are (task name, state)
+class CTkProgramBoxList(CTkVirtualBoxList):
     def __init__(self, master, robotic_system: RoboticSystem, **kwargs):
-        super().__init__(master, **kwargs)
+        super().__init__(master, create_row=CTkTaskState, update_row=lambda row, item: row.set(*item), **kwargs)
         self.robotic_system = robotic_system
 
     def delete_element(self, index: int) -> None:
@@ -67,7 +130,7 @@ class CTkProgramBoxList(CTkBoxList):
 
         :param index: index of element
         """
-        if index < len(self.elements) - 1:
+        if index < len(self.items) - 1:
             try:
                 self.robotic_system.swap_tasks_in_program(index, index + 1)
             except ValueError:
@@ -99,11 +162,38 @@ class CTkRobotConnector(customtkinter.CTkFrame):
                                                    fg_color="transparent")
         self.connect_lamp.grid(row=1, column=1, padx=SMALL_X_PAD, pady=SMALL_Y_PAD)
 
+        # id of the scheduled update of the lamp, None if not updating
+        self.link_lamp_id = None
+
+    def _update_link_lamp(self) -> None:
+        """
+        Show the state of the link while connected: green if up, orange while reconnecting. Once the connection
+        ends, e.g. closed from a script, the lamp turns off and the button connects again.
+        """
+        self.link_lamp_id = None
+        if not self.robotic_system.is_robot_connected():
+            self.connect.configure(text="Connect")
+            self.connect_lamp.configure(fg_color="transparent")
+            return
+        status = self.robotic_system.get_robot_link_status()
+        self.connect_lamp.configure(fg_color=GREEN_COLORS if status["state"] == "up" else ORANGE_COLORS)
+        self.link_lamp_id = self.after(LINK_LAMP_PERIOD, self._update_link_lamp)
+
     def _connect_event(self) -> None:
         """
         Attempt to connect with the robot, if successful lamp turns on.
         If robot already connected it disconnects.
         """
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
+        # a single update of the lamp is scheduled at a time
+        if self.link_lamp_id is not None:
+            self.after_cancel(self.link_lamp_id)
+            self.link_lamp_id = None
+
         if self.robotic_system.is_robot_connected():
             self.robotic_system.stop_robot_connection()
             self.connect.configure(text="Connect")
@@ -122,6 +212,7 @@ class CTkRobotConnector(customtkinter.CTkFrame):
             self.ip_entry.insert(0, ip)
             self.connect.configure(text="Disconnect")
             self.connect_lamp.configure(fg_color=GREEN_COLORS)
+            self.link_lamp_id = self.after(LINK_LAMP_PERIOD, self._update_link_lamp)
 
 
 # Sidebar element
@@ -218,21 +309,37 @@ class CTkMoveRobot(customtkinter.CTkFrame):
         self.robot_tool.set(self.robotic_system.get_tool_names()[0])
         self.robot_tool.grid(row=0, column=0, padx=SMALL_X_PAD, pady=MEDIUM_HALF_Y_PAD, sticky="ew")
 
-        # buttons to move in the X, Y and Z axis
+        # buttons to move in the X, Y and Z axis, clicking moves the set amount and holding jogs the robot
         self.move_buttons = {}
         for i, letter in enumerate(["X", "Y", "Z"]):
             self.move_buttons[f"{letter}+"] = customtkinter.CTkButton(self, width=120, height=20, text=f"{letter}+",
-                                                                      font=customtkinter.CTkFont(size=17),
-                                                                      command=lambda axis=i:
-                                                                      self._move_robot(axis, True))
+                                                                      font=customtkinter.CTkFont(size=17))
             self.move_buttons[f"{letter}+"].grid(row=i + 1, column=1, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_HALF_Y_PAD,
                                                  sticky="nsew")
             self.move_buttons[f"{letter}-"] = customtkinter.CTkButton(self, width=120, height=20, text=f"{letter}-",
-                                                                      font=customtkinter.CTkFont(size=17),
-                                                                      command=lambda axis=i:
-                                                                      self._move_robot(axis, False))
+                                                                      font=customtkinter.CTkFont(size=17))
             self.move_buttons[f"{letter}-"].grid(row=i + 1, column=3, padx=MEDIUM_X_PAD, pady=MEDIUM_HALF_Y_PAD,
                                                  sticky="nsew")
+            for sign, positive_direction in (("+", True), ("-", False)):
+                button = self.move_buttons[f"{letter}{sign}"]
+                button.bind("<ButtonPress-1>", lambda e, axis=i, direction=positive_direction:
+                            self._press_move_event(axis, direction))
+                button.bind("<ButtonRelease-1>", lambda e: self._release_move_event())
+                button.bind("<Leave>", lambda e, left_button=button: self._leave_move_event(e, left_button))
+
+        # state of the move button or key being held
+        self.held_move = None
+        self.held_key = None
+        self.jog_start_id = None
+        self.jogging = False
+        self.key_release_id = None
+
+        # arrow keys jog in X and Y, page up and down in Z
+        self.winfo_toplevel().bind("<KeyPress>", self._key_press_event, add="+")
+        self.winfo_toplevel().bind("<KeyRelease>", self._key_release_event, add="+")
+
+        # releases are not delivered once the window loses the focus
+        self.winfo_toplevel().bind("<FocusOut>", lambda e: self.after_idle(self._focus_out_event), add="+")
 
         # entry to define the amount the robot moves in [mm] and respective label
         self.amount_label = customtkinter.CTkLabel(self, text="Amount [mm]:")
@@ -250,30 +357,170 @@ class CTkMoveRobot(customtkinter.CTkFrame):
         self.velocity.grid(row=5, column=3, padx=SMALL_X_PAD, pady=SMALL_Y_PAD)
         self.velocity.configure(fg_color=('gray86', 'gray17'))
 
-    def _move_robot(self, axis: int, positive_direction: bool) -> None:
+    def _press_move_event(self, axis: int, positive_direction: bool) -> None:
         """
-        Move robot in the specified axis and orientation.
+        Handle press of a move button or key. Jogging starts if it is held for longer than JOG_HOLD_DELAY.
 
         :param axis: axis of movement (0 for X, 1 for Y and 2 for Z)
         :param positive_direction: bool indicating whether to move in the positive direction
         """
+        if self.held_move is not None:
+            return
 
         # check if robot is connected
         if not self.robotic_system.is_robot_connected():
             self.message_display.display_message("Robot communication has not been established")
             return
 
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
+        self.held_move = (axis, positive_direction)
+        self.jog_start_id = self.after(JOG_HOLD_DELAY, self._start_jog)
+
+    def _start_jog(self) -> None:
+        """
+        Start jogging in the direction of the held button or key.
+        """
+        self.jog_start_id = None
+        axis, positive_direction = self.held_move
+        direction = [0, 0, 0]
+        direction[axis] = 1 if positive_direction else -1
+        try:
+            self.robotic_system.start_jog(direction, self.velocity.get())
+        except ValueError as e:
+            self.message_display.display_message(e)
+            return
+        except OSError as e:
+            self.message_display.display_message(e)
+            return
+        self.jogging = True
+        self.after(MOVE_POLL_PERIOD, self._refresh_jog)
+
+    def _refresh_jog(self) -> None:
+        """
+        Confirm the jog is still held, the robot stops on its own if the interface stops confirming it.
+        """
+        if not self.jogging:
+            return
+        if self.robotic_system.refresh_jog():
+            self.after(MOVE_POLL_PERIOD, self._refresh_jog)
+        else:
+            # the jog stopped without a release, e.g. the connection was lost
+            self.jogging = False
+            self.held_move = None
+            self.held_key = None
+
+    def _release_move_event(self) -> None:
+        """
+        Handle release of a move button or key. Stops jogging, or moves the set amount if released before jogging.
+        """
+        if self.held_move is None:
+            return
+        axis, positive_direction = self.held_move
+        self.held_move = None
+        self.held_key = None
+
+        if self.jogging:
+            self.jogging = False
+            self._check_movement(self.robotic_system.stop_jog())
+        elif self.jog_start_id is not None:
+            self.after_cancel(self.jog_start_id)
+            self.jog_start_id = None
+            self._move_robot(axis, positive_direction)
+
+    def _leave_move_event(self, event, button) -> None:
+        """
+        Handle the pointer leaving a move button, a button held by the mouse is released.
+        """
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if self.held_key is None and (widget is None or not f"{widget}.".startswith(f"{button}.")):
+            self._release_move_event()
+
+    def _key_press_event(self, event) -> None:
+        """
+        Handle key press, jog keys are ignored while typing.
+        """
+        if event.keysym not in JOG_KEYS or isinstance(event.widget, (tkinter.Entry, tkinter.Text)):
+            return
+
+        # key auto-repeat generates release and press pairs while the key is held, a press of another key confirms
+        # the release at once
+        if self.key_release_id is not None:
+            self.after_cancel(self.key_release_id)
+            self.key_release_id = None
+            if event.keysym == self.held_key:
+                return
+            self._release_move_event()
+
+        if self.held_move is None:
+            self._press_move_event(*JOG_KEYS[event.keysym])
+            if self.held_move is not None:
+                self.held_key = event.keysym
+
+    def _key_release_event(self, event) -> None:
+        """
+        Handle key release, confirmed shortly after to tell it from key auto-repeat.
+        """
+        if event.keysym != self.held_key or self.key_release_id is not None:
+            return
+        self.key_release_id = self.after(MOVE_POLL_PERIOD, self._key_released)
+
+    def _focus_out_event(self) -> None:
+        """
+        Handle the window losing the focus, the held button or key is released.
+        """
+        if self.tk.call("focus"):
+            # the focus only moved to another widget of the window
+            return
+        if self.key_release_id is not None:
+            self.after_cancel(self.key_release_id)
+            self.key_release_id = None
+        self._release_move_event()
+
+    def _key_released(self) -> None:
+        """
+        Handle confirmed release of a jog key.
+        """
+        self.key_release_id = None
+        self._release_move_event()
+
+    def _move_robot(self, axis: int, positive_direction: bool) -> None:
+        """
+        Move robot in the specified axis and orientation.
+
+        :param axis: axis of movement (0 for X, 1 for Y and 2 for Z)
+        :param positive_direction: bool indicating whether to move in the positive direction
+        """
+
         # create vector with amount to move relative to EEF in the specified actions and the correct orientation
         position = [0.0, 0.0, 0.0]
         position[axis] = self.amount.get() if positive_direction else -self.amount.get()
         velocity = self.velocity.get()
 
-        # send command to move robot
+        # request movement, clicks made while the robot is moving are merged into the next movement
         try:
-            self.robotic_system.move_robot(position, velocity)
+            self._check_movement(self.robotic_system.queue_move(position, velocity))
+        except ValueError as e:
+            self.message_display.display_message(e)
         except OSError as e:
             self.message_display.display_message(e)
 
+    def _check_movement(self, movement) -> None:
+        """
+        Wait for a movement running in the background and display its error, if any.
+
+        :param movement: future of the movement
+        """
+        if movement is None:
+            return
+        if not movement.done():
+            self.after(MOVE_POLL_PERIOD, self._check_movement, movement)
+        elif movement.exception() is not None:
+            self.message_display.display_message(movement.exception())
+
     def _open_gripper_event(self) -> None:
         """
         Open gripper.
@@ -284,11 +531,18 @@ class CTkMoveRobot(customtkinter.CTkFrame):
             self.message_display.display_message("Robot communication has not been established")
             return
 
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
         # send command to open gripper
         try:
             self.robotic_system.open_gripper()
         except OSError as e:
             self.message_display.display_message(e)
+        except ValueError as e:
+            self.message_display.display_message(e)
 
     def _close_gripper_event(self) -> None:
         """
@@ -299,11 +553,18 @@ class CTkMoveRobot(customtkinter.CTkFrame):
             self.message_display.display_message("Robot communication has not been established")
             return
 
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
         # send command to close gripper
         try:
             self.robotic_system.close_gripper()
         except OSError as e:
             self.message_display.display_message(e)
+        except ValueError as e:
+            self.message_display.display_message(e)
 
     def _hand_guide_event(self) -> None:
         """
@@ -315,6 +576,11 @@ class CTkMoveRobot(customtkinter.CTkFrame):
             self.message_display.display_message("Robot communication has not been established")
             return
 
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
         # Fetch weight of tool and centre of mass of the selected tool
         try:
             tool = self.robotic_system.get_tool_info(self.robot_tool.get())
@@ -341,7 +607,7 @@ class CTkTaskManager(customtkinter.CTkFrame):
 
         # configure grid layout
         self.grid_rowconfigure(1, weight=1)
-        self.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        self.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
 
         # task related information and elements
         self.tasks_labels = {}
@@ -358,20 +624,25 @@ class CTkTaskManager(customtkinter.CTkFrame):
                                                  command=self._load_task_event)
         self.load_task.grid(row=0, column=1, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
 
+        # button to load every saved task
+        self.load_all_tasks = customtkinter.CTkButton(self, width=80, height=40, text="Load all",
+                                                      command=self._load_all_tasks_event)
+        self.load_all_tasks.grid(row=0, column=2, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
+
         # button to save a task to its corresponding file
         self.save_task = customtkinter.CTkButton(self, width=80, height=40, text="Save task",
                                                  command=self._save_task_event)
-        self.save_task.grid(row=0, column=2, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
+        self.save_task.grid(row=0, column=3, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
 
         # button to delete a task, the file can also be deleted
         self.delete_task = customtkinter.CTkButton(self, width=80, height=40, text="Delete task",
                                                    command=self._delete_task_event)
-        self.delete_task.grid(row=0, column=3, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD)
+        self.delete_task.grid(row=0, column=4, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD)
 
         # element to display tasks
         self.task_tabview = customtkinter.CTkTabview(self)
         self.task_tabview.configure(fg_color=("gray76", "gray23"), command=self.render)
-        self.task_tabview.grid(row=1, column=0, columnspan=4, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
+        self.task_tabview.grid(row=1, column=0, columnspan=5, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
 
     def _new_task_event(self) -> None:
         """
@@ -430,6 +701,25 @@ class CTkTaskManager(customtkinter.CTkFrame):
             self._render_task(task_name)
             self._update_task_info(task_name)
 
+    def _load_all_tasks_event(self) -> None:
+        """
+        Load every task from the task directory.
+        """
+
+        # display loading progress while tasks are loaded
+        def progress(done: int, total: int) -> None:
+            if done == total or done % 50 == 0:
+                self.message_display.display_message(f"Loading tasks: {done}/{total}")
+                self.update_idletasks()
+
+        failed = self.robotic_system.load_all_tasks(progress)
+        if failed:
+            self.message_display.display_message(f"Failed to load {len(failed)} task(s): "
+                                                 f"{', '.join(failed)}")
+
+        # render loaded tasks
+        self.render()
+
     def _render_task(self, task_name: str) -> None:
         """
         Render task with given name.
@@ -620,7 +910,7 @@ class CTkOperationManager(customtkinter.CTkFrame):
 
         # configure grid layout of operation_frame
         self.operation_frame.grid_columnconfigure((0, 1, 2), weight=1)
-        self.operation_frame.grid_rowconfigure((0, 2, 5, 8), weight=1)
+        self.operation_frame.grid_rowconfigure((0, 2, 5, 8, 11), weight=1)
         self.operation_frame.configure(fg_color=("gray76", "gray23"))
 
         # button to create a new operation in the selected task
@@ -642,7 +932,8 @@ class CTkOperationManager(customtkinter.CTkFrame):
         self.operation_type_label = customtkinter.CTkLabel(self.operation_frame, text="Type")
         self.operation_type_label.grid(row=3, column=0, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
         self.operation_type = customtkinter.CTkOptionMenu(self.operation_frame, width=120, height=28,
-                                                          values=["move line", "open", "close", "hand-guide"],
+                                                          values=["move line", "move joint", "open", "close",
+                                                                  "hand-guide"],
                                                           command=lambda o: self._operation_change_event())
         self.operation_type.grid(row=4, column=0, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_HALF_Y_PAD)
 
@@ -692,6 +983,21 @@ class CTkOperationManager(customtkinter.CTkFrame):
         self.linear_velocity.configure(fg_color=("gray76", "gray23"))
         self.linear_velocity.grid(row=7, column=2, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD)
 
+        # joint velocity in [%] of the maximum the robot should move at (valid for move joint operations)
+        # and respective label
+        self.relative_velocity_label = customtkinter.CTkLabel(self.operation_frame, text="Joint velocity (%)")
+        self.relative_velocity_label.grid(row=9, column=2, padx=MEDIUM_X_PAD, pady=MEDIUM_HALF_Y_PAD)
+        self.relative_velocity = CTkFloatSpinbox(self.operation_frame, width=100, height=20, max_value=100.0,
+                                                 min_value=1.0, step_size=5, command=self._requires_save)
+        self.relative_velocity.set(RELATIVE_VELOCITY * 100)
+        self.relative_velocity.configure(fg_color=("gray76", "gray23"))
+        self.relative_velocity.grid(row=10, column=2, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD)
+
+        # button to reorder the task's moves reducing the robot's travel
+        self.optimize_order = customtkinter.CTkButton(self.operation_frame, width=120, height=28, text="Optimize order",
+                                                      command=self._optimize_order_event)
+        self.optimize_order.grid(row=10, column=0, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD)
+
         # render the operation management elements
         self.render()
 
@@ -737,6 +1043,10 @@ class CTkOperationManager(customtkinter.CTkFrame):
             requires_save = True
         if operation["tool"] != self.robot_tool.get():
             requires_save = True
+        # only a move joint uses the joint velocity, compared at the precision the spinbox shows
+        relative_velocity = round(operation.get("relative_velocity", RELATIVE_VELOCITY) * 100, 1)
+        if operation["type"] == "move joint" and relative_velocity != round(self.relative_velocity.get(), 1):
+            requires_save = True
 
         # display if operation requires being saved
         if requires_save:
@@ -795,7 +1105,8 @@ class CTkOperationManager(customtkinter.CTkFrame):
         self._requires_save()
 
     def _button_state(self, new_operation: bool, save_operation: bool, delete_operation: bool, operation_type: bool,
-                      position: bool, wait_input: bool, delay: bool, linear_velocity: bool, tool: bool) -> None:
+                      position: bool, wait_input: bool, delay: bool, linear_velocity: bool, tool: bool,
+                      relative_velocity: bool = False) -> None:
         """
         Set button and labels states.
 
@@ -808,10 +1119,12 @@ class CTkOperationManager(customtkinter.CTkFrame):
         :param delay: is delay required
         :param linear_velocity: is linear velocity required
         :param tool: is tool required
+        :param relative_velocity: is joint velocity required
         """
 
         # disable or enable buttons to create, save and delete operations
         self.new_operation.configure(state="normal" if new_operation else "disabled")
+        self.optimize_order.configure(state="normal" if new_operation else "disabled")
         self.save_operation.configure(state="normal" if save_operation else "disabled")
         self.delete_operation.configure(state="normal" if delete_operation else "disabled")
 
@@ -825,6 +1138,8 @@ class CTkOperationManager(customtkinter.CTkFrame):
         self.linear_velocity_label.configure(text_color=['gray10', '#DCE4EE'] if linear_velocity else ["#888888",
                                                                                                        "#777777"])
         self.robot_tool_label.configure(text_color=['gray10', '#DCE4EE'] if tool else ["#888888", "#777777"])
+        self.relative_velocity_label.configure(text_color=['gray10', '#DCE4EE'] if relative_velocity
+                                               else ["#888888", "#777777"])
 
     def _operation_to_str(self, i: int, operation: dict) -> str:
         """
@@ -837,6 +1152,8 @@ class CTkOperationManager(customtkinter.CTkFrame):
 
         if operation["type"] == "move line":
             suffix = f"move to {operation['position']}"
+        elif operation["type"] == "move joint":
+            suffix = f"move joints to {operation['position']}"
         elif operation["type"] == "hand-guide":
             suffix = f"hand-guide with {operation['tool']}"
         else:
@@ -875,6 +1192,11 @@ class CTkOperationManager(customtkinter.CTkFrame):
                 self._button_state(new_operation=True, save_operation=save, delete_operation=True,
                                    operation_type=True, position=True, wait_input=True, delay=True,
                                    linear_velocity=True, tool=False)
+            elif operation_type == "move joint":
+                save = False if self.position.get() == "" or self.position.get() is None else True
+                self._button_state(new_operation=True, save_operation=save, delete_operation=True,
+                                   operation_type=True, position=True, wait_input=True, delay=True,
+                                   linear_velocity=False, tool=False, relative_velocity=True)
 
     def _new_operation_event(self) -> None:
         """
@@ -950,6 +1272,10 @@ class CTkOperationManager(customtkinter.CTkFrame):
         # update displayed information relative to linear velocity
         self.linear_velocity.set(operation["linear_velocity"] if "linear_velocity" in operation else 5)
 
+        # update displayed information relative to joint velocity
+        self.relative_velocity.set(round(operation["relative_velocity"] * 100, 2) if "relative_velocity" in operation
+                                   else RELATIVE_VELOCITY * 100)
+
         # calculate state and render save button state
         self._calculate_state()
         self._requires_save()
@@ -964,6 +1290,7 @@ class CTkOperationManager(customtkinter.CTkFrame):
         operation_type = self.operation_type.get()
         cur_delay = self.delay.get()
         cur_lin_vel = self.linear_velocity.get()
+        cur_rel_vel = self.relative_velocity.get()
 
         # update operation if type is open or close -> required info: type, wait for input, delay
         if operation_type == "open" or operation_type == "close":
@@ -999,10 +1326,48 @@ class CTkOperationManager(customtkinter.CTkFrame):
             except ValueError as e:
                 self.message_display.display_message(e)
 
+        # update operation if type is move joint -> required info: type, position, wait for input, delay, joint velocity
+        elif operation_type == "move joint":
+            try:
+                if cur_delay is not None and cur_rel_vel is not None:
+                    self.robotic_system.update_operation(self.selected_task.get(), index=int(operation_index),
+                                                         position=self.position.get(), operation_type=operation_type,
+                                                         wait_input=bool(self.wait.get()), delay=cur_delay,
+                                                         relative_velocity=cur_rel_vel / 100)
+            except ValueError as e:
+                self.message_display.display_message(e)
+
         # re-render operation and update save button state
         self._render_operation(self.selected_operation.get())
         self.save_operation.configure(fg_color=BLUE_COLORS, hover_color=BLUE_HOVER)
 
+    def _optimize_order_event(self) -> None:
+        """
+        Propose a reordering of the task's moves and apply it if accepted.
+        """
+
+        # compute the reordering
+        try:
+            order, saving = self.robotic_system.optimize_task_order(self.selected_task.get())
+        except ValueError as e:
+            self.message_display.display_message(e)
+            return
+        if saving < MIN_ORDER_SAVING:
+            self.message_display.display_message("No reordering reduces the robot's travel")
+            return
+
+        # ask for confirmation, operations are only reordered in the task (doesn't update the task's file)
+        ok_cancel = CTkOkCancel(text=f"Reordering the moves saves about {saving:.1f} s of travel.\nApply it?",
+                                title="Optimize order", first_button="Apply")
+        if not ok_cancel.get_input():
+            return
+        try:
+            self.robotic_system.apply_task_order(self.selected_task.get(), order)
+        except ValueError as e:
+            self.message_display.display_message(e)
+            return
+        self._render_task(self.selected_task.get())
+
     def _operation_change_event(self) -> None:
         """
         Reflect changes to the operation.
@@ -1105,6 +1470,16 @@ class CTkPositionManager(customtkinter.CTkFrame):
                                              text="Go to", command=self._go_to_point)
         self.go_to.grid(row=6, column=4, columnspan=2, padx=SMALL_X_PAD, pady=SMALL_Y_PAD)
 
+        # option menu to select the tool attached while teaching and button to record a hand-guided path
+        self.teach_tool = customtkinter.CTkOptionMenu(self.labels_frame, width=80, height=28,
+                                                      values=self.robotic_system.get_tool_names(),
+                                                      dynamic_resizing=False)
+        self.teach_tool.set(self.robotic_system.get_tool_names()[0])
+        self.teach_tool.grid(row=6, column=1, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
+        self.teach_path = customtkinter.CTkButton(self.labels_frame, width=80, height=28, text="Teach path",
+                                                  command=self._teach_path_event)
+        self.teach_path.grid(row=6, column=2, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
+
     def render(self) -> None:
         """
         Basic rendering of position elements.
@@ -1234,11 +1609,72 @@ class CTkPositionManager(customtkinter.CTkFrame):
         self._render_task(self.selected_task.get())
         self._render_position(self.selected_position.get())
 
+        # point out an existing position the new one duplicates
+        duplicate = self.robotic_system.find_nearest_position(cartesian, DUPLICATE_ORIENTATION, DUPLICATE_DISTANCE,
+                                                              (self.selected_task.get(), position_name))
+        if duplicate is not None:
+            self.message_display.display_message(f"Position {position_name} is {duplicate[2]:.1f} mm from position "
+                                                 f"{duplicate[1]} of task {duplicate[0]}")
+
+    def _teach_path_event(self) -> None:
+        """
+        Start recording the path the robot is hand-guided along, or stop and add it to the selected task.
+        """
+
+        # stop the session and add the simplified path as move line operations
+        if self.robotic_system.is_teaching():
+            self.teach_path.configure(text="Teach path")
+            try:
+                names = self.robotic_system.stop_teaching(self.selected_task.get())
+            except OSError as e:
+                self.message_display.display_message(e)
+                return
+            except ValueError as e:
+                self.message_display.display_message(e)
+                return
+            self.message_display.display_message(f"Added {len(names)} positions to task {self.selected_task.get()}")
+
+            # re-render task with the new positions
+            if names:
+                self.selected_position.set(names[-1])
+                self._render_task(self.selected_task.get())
+                self._render_position(self.selected_position.get())
+            return
+
+        # check robot connection
+        if not self.robotic_system.is_robot_connected():
+            self.message_display.display_message("Robot communication has not been established")
+            return
+
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
+        # start the session with the selected tool
+        try:
+            tool = self.robotic_system.get_tool_info(self.teach_tool.get())
+            self.robotic_system.start_teaching(tool["weight_of_tool"], tool["centre_of_mass"])
+        except OSError as e:
+            self.message_display.display_message(e)
+            return
+        except ValueError as e:
+            self.message_display.display_message(e)
+            return
+        self.teach_path.configure(text="Stop teaching")
+        self._calculate_state()
+
     def _calculate_state(self) -> None:
         """
         Calculate button states.
         """
 
+        # while teaching only allow to stop the session
+        if self.robotic_system.is_teaching():
+            self._set_button_state(new_position=False, update_delete_position=False)
+            self.teach_path.configure(state="normal")
+            return
+
         # if no task is selected all buttons are disabled
         if self.selected_task.get() == "":
             self._set_button_state(new_position=False, update_delete_position=False)
@@ -1264,6 +1700,7 @@ class CTkPositionManager(customtkinter.CTkFrame):
         self.update_position.configure(state="normal" if update_delete_position else "disabled")
         self.delete_position.configure(state="normal" if update_delete_position else "disabled")
         self.go_to.configure(state="normal" if update_delete_position else "disabled")
+        self.teach_path.configure(state="normal" if new_position else "disabled")
 
     def _update_labels(self, joints: list, coordinates: list) -> None:
         """
@@ -1288,11 +1725,17 @@ class CTkPositionManager(customtkinter.CTkFrame):
             self.message_display.display_message("Robot communication has not been established")
             return
 
+        # the robot is commanded by the program being run
+        if self.robotic_system.is_program_running():
+            self.message_display.display_message("A program is running")
+            return
+
         # send command to move to the selected position
         if self.selected_task.get() != "" and self.selected_position.get() != "":
             try:
                 position = self.robotic_system.get_position(self.selected_task.get(), self.selected_position.get())
-                self.robotic_system.move_robot_line(position["cartesian"], 20)
+                self.robotic_system.move_robot_line(position["cartesian"],
+                                                    self.robotic_system.get_run_velocity("move line", GO_TO_VELOCITY))
 
             except OSError as e:
                 self.message_display.display_message(e)
@@ -1310,16 +1753,20 @@ class CTkProgramManager(customtkinter.CTkFrame):
         self.robotic_system = robotic_system
         self.message_display = message_display
 
-        # frames to display task info
-        self.task_frames = []
+        # future of the program run, None if not running, dialog requested by the run but not shown yet and the
+        # request waiting for the user's answer
+        self.run_future = None
+        self.dialog_request = None
+        self.continue_request = None
+        self.robotic_system.set_dialog_handler(self._ask_to_continue, self._cancel_continue)
 
         # configure grid layout
-        self.grid_rowconfigure((0, 2, 4, 6, 8, 10, 12), weight=1)
+        self.grid_rowconfigure((0, 2, 4, 6, 8, 10, 12, 14), weight=1)
         self.grid_columnconfigure(1, weight=1)
 
         # frame to display the program
         self.program_frame = customtkinter.CTkFrame(self)
-        self.program_frame.grid(row=1, rowspan=11, column=1, padx=MEDIUM_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
+        self.program_frame.grid(row=1, rowspan=13, column=1, padx=MEDIUM_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
 
         # configure grid layout of program_frame
         self.program_frame.grid_columnconfigure((0, 1), weight=1)
@@ -1354,6 +1801,36 @@ class CTkProgramManager(customtkinter.CTkFrame):
         self.run_program.grid(row=9, column=0, padx=MEDIUM_HALF_X_PAD, pady=SMALL_Y_PAD)
         self.run_program.configure(state="disabled")
 
+        # speed of program runs as a percentage of each operation's velocity
+        self.run_settings_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.run_settings_frame.grid(row=11, column=0, padx=MEDIUM_HALF_X_PAD, pady=SMALL_Y_PAD)
+        self.speed_label = customtkinter.CTkLabel(self.run_settings_frame, text="Speed (%)")
+        self.speed_label.grid(row=0, column=0)
+        self.speed_override = CTkFloatSpinbox(self.run_settings_frame, width=120, height=28, max_value=100.0,
+                                              min_value=MIN_SPEED_OVERRIDE * 100,
+                                              step_size=10, command=self._speed_override_event)
+        self.speed_override.set(self.robotic_system.get_speed_override() * 100)
+        self.speed_override.grid(row=1, column=0)
+
+        # signal continuing operations that wait for input: a dialog or a robot input
+        self.wait_input_label = customtkinter.CTkLabel(self.run_settings_frame, text="Continue on")
+        self.wait_input_label.grid(row=2, column=0, pady=SMALL_HALF_Y_PAD)
+        self.wait_input = customtkinter.CTkOptionMenu(self.run_settings_frame, width=120, height=28,
+                                                      values=["Dialog"] + [f"Input {pin}" for pin in INPUT_PINS],
+                                                      command=lambda choice: self._wait_input_event())
+        self.wait_input.grid(row=3, column=0)
+
+        # buttons to pause, resume and abort the program being run
+        self.pause_program = customtkinter.CTkButton(self.run_settings_frame, width=120, height=28, text="Pause",
+                                                     command=self._pause_program_event)
+        self.pause_program.grid(row=4, column=0, pady=SMALL_HALF_Y_PAD)
+        self.pause_program.configure(state="disabled")
+        self.abort_program = customtkinter.CTkButton(self.run_settings_frame, width=120, height=28, text="Abort",
+                                                     fg_color=RED_COLORS, hover_color=RED_HOVER,
+                                                     command=self._abort_program_event)
+        self.abort_program.grid(row=5, column=0, pady=SMALL_HALF_Y_PAD)
+        self.abort_program.configure(state="disabled")
+
         # program display and program name label
         self.program_display = CTkProgramBoxList(self.program_frame, self.robotic_system)
         self.program_display.grid(row=3, column=0, columnspan=2, padx=MEDIUM_X_PAD, pady=BIG_Y_PAD, sticky="nsew")
@@ -1380,18 +1857,15 @@ class CTkProgramManager(customtkinter.CTkFrame):
 
         # legend frame and labels to explain task states
         self.legend_frame = customtkinter.CTkFrame(self)
-        self.legend_frame.grid(row=11, column=0, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
+        self.legend_frame.grid(row=13, column=0, padx=MEDIUM_HALF_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
         self.legend_frame.grid_columnconfigure(0, weight=1)
         self.legend_frame.grid_rowconfigure((0, 2, 4, 6), weight=1)
-        self.green_legend = self._create_frame_task_state(self.legend_frame, "Ready", 0)
-        self.green_legend.configure(fg_color="transparent")
+        self.green_legend = CTkTaskState(self.legend_frame, "Ready", 0, fg_color="transparent")
         self.green_legend.grid(row=1, column=0, padx=SMALL_X_PAD, pady=SMALL_HALF_Y_PAD, sticky="nsew")
-        self.orange_legend = self._create_frame_task_state(self.legend_frame, "Not saved", 1)
+        self.orange_legend = CTkTaskState(self.legend_frame, "Not saved", 1, fg_color="transparent")
         self.orange_legend.grid(row=3, column=0, padx=SMALL_X_PAD, pady=SMALL_HALF_Y_PAD, sticky="nsew")
-        self.orange_legend.configure(fg_color="transparent")
-        self.red_legend = self._create_frame_task_state(self.legend_frame, "Non existent", 2)
+        self.red_legend = CTkTaskState(self.legend_frame, "Non existent", 2, fg_color="transparent")
         self.red_legend.grid(row=5, column=0, padx=SMALL_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
-        self.red_legend.configure(fg_color="transparent")
 
     def _load_program_event(self) -> None:
         """
@@ -1469,6 +1943,29 @@ class CTkProgramManager(customtkinter.CTkFrame):
             self.program_frame.configure(border_color=('gray81', 'gray20'))
             self._calculate_state()
 
+    def _speed_override_event(self) -> None:
+        """
+        Set the speed of program runs from the speed entry.
+        """
+        try:
+            self.robotic_system.set_speed_override(self.speed_override.get() / 100)
+        except ValueError as e:
+            self.message_display.display_message(e)
+
+    def _wait_input_event(self) -> None:
+        """
+        Set the signal continuing operations that wait for input. Waits on a robot input fall back to the dialog once
+        they time out.
+        """
+        choice = self.wait_input.get()
+        if choice == "Dialog":
+            self.robotic_system.clear_wait_input()
+            return
+        try:
+            self.robotic_system.set_wait_input(int(choice.split()[-1]), timeout=WAIT_INPUT_TIMEOUT)
+        except ValueError as e:
+            self.message_display.display_message(e)
+
     def _run_program_event(self) -> None:
         """
         Run currently open program
@@ -1479,9 +1976,53 @@ class CTkProgramManager(customtkinter.CTkFrame):
             self.message_display.display_message("There is no open connection")
             return
 
-        # run program
+        # ask whether to continue a program interrupted by a connection failure
+        resume = False
+        if self.robotic_system.can_resume_program():
+            task, operation = self.robotic_system.get_interrupted_operation()
+            resume = CTkOkCancel(title="Run program", text=f"The program was interrupted at operation {operation + 1} "
+                                                           f"of task {task}.\nContinue from there?",
+                                 first_button="Continue", second_button="Restart").get_input()
+
+        # run program on its own thread, so the window stays responsive and the run can be paused or aborted
+        run_future = Future()
+        self.run_future = run_future
+
+        def run() -> None:
+            try:
+                run_future.set_result(self.robotic_system.run_program(resume))
+            except BaseException as error:
+                run_future.set_exception(error)
+
+        threading.Thread(target=run, name="program-run", daemon=True).start()
+        self._calculate_state()
+        self.after(MOVE_POLL_PERIOD, self._check_run)
+
+    def _check_run(self) -> None:
+        """
+        Show the dialogs requested by the program being run and report its end.
+        """
+
+        # dialogs are shown by the GUI thread, unless the program was aborted meanwhile
+        request = self.dialog_request
+        if request is not None:
+            self.dialog_request = None
+            if not request.done():
+                answer = CTkOkCancel("Continue task", "Ready to continue?", "Continue", "Stop").get_input()
+                try:
+                    request.set_result(answer)
+                except InvalidStateError:
+                    pass
+
+        if not self.run_future.done():
+            self.after(MOVE_POLL_PERIOD, self._check_run)
+            return
+        run_future = self.run_future
+        self.run_future = None
+        self._calculate_state()
+
         try:
-            self.robotic_system.run_program()
+            run_future.result()
         except ValueError as e:
             self.message_display.display_message(e)
             return
@@ -1489,12 +2030,85 @@ class CTkProgramManager(customtkinter.CTkFrame):
             self.message_display.display_message(e)
             return
         except OSError as e:
+            if self.robotic_system.can_resume_program():
+                task, operation = self.robotic_system.get_interrupted_operation()
+                e = f"{e}. Program interrupted at operation {operation + 1} of task {task}, run it again once the " \
+                    f"robot is reconnected to continue"
             self.message_display.display_message(e)
             return
 
+        # report how long an abort took
+        report = self.robotic_system.get_run_report()
+        if report["aborted"]:
+            self.message_display.display_message(f"Program aborted, it stopped {report['stop_latency'] * 1000:.0f} ms "
+                                                 f"after the request")
+
+        # report moves skipped because the robot already was at their target and moves slowed down to the maximum
+        # velocity
+        notes = []
+        if report["skipped_moves"]:
+            notes.append(f"{report['skipped_moves']} of {report['moves']} moves skipped, the robot was already there")
+        if report["capped_moves"]:
+            notes.append(f"{report['capped_moves']} moves limited to the maximum velocity")
+        if report["completed"] and notes:
+            self.message_display.display_message(f"Program run in {report['duration']:.1f} s at "
+                                                 f"{report['speed_override'] * 100:.0f}% speed, " + ", ".join(notes))
+
         # update task info
         self._update_info()
 
+    def _ask_to_continue(self) -> bool:
+        """
+        Ask the user whether to continue the program. Called by the thread running the program, the dialog is shown
+        by the GUI thread.
+
+        :return: True to continue, False to stop the program
+        """
+        if threading.current_thread() is threading.main_thread():
+            return CTkOkCancel("Continue task", "Ready to continue?", "Continue", "Stop").get_input()
+        request = Future()
+        self.continue_request = request
+        self.dialog_request = request
+        return request.result()
+
+    def _cancel_continue(self) -> None:
+        """
+        Answer the pending request to continue with stop, called from any thread when the program is aborted.
+        """
+        request = self.continue_request
+        if request is None:
+            return
+        try:
+            request.set_result(False)
+        except InvalidStateError:
+            pass
+
+    def _pause_program_event(self) -> None:
+        """
+        Pause the program being run once the current operation ends, or resume it.
+        """
+        try:
+            if self.robotic_system.is_program_paused():
+                self.robotic_system.resume_program()
+                self.pause_program.configure(text="Pause")
+            else:
+                self.robotic_system.pause_program()
+                self.pause_program.configure(text="Resume")
+        except ValueError as e:
+            self.message_display.display_message(e)
+
+    def _abort_program_event(self) -> None:
+        """
+        Abort the program being run.
+        """
+        try:
+            self.robotic_system.abort_program()
+        except ValueError as e:
+            self.message_display.display_message(e)
+            return
+        self.pause_program.configure(state="disabled")
+        self.abort_program.configure(state="disabled")
+
     def _render_program(self, program_name: str) -> None:
         """
         Render program.
@@ -1511,6 +2125,17 @@ class CTkProgramManager(customtkinter.CTkFrame):
         Calculate state of buttons.
         """
 
+        # while a program runs it can only be paused or aborted
+        if self.run_future is not None:
+            for button in (self.new_program, self.load_program, self.close_program, self.run_program,
+                           self.add_task_manually, self.available_tasks, self.save_program, self.add_task):
+                button.configure(state="disabled")
+            self.pause_program.configure(state="normal")
+            self.abort_program.configure(state="normal")
+            return
+        self.pause_program.configure(state="disabled", text="Pause")
+        self.abort_program.configure(state="disabled")
+
         # if a program is open activate buttons to add tasks, to save program and to run
         # if no task is selected in available tasks, disable state for button to add tak
         if self.robotic_system.is_program_open():
@@ -1557,19 +2182,27 @@ class CTkProgramManager(customtkinter.CTkFrame):
 
     def _update_info(self) -> None:
         """
-        Update program task related information.
+        Update program task related information. The rendered rows are reconciled with the program, so only
+        inserted, deleted and moved tasks and tasks whose state changed are updated.
         """
 
-        # remove previously rendered tasks
-        while self.task_frames:
-            task_frame = self.task_frames.pop()
-            task_frame.destroy()
-
-        # get tasks from program and render
+        # states are read every time, a task file created or removed on disk changes them without any revision
         tasks, states = self.robotic_system.get_tasks_and_states_from_program()
-        for task, state in zip(tasks, states):
-            self.task_frames.append(self._create_frame_task_state(self.program_display, task, state))
-        self.program_display.update_elements(self.task_frames)
+        rows = list(zip(tasks, states))
+        rendered = self.program_display.items
+        if rows == rendered:
+            return
+
+        # match rendered rows and program tasks by name, apply changes from the end so indexes remain valid
+        matcher = difflib.SequenceMatcher(None, [task for task, _ in rendered], tasks, autojunk=False)
+        for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    if rendered[i] != rows[j]:
+                        self.program_display.update_item(i, rows[j], refresh=False)
+            else:
+                self.program_display.splice_items(i1, i2, rows[j1:j2], refresh=False)
+        self.program_display.refresh()
 
     def _add_task_manually_event(self) -> None:
         """
@@ -1605,9 +2238,8 @@ class CTkProgramManager(customtkinter.CTkFrame):
             self.message_display.display_message(e)
             return
 
-        # create task representation and add to display
-        frame = self._create_frame_task_state(self.program_display, task_name, state)
-        self.program_display.insert_element(frame)
+        # add task representation to display
+        self.program_display.insert_item((task_name, state))
 
     def _save_program_event(self) -> None:
         """
@@ -1621,39 +2253,6 @@ class CTkProgramManager(customtkinter.CTkFrame):
             self.message_display.display_message(e)
             return
 
-    def _create_frame_task_state(self, frame_parent, task: str, state: int) -> \
-            customtkinter.CTkFrame:
-        """
-        Create frame in the passed in parent frame containing the given task and state.
-
-        :param frame_parent: element where the new frame should be rendered
-        :param task: name of the task
-        :param state: state of the task (0 if exists, 1 if exists and not up to date, 2 if does not exist)
-        """
-
-        # create new frame
-        new_frame = customtkinter.CTkFrame(frame_parent, height=28, width=200)
-
-        # configure grid layout of new_frame
-        new_frame.grid_columnconfigure(1, weight=1)
-        new_frame.grid_rowconfigure(0, weight=1)
-
-        # label to indicate state
-        state_label = customtkinter.CTkLabel(new_frame, text="", width=20, height=20, corner_radius=10)
-        if state == 0:
-            state_label.configure(fg_color=GREEN_COLORS)
-        elif state == 1:
-            state_label.configure(fg_color=ORANGE_COLORS)
-        elif state == 2:
-            state_label.configure(fg_color=RED_COLORS)
-
-        # label to display the task name
-        task_name_label = customtkinter.CTkLabel(new_frame, text=task, anchor="w")
-        state_label.grid(row=0, column=0, padx=SMALL_HALF_X_PAD, pady=SMALL_Y_PAD)
-        task_name_label.grid(row=0, column=1, padx=SMALL_X_PAD, pady=SMALL_Y_PAD, sticky="nsew")
-
-        return new_frame
-
     def _selected_task_event(self) -> None:
         """
         Calculate state when a new task is selected.
@@ -1663,6 +2262,14 @@ class CTkProgramManager(customtkinter.CTkFrame):
 
 # Tab with the multiple interfaces to control the robot and edit tasks, operations and positions
 class CTkTabViewer(customtkinter.CTkFrame):
+    # manager class rendered in each tab
+    MANAGER_CLASSES = {
+        "Manage tasks": CTkTaskManager,
+        "Manage operations": CTkOperationManager,
+        "Manage positions": CTkPositionManager,
+        "Program": CTkProgramManager
+    }
+
     def __init__(self, master, robotic_system: RoboticSystem, message_display: CTkMessageDisplay):
         super().__init__(master)
 
@@ -1676,55 +2283,36 @@ class CTkTabViewer(customtkinter.CTkFrame):
         # create tabview with tabs for the multiple sections
         self.tabview = customtkinter.CTkTabview(self)
         self.tabview.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=BIG_Y_PAD, sticky="nsew")
-        self.tabview.add("Manage tasks")
-        self.tabview.add("Manage operations")
-        self.tabview.add("Manage positions")
-        self.tabview.add("Program")
-
-        # configure grid layout for each tab
-        self.tabview.tab("Manage tasks").grid_rowconfigure(0, weight=1)
-        self.tabview.tab("Manage tasks").grid_columnconfigure(0, weight=1)
-        self.tabview.tab("Manage operations").grid_rowconfigure(0, weight=1)
-        self.tabview.tab("Manage operations").grid_columnconfigure(0, weight=1)
-        self.tabview.tab("Manage positions").grid_rowconfigure(0, weight=1)
-        self.tabview.tab("Manage positions").grid_columnconfigure(0, weight=1)
-        self.tabview.tab("Program").grid_rowconfigure(0, weight=1)
-        self.tabview.tab("Program").grid_columnconfigure(0, weight=1)
-
-        # render elements for task management
-        self.task_manager = CTkTaskManager(self.tabview.tab("Manage tasks"), self.robotic_system, self.message_display)
-        self.task_manager.configure(fg_color="transparent")
-        self.task_manager.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
-
-        # render elements for operation management
-        self.operation_manager = CTkOperationManager(self.tabview.tab("Manage operations"), self.robotic_system,
-                                                     self.message_display)
-        self.operation_manager.configure(fg_color="transparent")
-        self.operation_manager.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
-
-        # render elements for position management
-        self.position_manager = CTkPositionManager(self.tabview.tab("Manage positions"), self.robotic_system,
-                                                   self.message_display)
-        self.position_manager.configure(fg_color="transparent")
-        self.position_manager.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
-
-        # render elements for program management
-        self.program_manager = CTkProgramManager(self.tabview.tab("Program"), self.robotic_system, self.message_display)
-        self.program_manager.configure(fg_color="transparent")
-        self.program_manager.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
+        for tab in self.MANAGER_CLASSES:
+            self.tabview.add(tab)
+
+            # configure grid layout for each tab
+            self.tabview.tab(tab).grid_rowconfigure(0, weight=1)
+            self.tabview.tab(tab).grid_columnconfigure(0, weight=1)
+
+        # managers are only built when their tab is first visited, start with the selected tab
+        self.managers = {}
+        self._get_manager(self.tabview.get())
 
         self.tabview.configure(command=self.render)
 
+    def _get_manager(self, tab: str) -> customtkinter.CTkFrame:
+        """
+        Get the manager of the given tab, building it on the first visit.
+
+        :param tab: name of the tab
+        :return: manager rendered in the tab
+        """
+        if tab not in self.managers:
+            manager = self.MANAGER_CLASSES[tab](self.tabview.tab(tab), self.robotic_system, self.message_display)
+            manager.configure(fg_color="transparent")
+            manager.grid(row=0, column=0, padx=MEDIUM_X_PAD, pady=MEDIUM_Y_PAD, sticky="nsew")
+            self.managers[tab] = manager
+        return self.managers[tab]
+
     def render(self) -> None:
         """
         Update rendering of elements when changing tabs.
         """
 
-        if self.tabview.get() == "Manage tasks":
-            self.task_manager.render()
-        elif self.tabview.get() == "Manage operations":
-            self.operation_manager.render()
-        elif self.tabview.get() == "Manage positions":
-            self.position_manager.render()
-        elif self.tabview.get() == "Program":
-            self.program_manager.render()
+        self._get_manager(self.tabview.get()).render()
@@ -1,7 +1,17 @@
 import json
 import time
+from concurrent.futures import Future
 
-import iiwaPy3.python_client.iiwaPy3
+from command_multiplexer import CommandMultiplexer
+from connection_supervisor import ConnectionSupervisor, DEAD_LINK_TIMEOUT
+from io_image import IOImage
+from jog_queue import JogQueue
+from jog_streamer import JogStreamer
+
+# time in seconds the gripper takes to open or close
+GRIPPER_TIME = 0.5
+# time in seconds between releasing one valve of the gripper and energizing the other
+GRIPPER_GAP = 0.1
 
 
 class RobotCommunication:
@@ -11,7 +21,24 @@ class RobotCommunication:
 
     def __init__(self, tool_file: str):
         self.connection = None
+        self.supervisor = None
+        self.jog = None
+        self.jog_future = None
+        self.teaching = None
+        self.teaching_future = None
+        self.path = None
+        self.jog_queue = JogQueue(lambda job: self.connection.submit(job))
+        self.io = IOImage(lambda job: self.submit(job))
         self.tools = {}
+
+        # parameters of the last connection, used to reconnect
+        self.ip = None
+        self.port = None
+        self.tcp_transform = (0, 0, 0, 0, 0, 0)
+        self.dead_link_timeout = DEAD_LINK_TIMEOUT
+
+        # target of the last movement confirmed by the robot, None once the robot may have moved elsewhere
+        self.last_pose = None
         try:
             self.import_tools(tool_file)
         except OSError:
@@ -68,11 +95,16 @@ class RobotCommunication:
             except TypeError:
                 raise TypeError(f"Centre of mass values for tool {tool} must be numeric")
 
-    def start_connection(self, ip: str) -> str:
+    def start_connection(self, ip: str, port: int = 30001, tcp_transform: tuple = (0, 0, 0, 0, 0, 0),
+                         supervise: bool = True, dead_link_timeout: float = DEAD_LINK_TIMEOUT) -> str:
         """
         Initiate connection with kuka robot.
 
         :param ip: ip of robot to connect to
+        :param port: port of the KUKA Sunrise server
+        :param tcp_transform: TCP transform in the flange frame (x, y, z, alfa, beta, gamma) in [mm] and [rad]
+        :param supervise: if True the connection is supervised and reopened when the link drops
+        :param dead_link_timeout: time in seconds after which a silent link is considered dead, even during a command
         :return: return validated ip
         """
         try:
@@ -80,21 +112,61 @@ class RobotCommunication:
         except ValueError:
             raise
 
+        self.ip = ip
+        self.port = port
+        self.tcp_transform = tuple(tcp_transform)
+        self.dead_link_timeout = dead_link_timeout
         try:
-            self.connection = iiwaPy3.python_client.iiwaPy3.iiwaPy3(ip)
-
-            # Check if connection is up
-            self.connection.getJointsPos()
+            self.reconnect()
         except OSError:
             self.connection = None
             raise OSError("Connection failed")
 
+        if supervise:
+            self.supervisor = ConnectionSupervisor(self, dead_link_timeout=dead_link_timeout)
+            self.supervisor.start()
         return ip
 
+    def reconnect(self) -> None:
+        """
+        Open a new connection with the parameters of the last one, mounting the same TCP transform.
+        """
+        # the robot client (and NumPy with it) is only imported once a connection is requested
+        from iiwaPy3.python_client.iiwaPy3 import iiwaPy3
+
+        # every thread shares the connection through the multiplexer, which serializes the commands, the socket
+        # fails once the link stays silent too long, so a command waiting for a dead robot never blocks forever
+        connection = CommandMultiplexer(iiwaPy3(self.ip, self.tcp_transform, port=self.port, verbose=False,
+                                                link_timeout=self.dead_link_timeout))
+
+        # the robot may have been moved and its outputs switched while the link was down
+        self.last_pose = None
+        self.io.clear()
+
+        # Check if connection is up
+        try:
+            connection.getJointsPos()
+        except OSError:
+            connection.abort()
+            raise
+        self.connection = connection
+
+    def drop_connection(self) -> None:
+        """
+        Drop the current connection at once, commands waiting for the robot fail.
+        """
+        self.last_pose = None
+        self.io.clear()
+        if self.connection is not None:
+            self.connection.abort()
+
     def stop_connection(self) -> None:
         """
         Stop communication to Kuka robot.
         """
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            self.supervisor = None
         try:
             self.connection.close()
         except OSError as e:
@@ -110,6 +182,18 @@ class RobotCommunication:
         """
         return self.connection is not None
 
+    def get_link_status(self) -> dict:
+        """
+        Get status of the link with the robot.
+
+        :return: state ("up", "reconnecting" or "down"), last round trip time in seconds, number of reconnections
+        and failed attempts since the link went down
+        """
+        if self.supervisor is not None:
+            return self.supervisor.get_status()
+        state = "up" if self.is_connected() and not self.connection.is_closed() else "down"
+        return {"state": state, "rtt": None, "reconnections": 0, "failed_attempts": 0}
+
     def get_position(self) -> tuple:
         """
         Get current robot position.
@@ -124,6 +208,15 @@ class RobotCommunication:
 
         return cartesian, joints
 
+    def get_last_pose(self) -> dict:
+        """
+        Get the target of the last movement confirmed by the robot, without querying the robot.
+
+        :return: cartesian coordinates and joint positions of the target (None if not known), None if the robot may
+        have moved since
+        """
+        return self.last_pose
+
     def _validate_ip(self, ip: str) -> str:
         """
         Validate given ip.
@@ -148,12 +241,14 @@ class RobotCommunication:
                 raise ValueError("Ip values must be in the range [0, 255]")
         return ".".join(ip)
 
-    def move_robot(self, position: list, velocity: float) -> None:
+    def move_robot(self, position: list, velocity: float, wait: bool = True) -> Future:
         """
         Move robot's EEF the given amount relative to the base at the given speed.
 
         :param position: EEF position shift relative to base [x, y, z]
         :param velocity: velocity in [mm/s]
+        :param wait: if True return once the movement ends, otherwise return at once
+        :return: future of the movement if not waiting
         """
 
         # check position is a size 3 vector
@@ -171,8 +266,108 @@ class RobotCommunication:
 
         # send move command
         if self.is_connected():
+            self.last_pose = None
+            if not wait:
+                return self.connection.submit("movePTPLineEefRelBase", position, [velocity])
             self.connection.movePTPLineEefRelBase(position, [velocity])
 
+    def submit(self, command, *args, priority: int = None) -> Future:
+        """
+        Submit a command to the thread owning the connection without waiting for it.
+
+        :param command: name of a connection method, or function receiving the connection as first argument
+        :param args: arguments of the command
+        :param priority: priority of the command, by default taken from the method name
+        :return: future with the result of the command
+        """
+        if not self.is_connected():
+            raise OSError("There is no connection")
+        return self.connection.submit(command, *args, priority=priority)
+
+    def queue_move(self, position: list, velocity: float) -> Future:
+        """
+        Request a movement of robot's EEF relative to the base without waiting. Requests made while the robot is
+        busy are merged into a single movement, dropping pending offsets of axes whose direction is reversed.
+
+        :param position: EEF position shift relative to base [x, y, z]
+        :param velocity: velocity in [mm/s]
+        :return: future completed once the movement carrying this request ends
+        """
+
+        # check position is a size 3 vector
+        if len(position) != 3:
+            raise ValueError("Position must be a vector with size 3 [X, Y, Z]")
+
+        # check if position contains only numeric values
+        for element in position:
+            if not isinstance(element, float) and not isinstance(element, int):
+                raise ValueError("Position must be a vector of numeric values")
+
+        # check positive velocity
+        if velocity < 0.1:
+            raise ValueError("Velocity must be at least 0.1")
+
+        if not self.is_connected():
+            raise OSError("There is no connection")
+        self.last_pose = None
+        return self.jog_queue.add(position, velocity)
+
+    def start_jog(self, direction: list, velocity: float) -> None:
+        """
+        Start moving robot's EEF continuously in the given direction until stop_jog is called, refresh_jog must be
+        called regularly meanwhile.
+
+        :param direction: direction of the movement relative to base [x, y, z]
+        :param velocity: velocity in [mm/s]
+        """
+
+        # check direction is a size 3 vector
+        if len(direction) != 3:
+            raise ValueError("Direction must be a vector with size 3 [X, Y, Z]")
+
+        # check if direction contains only numeric values
+        for element in direction:
+            if not isinstance(element, float) and not isinstance(element, int):
+                raise ValueError("Direction must be a vector of numeric values")
+
+        # check positive velocity
+        if velocity < 0.1:
+            raise ValueError("Velocity must be at least 0.1")
+
+        if not self.is_connected():
+            raise OSError("There is no connection")
+
+        # setpoints are streamed by the thread owning the connection, the caller is not blocked
+        self.stop_jog()
+        self.last_pose = None
+        self.jog = JogStreamer(direction, velocity)
+        self.jog_future = self.connection.submit(self.jog)
+
+    def refresh_jog(self) -> bool:
+        """
+        Confirm the jog is still held, otherwise the robot stops on its own shortly after.
+
+        :return: True if the robot is still jogging
+        """
+        if self.jog is None or self.jog.is_released():
+            return False
+        self.jog.refresh()
+        return True
+
+    def stop_jog(self) -> Future:
+        """
+        Stop moving robot's EEF continuously, the robot ramps down to a stop.
+
+        :return: future completed once the robot stops, None if not jogging
+        """
+        if self.jog is None:
+            return None
+        self.jog.release()
+        future = self.jog_future
+        self.jog = None
+        self.jog_future = None
+        return future
+
     def move_robot_line(self, position: list, velocity: float) -> None:
         """
         Move robot to the given position at the gicen speed.
@@ -196,12 +391,167 @@ class RobotCommunication:
 
         # send command to move robot
         if self.is_connected():
+            self.last_pose = None
             self.connection.movePTPLineEEF(position, [velocity])
+            self.last_pose = {"cartesian": list(position), "joints": None}
+
+    def move_robot_path(self, positions: list, velocities: list) -> None:
+        """
+        Move robot through the given positions in one continuous motion, rounding the intermediate positions.
+
+        :param positions: positions to go through [x, y, z, a, b, c], the last one is reached exactly
+        :param velocities: velocity in [mm/s] of the movement to each position
+        """
+
+        # check there is a velocity for each position
+        if len(positions) != len(velocities):
+            raise ValueError("There must be one velocity per position")
+
+        # check each position is a size 6 vector of numeric values
+        for position in positions:
+            if len(position) != 6:
+                raise ValueError("Position must be a vector with size 6 [X, Y, Z, A, B, C]")
+            for element in position:
+                if not isinstance(element, float) and not isinstance(element, int):
+                    raise ValueError("Position must be a vector of numeric values")
+
+        # check if velocities are positive
+        for velocity in velocities:
+            if velocity < 0.1:
+                raise ValueError("Velocity must be at least 0.1")
+
+        # the path (and NumPy with it) is only imported once a blended movement is requested
+        from path_streamer import PathStreamer
+
+        # setpoints are streamed by the thread owning the connection, wait until the last position is reached
+        if self.is_connected():
+            self.stop_jog()
+            self.last_pose = None
+            self.path = PathStreamer(positions, velocities)
+            try:
+                self.connection.call(self.path)
+                if not self.path.is_stopped():
+                    self.last_pose = {"cartesian": list(positions[-1]), "joints": None}
+            finally:
+                self.path = None
+
+    def stop_path(self) -> bool:
+        """
+        Stop the continuous motion being streamed, the robot holds the last setpoint sent. Other motions can not be
+        stopped, the robot controller has no command to stop them.
+
+        :return: True if a motion was stopped
+        """
+        path = self.path
+        if path is None:
+            return False
+        path.stop()
+        return True
+
+    def move_robot_joint(self, joints: list, relative_velocity: float) -> None:
+        """
+        Move robot to the given joint positions, interpolating in joint space.
+
+        :param joints: final joint positions of the robot [j0, ..., j6] in [rad]
+        :param relative_velocity: joint velocity as a fraction of the maximum, in ]0, 1]
+        """
+
+        # check joints is a size 7 vector
+        if len(joints) != 7:
+            raise ValueError("Joints must be a vector with size 7")
+
+        # check if joints contains only numeric values
+        for element in joints:
+            if not isinstance(element, float) and not isinstance(element, int):
+                raise ValueError("Joints must be a vector of numeric values")
+
+        # check if relative velocity is a valid fraction
+        if relative_velocity <= 0 or relative_velocity > 1:
+            raise ValueError("Relative velocity must be in the range ]0, 1]")
+
+        # send command to move robot
+        if self.is_connected():
+            self.last_pose = None
+            self.connection.movePTPJointSpace(joints, [relative_velocity])
+            self.last_pose = {"cartesian": None, "joints": list(joints)}
 
     def hand_guide(self, weight_of_tool: float, centre_of_mass: list) -> None:
         """
         Start hand-guiding mode.
 
+        :param weight_of_tool: weight of the tool in Newtons
+        :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
+        """
+        try:
+            self._validate_tool(weight_of_tool, centre_of_mass)
+        except ValueError:
+            raise
+
+        # send command to start hand-guiding
+        self.last_pose = None
+        try:
+            self.connection.preciseHandGuiding(weight_tool=weight_of_tool, centre_mass=centre_of_mass)
+        except OSError:
+            raise
+
+    def start_teaching(self, weight_of_tool: float, centre_of_mass: list) -> None:
+        """
+        Start a hand-guiding session recording the path of the robot until stop_teaching is called.
+
+        :param weight_of_tool: weight of the tool in Newtons
+        :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
+        """
+        try:
+            self._validate_tool(weight_of_tool, centre_of_mass)
+        except ValueError:
+            raise
+
+        if not self.is_connected():
+            raise OSError("There is no connection")
+        if self.teaching is not None:
+            raise ValueError("A hand-guiding session is already running")
+
+        # the teaching session (and NumPy with it) is only imported once a session is requested
+        from teaching_session import TeachingSession
+
+        # the path is recorded by the thread owning the connection, the caller is not blocked
+        self.stop_jog()
+        self.last_pose = None
+        self.teaching = TeachingSession(weight_of_tool, centre_of_mass)
+        self.teaching_future = self.connection.submit(self.teaching)
+
+    def stop_teaching(self) -> tuple:
+        """
+        Stop the hand-guiding session and get the recorded path.
+
+        :return: cartesian coordinates and joint positions, one sample per row
+        """
+        if self.teaching is None:
+            raise ValueError("There is no hand-guiding session running")
+        teaching = self.teaching
+        future = self.teaching_future
+        self.teaching = None
+        self.teaching_future = None
+
+        teaching.release()
+        try:
+            future.result()
+        except OSError:
+            raise
+        return teaching.get_samples()
+
+    def is_teaching(self) -> bool:
+        """
+        Check if a hand-guiding session is running.
+
+        :return: True if the path of the robot is being recorded
+        """
+        return self.teaching is not None
+
+    def _validate_tool(self, weight_of_tool: float, centre_of_mass: list) -> None:
+        """
+        Validate weight and centre of mass of a tool.
+
         :param weight_of_tool: weight of the tool in Newtons
         :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
         """
@@ -223,29 +573,66 @@ class RobotCommunication:
         if centre_of_mass[2] < 0:
             raise ValueError("Coordinate z of centre of mass must be positive")
 
-        # send command to start hand-guiding
+    def read_inputs(self, max_age: float = None) -> tuple[int, float]:
+        """
+        Get every digital input of the robot, read by a single job with no other command in between.
+
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: bitmask of the inputs, bit n being pin n, and the time they were read
+        """
+        return self.io.read_inputs(max_age)
+
+    def get_input(self, pin: int, max_age: float = None) -> bool:
+        """
+        Get the state of a digital input of the robot.
+
+        :param pin: number of the pin
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: True if the pin is on
+        """
         try:
-            self.connection.preciseHandGuiding(weight_tool=weight_of_tool, centre_mass=centre_of_mass)
-        except OSError:
+            return self.io.get_input(pin, max_age)
+        except ValueError:
+            raise
+
+    def write_outputs(self, states: dict, force: bool = False) -> Future:
+        """
+        Request digital output states without waiting. Requests made while the robot is busy are written by a
+        single job, and pins already in the requested state are not written unless forced.
+
+        :param states: state of each pin to write, True for on
+        :param force: if True the pins are written even if already in the requested state
+        :return: future with the number of pins written
+        """
+        try:
+            return self.io.write_outputs(states, force)
+        except ValueError:
             raise
 
     def open_gripper(self) -> None:
         """
-        Open gripper (Pin 11).
+        Open gripper (Pin 11). Pin 1 is switched off first.
         """
-        self.connection.setPin1Off()
-        time.sleep(0.1)
-        self.connection.setPin11On()
-        time.sleep(0.5)
+        self._switch_gripper(1, 11)
 
     def close_gripper(self) -> None:
         """
-        Close gripper (Pin1).
+        Close gripper (Pin1). Pin 11 is switched off first.
+        """
+        self._switch_gripper(11, 1)
+
+    def _switch_gripper(self, released_pin: int, energized_pin: int) -> None:
+        """
+        Release one valve of the gripper, energize the other and wait for the gripper to move.
+
+        :param released_pin: pin switched off
+        :param energized_pin: pin switched on
         """
-        self.connection.setPin11Off()
-        time.sleep(0.1)
-        self.connection.setPin1On()
-        time.sleep(0.5)
+        # the pins are always written, they may have been switched outside the image, e.g. from the smartPAD
+        self.write_outputs({released_pin: False}, force=True).result()
+        time.sleep(GRIPPER_GAP)
+        self.write_outputs({energized_pin: True}, force=True).result()
+        time.sleep(GRIPPER_TIME)
 
     def get_tool_names(self) -> list:
         """
@@ -0,0 +1,239 @@
+import socket
+import threading
+import time
+
+# delay between the acknowledgement of a motion and its confirmation, keeps both replies in separate reads
+MIN_MOTION_TIME = 0.01
+
+
+class RobotStandIn:
+    """
+    Local stand-in for the KUKA Sunrise server. Speaks the subset of the iiwaPy3 text protocol used by the
+    application so that connections, programs and robotic cells can be exercised without a robot.
+    Motions are not simulated, the commanded position is reached after motion_time seconds.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 30001, motion_time: float = 0.05):
+        self.host = host
+        self.port = port
+        self.motion_time = max(motion_time, MIN_MOTION_TIME)
+
+        self.cartesian = [0.0, 0.0, 500.0, 0.0, 0.0, 0.0]
+        self.joints = [0.0] * 7
+        self.pins = {}
+        self.commands = []
+
+        self._target_cartesian = [0.0] * 6
+        self._target_joints = [0.0] * 7
+        self._lock = threading.Lock()
+        self._server = None
+        self._client = None
+        self._thread = None
+        self._running = threading.Event()
+
+    def start(self) -> int:
+        """
+        Start listening for a client on a background thread.
+
+        :return: port the stand-in is listening on, useful when created with port 0
+        """
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._running.set()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self) -> None:
+        """
+        Stop listening and close the server socket.
+        """
+        self._running.clear()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def drop_client(self) -> None:
+        """
+        Drop the connection with the current client, as a network failure would.
+        """
+        client = self._client
+        if client is not None:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def set_input(self, pin: int, state: bool) -> None:
+        """
+        Set the state of a digital input read by the client through getPin<pin>.
+
+        :param pin: number of the pin
+        :param state: True if pin is on
+        """
+        with self._lock:
+            self.pins[pin] = state
+
+    def get_output(self, pin: int) -> bool:
+        """
+        Get the state of a digital output set by the client.
+
+        :param pin: number of the pin
+        :return: True if pin is on
+        """
+        with self._lock:
+            return self.pins.get(pin, False)
+
+    def _serve(self) -> None:
+        """
+        Accept clients one at a time, as the real server does.
+        """
+        while self._running.is_set():
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            self._client = client
+            with client:
+                self._handle_client(client)
+            self._client = None
+
+    def _handle_client(self, client: socket.socket) -> None:
+        """
+        Read newline terminated commands from client and reply to each one.
+
+        :param client: connected client socket
+        """
+        buffer = b""
+        while self._running.is_set():
+            try:
+                data = client.recv(1024)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                command = line.decode("utf-8").strip()
+
+                # some client commands are terminated by two newlines, the empty line gets no reply
+                if not command:
+                    continue
+                if command == "end":
+                    return
+                try:
+                    for reply in self._execute(command):
+                        client.sendall(reply.encode("utf-8"))
+                except OSError:
+                    return
+
+    def _execute(self, command: str):
+        """
+        Execute command and generate the replies to send back.
+
+        :param command: command received without line terminator
+        :return: generator of replies
+        """
+        with self._lock:
+            self.commands.append(command)
+        name, _, arguments = command.partition("_")
+        try:
+            values = [float(value) for value in arguments.split("_") if value]
+        except ValueError:
+            values = []
+
+        # getters
+        if command == "Eef_pos":
+            yield self._format(self.cartesian)
+        elif command == "getJointsPositions":
+            yield self._format(self.joints)
+        elif command in ("Torques_ext_J", "Torques_m_J"):
+            yield self._format([0.0] * 7)
+        elif command in ("Eef_force", "Eef_moment"):
+            yield self._format([0.0] * 3)
+        elif command.startswith("getPin"):
+            with self._lock:
+                state = self.pins.get(int(command[len("getPin"):]), False)
+            yield f"{int(state)}\n"
+
+        # digital outputs
+        elif command.startswith("pin"):
+            pin = command[len("pin"):]
+            with self._lock:
+                if pin.endswith("on"):
+                    self.pins[int(pin[:-2])] = True
+                else:
+                    self.pins[int(pin[:-3])] = False
+            yield "done\n"
+
+        # targets for the next motion
+        elif name == "cArtixanPosition":
+            self._target_cartesian = values[:6]
+            yield "done\n"
+        elif name == "jp":
+            self._target_joints = values[:7]
+            yield "done\n"
+
+        # blocking motions are acknowledged first and confirmed once finished
+        elif command.startswith("doPTPinCS") or command == "doPTPinJS":
+            yield "done\n"
+            time.sleep(self.motion_time)
+            with self._lock:
+                if command == "doPTPinJS":
+                    self.joints = list(self._target_joints)
+                elif command.startswith("doPTPinCSRel"):
+                    self.cartesian = [self.cartesian[i] + self._target_cartesian[i] for i in range(6)]
+                else:
+                    self.cartesian = list(self._target_cartesian)
+            yield "done\n"
+
+        # servo setpoints, with or without feedback
+        elif name in ("DcSeCarW", "DcSeCarEEfP", "DcSeCarJP", "DcSeCarExT", "DcSeCarMT", "DcSeCarEEfFrelEEF"):
+            with self._lock:
+                self.cartesian = values[:6]
+            yield self._feedback(name)
+        elif name in ("jpJP", "jpEEfP", "jpExT", "jpMT"):
+            with self._lock:
+                self.joints = values[:7]
+            yield self._feedback(name)
+
+        # hand guiding finishes immediately
+        elif name == "preciseHandGuiding1":
+            time.sleep(self.motion_time)
+            yield "done\n"
+
+        # remaining commands (TCP transform, servo and impedance start/stop, velocity) are acknowledged
+        else:
+            yield "done\n"
+
+    def _feedback(self, name: str) -> str:
+        """
+        Build feedback reply of a servo command.
+
+        :param name: name of the servo command
+        :return: reply with the requested feedback
+        """
+        if name in ("DcSeCarEEfP", "jpEEfP", "DcSeCarEEfFrelEEF"):
+            return self._format(self.cartesian)
+        if name in ("DcSeCarJP", "jpJP"):
+            return self._format(self.joints)
+        if name in ("DcSeCarExT", "DcSeCarMT", "jpExT", "jpMT"):
+            return self._format([0.0] * 7)
+        return "done\n"
+
+    def _format(self, values: list) -> str:
+        """
+        Format values the way the server does.
+
+        :param values: values to send
+        :return: values separated and terminated by underscores
+        """
+        with self._lock:
+            return "".join(f"{value}_" for value in values) + "\n"
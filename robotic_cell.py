@@ -0,0 +1,222 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from robotic_system import RoboticSystem
+
+# maximum time in seconds a robot waits at a synchronization point for the other robots
+SYNC_TIMEOUT = 60
+
+
+class RoboticCell:
+    """
+    Class to manage a cell with several robots, each one with its own connection, tasks and open program.
+    Programs run concurrently, one worker per robot. Operations with "wait" become synchronization points: a robot
+    reaching one waits until every robot of the run reaches one. Programs of a run must therefore have the same
+    number of synchronization points, otherwise the remaining robots stop once sync_timeout expires.
+    """
+
+    def __init__(self, sync_timeout: float = SYNC_TIMEOUT):
+        self.robots = {}
+        self.status = {}
+        self.sync_timeout = sync_timeout
+        self._barrier = None
+        self._lock = threading.Lock()
+
+    def add_robot(self, name: str, robotic_system: RoboticSystem) -> None:
+        """
+        Add robot to the cell.
+
+        :param name: name of the robot
+        :param robotic_system: system managing the robot, its tasks and its program
+        """
+        if name in self.robots:
+            raise ValueError(f"Robot {name} already exists")
+        self.robots[name] = robotic_system
+        self.status[name] = self._new_status()
+
+    def remove_robot(self, name: str) -> None:
+        """
+        Remove robot from the cell, closing its connection if open.
+
+        :param name: name of the robot
+        """
+        robotic_system = self.get_robot(name)
+        if robotic_system.is_robot_connected():
+            robotic_system.stop_robot_connection()
+        del self.robots[name]
+        del self.status[name]
+
+    def get_robot(self, name: str) -> RoboticSystem:
+        """
+        Get system managing a robot.
+
+        :param name: name of the robot
+        :return: system managing the robot
+        """
+        if name not in self.robots:
+            raise ValueError(f"There is no robot {name}")
+        return self.robots[name]
+
+    def get_robot_names(self) -> list:
+        """
+        Get names of the robots in the cell.
+
+        :return: names of the robots
+        """
+        return list(self.robots.keys())
+
+    def connect_all(self, addresses: dict) -> dict:
+        """
+        Connect to several robots at the same time.
+
+        :param addresses: robot name -> (ip, port)
+        :return: robot name -> error message, for the robots that failed to connect
+        """
+        for name in addresses:
+            self.get_robot(name)
+
+        def connect(name):
+            ip, port = addresses[name]
+            self.robots[name].start_robot_connection(ip, port)
+
+        return self._run_on_all(connect, list(addresses.keys()))
+
+    def disconnect_all(self) -> dict:
+        """
+        Close connections to every connected robot.
+
+        :return: robot name -> error message, for the robots that failed to disconnect
+        """
+        names = [name for name in self.robots if self.robots[name].is_robot_connected()]
+        return self._run_on_all(lambda name: self.robots[name].stop_robot_connection(), names)
+
+    def run_programs(self, names: list = None) -> dict:
+        """
+        Run the open program of each robot, all at the same time.
+        Blocks until every program finishes, stops or fails. If a program stops or fails, robots waiting at a
+        synchronization point are released and their programs stopped.
+
+        :param names: names of the robots to run, all robots if None
+        :return: status of each robot run
+        """
+        if names is None:
+            names = self.get_robot_names()
+        for name in names:
+            if not self.get_robot(name).is_robot_connected():
+                raise OSError(f"Robot {name} is not connected")
+            if not self.robots[name].is_program_open():
+                raise ValueError(f"Robot {name} has no open program")
+
+        self._barrier = threading.Barrier(len(names), timeout=self.sync_timeout)
+        for name in names:
+            with self._lock:
+                self.status[name] = self._new_status()
+            self.robots[name].set_wait_handler(lambda robot=name: self.synchronize(robot))
+
+        try:
+            self._run_on_all(self._run_program, names)
+        finally:
+            for name in names:
+                self.robots[name].set_wait_handler(None)
+            self._barrier = None
+
+        return {name: self.get_status(name) for name in names}
+
+    def synchronize(self, name: str) -> bool:
+        """
+        Wait at the synchronization point until every robot of the run reaches it.
+
+        :param name: name of the robot waiting
+        :return: True if every robot arrived, False if the run was broken by a stop, failure or timeout
+        """
+        barrier = self._barrier
+        if barrier is None:
+            return True
+
+        with self._lock:
+            self.status[name]["state"] = "waiting"
+        start = time.perf_counter()
+        try:
+            barrier.wait()
+            synchronized = True
+        except threading.BrokenBarrierError:
+            synchronized = False
+
+        with self._lock:
+            self.status[name]["state"] = "running"
+            self.status[name]["sync_wait"] += time.perf_counter() - start
+            if synchronized:
+                self.status[name]["syncs"] += 1
+            else:
+                self.status[name]["error"] = "Synchronization with the other robots failed"
+        return synchronized
+
+    def get_status(self, name: str = None) -> dict:
+        """
+        Get status of the last run.
+
+        :param name: name of the robot, every robot if None
+        :return: state, error, start, duration, time spent waiting for other robots and number of synchronizations
+        """
+        with self._lock:
+            if name is None:
+                return {robot: dict(status) for robot, status in self.status.items()}
+            if name not in self.status:
+                raise ValueError(f"There is no robot {name}")
+            return dict(self.status[name])
+
+    def _run_program(self, name: str) -> None:
+        """
+        Run the open program of a robot and keep its status.
+
+        :param name: name of the robot
+        """
+        with self._lock:
+            self.status[name]["state"] = "running"
+            self.status[name]["start"] = time.time()
+        start = time.perf_counter()
+        state = "failed"
+        try:
+            finished = self.robots[name].run_program()
+            state = "finished" if finished else "stopped"
+        except (ValueError, RuntimeError, OSError) as e:
+            with self._lock:
+                self.status[name]["error"] = str(e)
+            raise
+        finally:
+            # release the robots waiting for this one, a finished robot does not abort since the others may still
+            # be leaving the last synchronization point
+            if state != "finished":
+                self._barrier.abort()
+            with self._lock:
+                self.status[name]["state"] = state
+                self.status[name]["duration"] = time.perf_counter() - start
+
+    def _run_on_all(self, function, names: list) -> dict:
+        """
+        Call function for each robot on its own worker.
+
+        :param function: function receiving the name of the robot
+        :param names: names of the robots
+        :return: robot name -> error message, for the robots where function raised an error
+        """
+        errors = {}
+        if not names:
+            return errors
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            futures = {name: executor.submit(function, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except (ValueError, RuntimeError, OSError) as e:
+                    errors[name] = str(e)
+        return errors
+
+    def _new_status(self) -> dict:
+        """
+        Create status of a robot that has not run yet.
+
+        :return: empty status
+        """
+        return {"state": "idle", "error": None, "start": None, "duration": 0.0, "sync_wait": 0.0, "syncs": 0}
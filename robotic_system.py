@@ -1,10 +1,34 @@
+import math
 import re
+import threading
 import time
+from concurrent.futures import Future
+from typing import Callable
 
 from program_data import ProgramData
 from ctkinter_elements import CTkOkCancel
+from input_trigger import InputTrigger, INPUT, TRIGGER, CANCELLED
+from connection_supervisor import DEAD_LINK_TIMEOUT
+from io_image import INPUT_PINS
 from robot_communication import RobotCommunication
-from task_data import TaskData
+from task_data import TaskData, RELATIVE_VELOCITY
+
+# a move is skipped when the robot's last confirmed target is this close to the move's target: distance in [mm] and
+# angle in [rad], compared per angle for orientations and per joint for joint positions
+SKIP_DISTANCE = 0.1
+SKIP_ANGLE = 0.002
+
+# smallest speed override of program runs, as a fraction of each operation's velocity
+MIN_SPEED_OVERRIDE = 0.1
+# safe maximum velocities of program runs, whatever the operations set: linear in [mm/s] and relative joint velocity
+MAX_LINEAR_VELOCITY = 250.0
+MAX_RELATIVE_VELOCITY = 1.0
+# smallest linear velocity in [mm/s] accepted by the robot
+MIN_LINEAR_VELOCITY = 0.1
+
+# time in seconds before the end of a delay from which the clock is checked instead of sleeping, so the delay does
+# not overshoot by the sleep granularity
+SPIN_TIME = 0.002
 
 
 class RoboticSystem:
@@ -13,6 +37,48 @@ class RoboticSystem:
         self._task_data = task_data
         self._program_data = program_data
 
+        # function called on operations that wait for input, if None the user is asked through a dialog
+        self._wait_handler = None
+
+        # signal continuing operations that wait for input, if None the user is asked through a dialog, and whether
+        # the user is asked once the signal times out
+        self._input_trigger = None
+        self._dialog_fallback = True
+
+        # function asking the user whether to continue, if None through a dialog, and function ending that dialog
+        self._dialog_handler = None
+        self._dialog_cancel = None
+
+        # controls of the program run: cleared while paused, set once aborted, and the time the abort was requested
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._aborted = threading.Event()
+        self._abort_time = None
+
+        # position of the first unconfirmed operation of a program run interrupted by a connection failure
+        self._run_cursor = None
+
+        # indices of the task and operation being run, -1 when not running, and the thread running the program
+        self._current_operation = (-1, -1)
+        self._run_thread = None
+
+        # recorder of robot data during program runs, None if not recording
+        self._recorder = None
+
+        # if True consecutive "move line" operations without delay or wait run as one continuous motion, off by default
+        # since the intermediate positions are then not reached exactly
+        self._blend_moves = False
+
+        # tolerances to skip moves to where the robot already is, None if moves are never skipped
+        self._skip_tolerance = (SKIP_DISTANCE, SKIP_ANGLE)
+
+        # fraction of each operation's velocity at which programs run, and the velocities no operation exceeds
+        self._speed_override = 1.0
+        self._velocity_limits = (MAX_LINEAR_VELOCITY, MAX_RELATIVE_VELOCITY)
+
+        # counts of the last program run, None before the first run
+        self._run_report = None
+
     def _validate_str(self, name: str) -> str:
         """
         Validate name input. Extra spaces are trimmed and final format is: Aaa aaa aaa.
@@ -96,6 +162,16 @@ class RoboticSystem:
             raise
         return task_name
 
+    def load_all_tasks(self, progress=None) -> dict:
+        """
+        Load every task saved in the task directory.
+
+        :param progress: called with the number of processed tasks and the total number of tasks
+        :return: error message of each task that could not be loaded
+        """
+        failed = self._task_data.load_all(progress=progress)
+        return {self._decode_str(task): error for task, error in failed.items()}
+
     def delete_task(self, task_name: str, delete_file: bool) -> None:
         """
         Delete task from "database".
@@ -158,25 +234,26 @@ class RoboticSystem:
 
     def update_operation(self, task_name: str, index: int, operation_type: str, position: str = "",
                          wait_input: bool = False, delay: float = 1, linear_velocity: float = 5,
-                         tool: str = "") -> dict:
+                         tool: str = "", relative_velocity: float = RELATIVE_VELOCITY) -> dict:
         """
         Update operation in the given task.
 
         :param task_name: name of the task
         :param index: index of the operation to update
         :param operation_type: type of operation
-        :param position: position to move to (valid for "move line" tasks)
+        :param position: position to move to (valid for "move line" and "move joint" tasks)
         :param wait_input: if True task only completed when user gives input
         :param delay: time to wait before continuing to the next task
         :param linear_velocity: velocity to move at in [mm/s] (valid for "move line" tasks)
         :param tool: tool attached to robot (valid for hand-guide tasks)
+        :param relative_velocity: joint velocity as a fraction of the maximum, in ]0, 1] (valid for "move joint" tasks)
         :return: updated operation
         """
         encoded_name = self._encode_str(task_name)
         encoded_position = self._encode_str(position)
         try:
             return self._task_data.update_operation(encoded_name, index, operation_type, encoded_position, wait_input,
-                                                    delay, linear_velocity, tool)
+                                                    delay, linear_velocity, tool, relative_velocity)
         except ValueError:
             raise
 
@@ -288,15 +365,73 @@ class RoboticSystem:
         except ValueError:
             raise
 
-    def start_robot_connection(self, ip: str) -> str:
+    def find_nearest_position(self, cartesian: list, orientation_tolerance: float = None,
+                              max_distance: float = None, exclude: tuple = None) -> tuple:
+        """
+        Find the position closest to the given coordinates among every loaded task.
+
+        :param cartesian: coordinates to search from [x, y, z] or [x, y, z, a, b, c]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :param max_distance: largest distance in [mm], if None any distance
+        :param exclude: (task name, position name) not to be returned
+        :return: task name, position name and distance in [mm], None if there is no position
+        """
+        if exclude is not None:
+            exclude = (self._encode_str(exclude[0]), self._encode_str(exclude[1]))
+        nearest = self._task_data.get_position_index().nearest(cartesian, orientation_tolerance, max_distance,
+                                                               exclude)
+        if nearest is None:
+            return None
+        return self._decode_str(nearest[0]), self._decode_str(nearest[1]), nearest[2]
+
+    def find_positions_within(self, cartesian: list, distance: float, orientation_tolerance: float = None) -> list:
+        """
+        Find the positions within the given distance of the coordinates among every loaded task.
+
+        :param cartesian: coordinates to search from [x, y, z] or [x, y, z, a, b, c]
+        :param distance: largest distance in [mm]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :return: task name, position name and distance in [mm] of each position found, closest first
+        """
+        return [(self._decode_str(task), self._decode_str(position), found_distance) for task, position, found_distance
+                in self._task_data.get_position_index().within(cartesian, distance, orientation_tolerance)]
+
+    def find_duplicate_positions(self, distance: float, orientation_tolerance: float = None) -> list:
+        """
+        Find every pair of positions within the given distance of each other among every loaded task.
+
+        :param distance: largest distance in [mm]
+        :param orientation_tolerance: largest angle difference in [rad], if None orientation is ignored
+        :return: both (task name, position name) and the distance in [mm] of each pair
+        """
+        return [((self._decode_str(first[0]), self._decode_str(first[1])),
+                 (self._decode_str(second[0]), self._decode_str(second[1])), found_distance)
+                for first, second, found_distance
+                in self._task_data.get_position_index().duplicates(distance, orientation_tolerance)]
+
+    def find_positions_in_box(self, lower: list, upper: list) -> list:
+        """
+        Find the positions inside an axis-aligned box among every loaded task.
+
+        :param lower: lowest corner of the box [x, y, z]
+        :param upper: highest corner of the box [x, y, z]
+        :return: task name and position name of each position inside the box
+        """
+        return [(self._decode_str(task), self._decode_str(position))
+                for task, position in self._task_data.get_position_index().inside_box(lower, upper)]
+
+    def start_robot_connection(self, ip: str, port: int = 30001, dead_link_timeout: float = DEAD_LINK_TIMEOUT) -> str:
         """
         Initiate connection with kuka robot.
 
         :param ip: ip of robot to connect to
+        :param port: port of the KUKA Sunrise server
+        :param dead_link_timeout: time in seconds after which a silent link is considered dead
         :return: return validated ip
         """
+        self._check_not_running()
         try:
-            return self._robot.start_connection(ip)
+            return self._robot.start_connection(ip, port, dead_link_timeout=dead_link_timeout)
         except OSError:
             raise
         except ValueError:
@@ -306,8 +441,18 @@ class RoboticSystem:
         """
         Stop communication to Kuka robot.
         """
+        self._check_not_running()
         self._robot.stop_connection()
 
+    def get_robot_link_status(self) -> dict:
+        """
+        Get status of the link with the robot.
+
+        :return: state ("up", "reconnecting" or "down"), last round trip time in seconds, number of reconnections
+        and failed attempts since the link went down
+        """
+        return self._robot.get_link_status()
+
     def is_robot_connected(self) -> bool:
         """
         Check if a communication is open.
@@ -331,34 +476,446 @@ class RoboticSystem:
 
         return position
 
-    def run_program(self) -> None:
+    def set_wait_handler(self, handler: Callable[[], bool] = None) -> None:
+        """
+        Set function called when an operation waits for input.
+
+        :param handler: function returning True to continue and False to stop the program, if None the user is asked
+        through a dialog
+        """
+        self._wait_handler = handler
+
+    def set_wait_input(self, pin: int = None, state: bool = True, edge: bool = False, timeout: float = None,
+                       dialog_fallback: bool = True) -> None:
+        """
+        Continue operations that wait for input on a digital input of the robot, such as a foot pedal or a PLC
+        signal, or on trigger_continue, instead of asking the user through a dialog.
+
+        :param pin: number of the input pin, if None only trigger_continue continues
+        :param state: state of the input that continues
+        :param edge: if True the input must change to the state while waiting
+        :param timeout: longest wait in seconds, if None wait until the signal
+        :param dialog_fallback: if True the user is asked through a dialog once the wait times out, otherwise the
+        program stops
+        """
+        try:
+            self._input_trigger = InputTrigger(lambda command: self._robot.submit(command), pin, state, edge,
+                                               timeout=timeout)
+        except ValueError:
+            raise
+        self._dialog_fallback = dialog_fallback
+
+    def clear_wait_input(self) -> None:
+        """
+        Ask the user through a dialog on operations that wait for input.
+        """
+        self._input_trigger = None
+
+    def trigger_continue(self) -> None:
+        """
+        Continue the operation waiting for input, from any thread.
+        """
+        if self._input_trigger is None:
+            raise ValueError("Operations waiting for input are continued through a dialog")
+        self._input_trigger.trigger()
+
+    def _wait_for_input(self) -> bool:
+        """
+        Wait for input to continue running.
+
+        :return: True if program should continue, False if it should stop
+        """
+        if self._wait_handler is not None:
+            return self._wait_handler()
+
+        # wait for the robot input or the local trigger, the dialog is only a fallback
+        if self._input_trigger is not None:
+            try:
+                result = self._input_trigger.wait()
+            except OSError:
+                raise
+            if result in (INPUT, TRIGGER):
+                return True
+            if result == CANCELLED:
+                return False
+            self._count_in_report("wait_timeouts")
+            if not self._dialog_fallback:
+                return False
+        if self._dialog_handler is not None:
+            return self._dialog_handler()
+        return CTkOkCancel("Continue task", "Ready to continue?", "Continue", "Stop").get_input()
+
+    def set_dialog_handler(self, handler: Callable[[], bool] = None, cancel: Callable[[], None] = None) -> None:
+        """
+        Set function asking the user whether to continue, e.g. to show the dialog on the GUI thread while the
+        program runs on another thread.
+
+        :param handler: function returning True to continue and False to stop the program, if None the dialog is
+        shown by the thread running the program
+        :param cancel: function making the pending handler return False, called from any thread when the program
+        is aborted
+        """
+        self._dialog_handler = handler
+        self._dialog_cancel = cancel
+
+    def run_program(self, resume: bool = False) -> bool:
         """
         Run open program.
+
+        :param resume: if True continue from the first operation not confirmed by the robot when the last run was
+        interrupted by a connection failure
+        :return: True if every task was run, False if the program was stopped
         """
+        if self.is_program_running():
+            raise ValueError("A program is running")
+
+        # get tasks from program, copied so changes made to the program while it runs apply to the next run
+        tasks = list(self._program_data.get_tasks())
+
+        # find where to start
+        start_task, start_operation = 0, 0
+        if resume:
+            if not self.can_resume_program():
+                raise ValueError("There is no interrupted program to continue")
+            if self._run_cursor["tasks"] != tasks:
+                raise ValueError("The program changed since it was interrupted")
+            start_task, start_operation = self._run_cursor["task"], self._run_cursor["operation"]
 
-        # get tasks from program
-        tasks = self._program_data.get_tasks()
         for task in tasks:
             if self._get_task_state_from_input(task) == 2:
                 raise RuntimeError(f"Task {task} doesn't exist")
 
-        # run each task
-        for task in tasks:
-            try:
-                if not self.run_task(task):
-                    return
-            except ValueError:
-                raise
-            except OSError:
-                raise
+        # load every task before execution starts, so no file is read between robot moves
+        failed = self._task_data.load_all(tasks)
+        if failed:
+            raise ValueError("; ".join(f"Task {self._decode_str(task)}: {error}" for task, error in failed.items()))
+
+        # each run is a recorded cycle
+        if self._recorder is not None:
+            self._recorder.start_cycle(self._program_data.program_name, tasks)
+
+        # a pause, abort, trigger or cancellation left from an earlier run does not apply to this one
+        self._resumed.set()
+        self._aborted.clear()
+        self._abort_time = None
+        if self._input_trigger is not None:
+            self._input_trigger.reset()
+
+        self._run_report = {"program": self._program_data.program_name, "start": time.time(), "duration": 0.0,
+                            "completed": False, "operations": 0, "moves": 0, "skipped_moves": 0,
+                            "speed_override": self._speed_override, "capped_moves": 0, "delay_drift": 0.0,
+                            "max_delay_drift": 0.0, "waits": 0, "wait_time": 0.0, "wait_timeouts": 0, "pauses": 0,
+                            "pause_time": 0.0, "aborted": False, "stop_latency": None}
+
+        # run each task, the program can be paused or aborted from here on
+        self._run_cursor = None
+        self._current_operation = (start_task, start_operation)
+        self._run_thread = threading.current_thread()
+        try:
+            for index in range(start_task, len(tasks)):
+                cursor = {"tasks": list(tasks), "task": index,
+                          "operation": start_operation if index == start_task else 0}
+                self._current_operation = (index, cursor["operation"])
+                try:
+                    if not self.run_task(tasks[index], cursor["operation"],
+                                         lambda operation: cursor.update(operation=operation + 1)):
+                        return False
+                except ValueError:
+                    raise
+                except OSError:
+                    # keep the first unconfirmed operation, the program can continue from it once reconnected
+                    self._run_cursor = cursor
+                    raise
+            self._run_report["completed"] = True
+        finally:
+            self._current_operation = (-1, -1)
+            self._run_thread = None
+            self._run_report["duration"] = time.time() - self._run_report["start"]
+            if self._abort_time is not None:
+                self._run_report["aborted"] = True
+                self._run_report["stop_latency"] = time.perf_counter() - self._abort_time
+            if self._recorder is not None:
+                self._recorder.end_cycle()
+        return True
+
+    def get_run_report(self) -> dict:
+        """
+        Get counts of the last program run.
+
+        :return: program name, start time, duration in seconds, whether every task was run, number of operations
+        run, of moves and of moves skipped because the robot already was at their target, speed override of the run,
+        number of moves slowed down to the maximum velocity, total and largest time in seconds by which delays ran
+        past their deadline, number of waits for input, time in seconds spent waiting and number of waits that timed
+        out, number of pauses and time in seconds paused, whether the run was aborted and the time in seconds from
+        the abort request to the end of the run; None before the first run
+        """
+        return None if self._run_report is None else dict(self._run_report)
 
-    def run_task(self, task_name: str) -> bool:
+    def pause_program(self) -> None:
+        """
+        Pause the program being run, the robot holds once the current operation ends.
+        """
+        if not self.is_program_running():
+            raise ValueError("There is no program running")
+        self._resumed.clear()
+
+    def resume_program(self) -> None:
+        """
+        Resume the paused program.
+        """
+        self._resumed.set()
+
+    def abort_program(self) -> None:
+        """
+        Abort the program being run, from any thread. The program ends before the next command sent to the robot.
+        A continuous motion being streamed stops at once and a wait for a robot input, a trigger or the user's answer
+        ends; a single move can not be stopped by the robot controller, so it ends first.
+        """
+        if not self.is_program_running():
+            raise ValueError("There is no program running")
+        if self._abort_time is None:
+            self._abort_time = time.perf_counter()
+        self._aborted.set()
+        self._resumed.set()
+        self._robot.stop_path()
+        if self._input_trigger is not None:
+            self._input_trigger.cancel()
+        if self._dialog_cancel is not None:
+            self._dialog_cancel()
+
+    def is_program_running(self) -> bool:
+        """
+        Check if a program is being run.
+
+        :return: True if running, paused included
+        """
+        return self._current_operation[0] >= 0
+
+    def _check_not_running(self) -> None:
+        """
+        Refuse a robot command while a program is being run, unless the program itself sends it, so commands from
+        elsewhere do not interleave with the program's moves.
+        """
+        if self.is_program_running() and threading.current_thread() is not self._run_thread:
+            raise ValueError("A program is running")
+
+    def is_program_paused(self) -> bool:
+        """
+        Check if the program being run is paused or will pause once the current operation ends.
+
+        :return: True if paused
+        """
+        return self.is_program_running() and not self._resumed.is_set()
+
+    def _hold_if_paused(self) -> bool:
+        """
+        Hold the program while it is paused.
+
+        :return: True if the program should continue, False if it was aborted
+        """
+        if not self._resumed.is_set():
+            paused = time.perf_counter()
+            self._resumed.wait()
+            self._count_in_report("pauses")
+            self._count_in_report("pause_time", time.perf_counter() - paused)
+        return not self._aborted.is_set()
+
+    def set_speed_override(self, override: float) -> None:
+        """
+        Set the speed of program runs as a fraction of the velocity of each operation, so a program can be
+        commissioned slowly and then run at full speed without editing its operations.
+
+        :param override: fraction of each operation's velocity, in [0.1, 1]
+        """
+        if override < MIN_SPEED_OVERRIDE or override > 1:
+            raise ValueError(f"Speed override must be in the range [{MIN_SPEED_OVERRIDE}, 1]")
+        self._speed_override = override
+
+    def get_speed_override(self) -> float:
+        """
+        Get the speed of program runs as a fraction of the velocity of each operation.
+
+        :return: speed override
+        """
+        return self._speed_override
+
+    def set_velocity_limits(self, linear_velocity: float = MAX_LINEAR_VELOCITY,
+                            relative_velocity: float = MAX_RELATIVE_VELOCITY) -> None:
+        """
+        Set the safe maximum velocities of program runs, faster operations run at these velocities.
+
+        :param linear_velocity: largest velocity in [mm/s] of "move line" operations
+        :param relative_velocity: largest joint velocity of "move joint" operations, as a fraction of the maximum
+        """
+        if linear_velocity < MIN_LINEAR_VELOCITY:
+            raise ValueError(f"Maximum linear velocity must be at least {MIN_LINEAR_VELOCITY} mm/s")
+        if relative_velocity <= 0 or relative_velocity > 1:
+            raise ValueError("Maximum relative velocity must be in the range ]0, 1]")
+        self._velocity_limits = (linear_velocity, relative_velocity)
+
+    def get_run_velocity(self, operation_type: str, velocity: float) -> float:
+        """
+        Get the velocity at which an operation runs, scaled by the speed override and capped by the maximum
+        velocity. Since the override is at most 1, no operation runs faster than it was set to.
+
+        :param operation_type: "move line" or "move joint"
+        :param velocity: velocity of the operation, in [mm/s] for "move line" or relative for "move joint"
+        :return: velocity to move at
+        """
+        limit = self._velocity_limits[0] if operation_type == "move line" else self._velocity_limits[1]
+        scaled = min(velocity * self._speed_override, limit)
+
+        # slow linear moves are not scaled below what the robot accepts
+        if operation_type == "move line":
+            scaled = max(scaled, min(velocity, MIN_LINEAR_VELOCITY))
+        return scaled
+
+    def _get_capped_velocity(self, operation_type: str, velocity: float) -> float:
+        """
+        Get the velocity at which an operation of a program runs, counting it in the run's report when the maximum
+        velocity slows it down.
+
+        :param operation_type: "move line" or "move joint"
+        :param velocity: velocity of the operation, in [mm/s] for "move line" or relative for "move joint"
+        :return: velocity to move at
+        """
+        scaled = self.get_run_velocity(operation_type, velocity)
+        if scaled < velocity * self._speed_override:
+            self._count_in_report("capped_moves")
+        return scaled
+
+    def set_skip_tolerance(self, distance: float = SKIP_DISTANCE, angle: float = SKIP_ANGLE) -> None:
+        """
+        Set how close the robot's last confirmed target must be to a move's target for the move to be skipped.
+
+        :param distance: largest distance in [mm], None to never skip moves
+        :param angle: largest difference in [rad] of each orientation angle and, for move joint, of each joint
+        """
+        self._skip_tolerance = None if distance is None else (distance, angle)
+
+    def _is_at_target(self, operation_type: str, position: dict) -> bool:
+        """
+        Check if the robot already is at a move's target, from the last target it confirmed, without querying it.
+
+        :param operation_type: "move line" or "move joint"
+        :param position: target position with cartesian coordinates and joint positions
+        :return: True if the move can be skipped
+        """
+        last_pose = self._robot.get_last_pose()
+        if self._skip_tolerance is None or last_pose is None:
+            return False
+        distance, angle = self._skip_tolerance
+
+        # joint moves compare joints, since the same pose can be reached with different joint positions
+        if operation_type == "move joint":
+            if last_pose["joints"] is None:
+                return False
+            return all(abs(last - target) <= angle for last, target in zip(last_pose["joints"], position["joints"]))
+
+        if last_pose["cartesian"] is None:
+            return False
+        last, target = last_pose["cartesian"], position["cartesian"]
+        if sum((last[i] - target[i]) ** 2 for i in range(3)) > distance ** 2:
+            return False
+        return all(abs((last[i] - target[i] + math.pi) % (2 * math.pi) - math.pi) <= angle for i in range(3, 6))
+
+    def _count_in_report(self, key: str, amount: int = 1) -> None:
+        """
+        Add to a count of the program run's report, if a program is running.
+
+        :param key: name of the count
+        :param amount: amount to add
+        """
+        if self._run_report is not None and self._current_operation[0] >= 0:
+            self._run_report[key] += amount
+
+    def _wait_until(self, deadline: float) -> float:
+        """
+        Wait until the given time of the monotonic clock. Most of the wait is slept and the last SPIN_TIME is spent
+        checking the clock. An abort ends the wait at once.
+
+        :param deadline: time to wait for, from time.perf_counter
+        :return: time in seconds past the deadline when the wait ended
+        """
+        while not self._aborted.is_set():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return -remaining
+            if remaining > SPIN_TIME:
+                self._aborted.wait(remaining - SPIN_TIME)
+            else:
+                time.sleep(0)
+        return 0.0
+
+    def _record_drift(self, drift: float) -> None:
+        """
+        Add the time by which a delay ran past its deadline to the program run's report, if a program is running.
+
+        :param drift: time in seconds past the deadline
+        """
+        self._count_in_report("delay_drift", drift)
+        if self._run_report is not None and self._current_operation[0] >= 0:
+            self._run_report["max_delay_drift"] = max(self._run_report["max_delay_drift"], drift)
+
+    def get_current_operation(self) -> tuple[int, int]:
+        """
+        Get the operation being run by the program.
+
+        :return: index of the task in the program and index of the operation in the task, -1 when not running
+        """
+        return self._current_operation
+
+    def start_recording(self, directory: str, channels: tuple = None, rate: float = None) -> None:
+        """
+        Record robot data during every program run, each run in its own file.
+
+        :param directory: directory where runs are recorded
+        :param channels: names of the recorded channels, by default pose and joints
+        :param rate: samples per second
+        """
+        # the recorder (and NumPy with it) is only imported once recording is requested
+        from telemetry_recorder import TelemetryRecorder, DEFAULT_CHANNELS, SAMPLE_RATE
+
+        self._recorder = TelemetryRecorder(
+            lambda job, priority: self._robot.submit(job, priority=priority), directory,
+            channels=DEFAULT_CHANNELS if channels is None else channels, rate=SAMPLE_RATE if rate is None else rate,
+            tag=self.get_current_operation)
+
+    def stop_recording(self) -> None:
+        """
+        Stop recording program runs.
+        """
+        self._recorder = None
+
+    def can_resume_program(self) -> bool:
+        """
+        Check if the open program was interrupted by a connection failure and can continue.
+
+        :return: True if the program can continue from where it was interrupted
+        """
+        return self._run_cursor is not None and self.is_program_open()
+
+    def get_interrupted_operation(self) -> tuple[str, int]:
+        """
+        Get the first operation not confirmed by the robot when the program was interrupted.
+
+        :return: name of the task and index of the operation
+        """
+        if self._run_cursor is None:
+            raise ValueError("There is no interrupted program")
+        task = self._run_cursor["tasks"][self._run_cursor["task"]]
+        return self._decode_str(task), self._run_cursor["operation"]
+
+    def run_task(self, task_name: str, start_operation: int = 0, operation_done: Callable[[int], None] = None) -> bool:
         """
         Run task from name.
 
         :param task_name: name of task to run
+        :param start_operation: index of the first operation to run
+        :param operation_done: function called with the index of each operation once the robot confirms it
         :return: True if user wants to continue running program, False if user wants to stop program
         """
+        self._check_not_running()
 
         ready_to_continue = True
 
@@ -369,17 +926,73 @@ class RoboticSystem:
             self._task_data.load_task(task_name)
             task = self._task_data.get_task_info(task_name)
 
-        for operation in task["operations"]:
+        operations = task["operations"]
+        index = start_operation
+        while index < len(operations):
+            # a pause holds before the next operation, an abort ends the run
+            if not self._hold_if_paused():
+                return False
+
+            operation = operations[index]
+            self._current_operation = (self._current_operation[0], index)
+
+            # a run of "move line" operations that don't stop the robot is sent as one continuous motion
+            end = self._get_blended_run(operations, index) if self._blend_moves else index
+            if end - index > 1:
+                try:
+                    run = operations[index:end]
+                    positions = [self.get_position(task_name, move["position"])["cartesian"] for move in run]
+                    self.move_robot_path(positions, [self._get_capped_velocity("move line", move["linear_velocity"])
+                                                     for move in run])
+                except ValueError:
+                    raise
+                except OSError:
+                    raise
+                self._count_in_report("moves", len(run))
+
+                # an abort stops the motion on its way, none of its operations is done
+                if self._aborted.is_set():
+                    return False
+
+                # the run behaves as its last operation, the ones before it are done once it ends
+                if operation_done is not None:
+                    for done in range(index, end - 1):
+                        operation_done(done)
+                self._count_in_report("operations", len(run) - 1)
+                index = end - 1
+                operation = operations[index]
+                self._current_operation = (self._current_operation[0], index)
 
             # if "move line" send command to move robot
-            if operation["type"] == "move line":
+            elif operation["type"] == "move line":
                 try:
                     position = self.get_position(task_name, operation["position"])
-                    self.move_robot_line(position["cartesian"], operation["linear_velocity"])
+                    if self._is_at_target("move line", position):
+                        self._count_in_report("skipped_moves")
+                    else:
+                        self.move_robot_line(position["cartesian"],
+                                             self._get_capped_velocity("move line", operation["linear_velocity"]))
                 except ValueError:
                     raise
                 except OSError:
                     raise
+                self._count_in_report("moves")
+
+            # if "move joint" send command to move robot to the stored joint positions
+            elif operation["type"] == "move joint":
+                try:
+                    position = self.get_position(task_name, operation["position"])
+                    if self._is_at_target("move joint", position):
+                        self._count_in_report("skipped_moves")
+                    else:
+                        # the velocity is optional in the task file
+                        velocity = operation.get("relative_velocity", RELATIVE_VELOCITY)
+                        self.move_robot_joint(position["joints"], self._get_capped_velocity("move joint", velocity))
+                except ValueError:
+                    raise
+                except OSError:
+                    raise
+                self._count_in_report("moves")
 
             # if "hand-guide" start hand-guide mode with required tool
             elif operation["type"] == "hand-guide":
@@ -405,16 +1018,48 @@ class RoboticSystem:
                 except OSError:
                     raise
 
-            time.sleep(operation["delay"])
+            # the delay is measured from the end of the operation, so the time spent until the wait starts is
+            # part of it instead of being added to it
+            finished = time.perf_counter()
+
+            if operation_done is not None:
+                operation_done(index)
+            self._count_in_report("operations")
 
-            # if "wait", open window to wait for input
+            drift = self._wait_until(finished + operation["delay"])
+            if self._aborted.is_set():
+                return False
+            if operation["delay"] > 0:
+                self._record_drift(drift)
+
+            # if "wait", wait for input to continue
             if operation["wait"]:
-                ready = CTkOkCancel("Continue task", "Ready to continue?", "Continue", "Stop").get_input()
+                waiting = time.perf_counter()
+                ready = self._wait_for_input()
+                self._count_in_report("waits")
+                self._count_in_report("wait_time", time.perf_counter() - waiting)
                 if not ready:
                     ready_to_continue = False
                     return ready_to_continue
+            index += 1
         return True
 
+    def _get_blended_run(self, operations: list, start: int) -> int:
+        """
+        Find the "move line" operations from start that run as one continuous motion. Every operation of the run
+        but the last has no delay and does not wait for input.
+
+        :param operations: operations of the task
+        :param start: index of the first operation
+        :return: index after the last operation of the run
+        """
+        end = start
+        while end < len(operations) and operations[end]["type"] == "move line":
+            end += 1
+            if operations[end - 1]["delay"] != 0 or operations[end - 1]["wait"]:
+                break
+        return end
+
     def is_task_up_to_date(self, task_name: str) -> bool:
         """
         Get state of task.
@@ -496,10 +1141,10 @@ class RoboticSystem:
         and 2 task doesn't exist
         """
         tasks = self._program_data.get_tasks()
-        status = []
-        for task in tasks:
-            state = self._get_task_state_from_input(task)
-            status.append(state)
+
+        # tasks may be repeated in a program, the state of each task is only computed once
+        task_states = {task: self._get_task_state_from_input(task) for task in set(tasks)}
+        status = [task_states[task] for task in tasks]
         return self._decode_str_list(tasks), status
 
     def _get_task_state_from_input(self, encoded_task_name: str) -> int:
@@ -562,6 +1207,80 @@ class RoboticSystem:
         except ValueError:
             raise
 
+    def optimize_task_order(self, task_name: str, start: list = None) -> tuple[list, float]:
+        """
+        Propose an order of the task's operations reducing the robot's travel. Only moves between two fixed
+        operations (not a move, waiting for input, with a delay or right before such an operation) are reordered.
+
+        :param task_name: name of the task
+        :param start: position [x, y, z] the robot starts from, if None the first move stays first
+        :return: index of the current operation to place at each index and estimated time saved in seconds
+        """
+        # the optimizer (and NumPy with it) is only imported once an optimization is requested
+        from sequence_optimizer import optimize_task
+
+        try:
+            operations, positions = self._get_task_moves(self._encode_str(task_name))
+        except ValueError:
+            raise
+        order, current_time, new_time = optimize_task(operations, positions, start)
+        return order, current_time - new_time
+
+    def apply_task_order(self, task_name: str, order: list) -> None:
+        """
+        Reorder the task's operations.
+
+        :param task_name: name of the task
+        :param order: index of the current operation to place at each index
+        """
+        try:
+            self._task_data.reorder_operations(self._encode_str(task_name), order)
+        except ValueError:
+            raise
+
+    def optimize_program_order(self, start: list = None) -> tuple[list, float]:
+        """
+        Propose an order of the program's tasks reducing the robot's travel between them. Tasks waiting for input,
+        hand-guiding, leaving the gripper closed or run while it is closed stay in place.
+
+        :param start: position [x, y, z] the robot starts from, if None the first task stays first
+        :return: index of the current task to place at each index and estimated time saved in seconds
+        """
+        # the optimizer (and NumPy with it) is only imported once an optimization is requested
+        from sequence_optimizer import optimize_program
+
+        tasks = self._program_data.get_tasks()
+        failed = self._task_data.load_all(tasks)
+        if failed:
+            raise ValueError("; ".join(f"Task {self._decode_str(task)}: {error}" for task, error in failed.items()))
+        order, current_time, new_time = optimize_program([self._get_task_moves(task) for task in tasks], start)
+        return order, current_time - new_time
+
+    def apply_program_order(self, order: list) -> None:
+        """
+        Reorder the program's tasks.
+
+        :param order: index of the current task to place at each index
+        """
+        try:
+            self._program_data.reorder_tasks(order)
+        except ValueError:
+            raise
+
+    def _get_task_moves(self, encoded_task: str) -> tuple[list, dict]:
+        """
+        Get operations and positions of a loaded task.
+
+        :param encoded_task: name of the task
+        :return: operations and positions by name
+        """
+        try:
+            task = self._task_data.get_task_info(encoded_task)
+        except ValueError:
+            raise
+        positions = {name: self._task_data.get_position(encoded_task, name) for name in task["positions"]}
+        return task["operations"], positions
+
     def delete_task_from_program(self, index: int) -> None:
         """
         Delete task in program by index.
@@ -594,26 +1313,91 @@ class RoboticSystem:
             if not self.is_program_up_to_date():
                 return False
 
-        for task in self.get_tasks():
-            if not self.is_task_up_to_date(task):
-                return False
+        return not self._task_data.has_unsaved_tasks()
 
-        return True
+    def get_unsaved_tasks(self) -> list:
+        """
+        Get tasks with unsaved changes.
+
+        :return: list of task names
+        """
+        return self._decode_str_list(self._task_data.get_unsaved_tasks())
 
-    def move_robot(self, position: list, velocity: float) -> None:
+    def get_revision(self) -> tuple[int, int]:
+        """
+        Get a token that changes whenever a task or the program changes. Allows checking if anything changed since
+        the last render.
+
+        :return: revision of tasks and revision of program
+        """
+        return self._task_data.get_revision(), self._program_data.get_revision()
+
+    def move_robot(self, position: list, velocity: float, wait: bool = True) -> Future:
         """
         Move robot's EEF the given amount relative to the base at the given speed.
 
         :param position: EEF position shift relative to base [x, y, z]
         :param velocity: velocity in [mm/s]
+        :param wait: if True return once the movement ends, otherwise return at once
+        :return: future of the movement if not waiting
+        """
+        self._check_not_running()
+        try:
+            return self._robot.move_robot(position, velocity, wait)
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
+    def queue_move(self, position: list, velocity: float) -> Future:
+        """
+        Request a movement of robot's EEF relative to the base without waiting. Requests made while the robot is
+        busy are merged into a single movement.
+
+        :param position: EEF position shift relative to base [x, y, z]
+        :param velocity: velocity in [mm/s]
+        :return: future completed once the movement carrying this request ends
+        """
+        self._check_not_running()
+        try:
+            return self._robot.queue_move(position, velocity)
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
+    def start_jog(self, direction: list, velocity: float) -> None:
+        """
+        Start moving robot's EEF continuously in the given direction until stop_jog is called, refresh_jog must be
+        called regularly meanwhile.
+
+        :param direction: direction of the movement relative to base [x, y, z]
+        :param velocity: velocity in [mm/s]
         """
+        self._check_not_running()
         try:
-            self._robot.move_robot(position, velocity)
+            self._robot.start_jog(direction, velocity)
         except ValueError:
             raise
         except OSError:
             raise
 
+    def refresh_jog(self) -> bool:
+        """
+        Confirm the jog is still held, otherwise the robot stops on its own shortly after.
+
+        :return: True if the robot is still jogging
+        """
+        return self._robot.refresh_jog()
+
+    def stop_jog(self) -> Future:
+        """
+        Stop moving robot's EEF continuously, the robot ramps down to a stop.
+
+        :return: future completed once the robot stops, None if not jogging
+        """
+        return self._robot.stop_jog()
+
     def move_robot_line(self, position: list, velocity: float) -> None:
         """
         Move robot to the given position at the gicen speed.
@@ -621,6 +1405,7 @@ class RoboticSystem:
         :param position: final position of the robot [x, y, z, a, b, c]
         :param velocity: velocity in [mm/s]
         """
+        self._check_not_running()
         try:
             self._robot.move_robot_line(position, velocity)
         except ValueError:
@@ -628,10 +1413,49 @@ class RoboticSystem:
         except OSError:
             raise
 
+    def move_robot_path(self, positions: list, velocities: list) -> None:
+        """
+        Move robot through the given positions in one continuous motion, rounding the intermediate positions.
+
+        :param positions: positions to go through [x, y, z, a, b, c], the last one is reached exactly
+        :param velocities: velocity in [mm/s] of the movement to each position
+        """
+        self._check_not_running()
+        try:
+            self._robot.move_robot_path(positions, velocities)
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
+    def set_blending(self, blend: bool) -> None:
+        """
+        Set whether consecutive "move line" operations without delay or wait run as one continuous motion.
+
+        :param blend: if True moves are blended, otherwise the robot stops at every position
+        """
+        self._blend_moves = blend
+
+    def move_robot_joint(self, joints: list, relative_velocity: float) -> None:
+        """
+        Move robot to the given joint positions, interpolating in joint space.
+
+        :param joints: final joint positions of the robot [j0, ..., j6] in [rad]
+        :param relative_velocity: joint velocity as a fraction of the maximum, in ]0, 1]
+        """
+        self._check_not_running()
+        try:
+            self._robot.move_robot_joint(joints, relative_velocity)
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
     def open_gripper(self) -> None:
         """
         Open gripper (Pin 11).
         """
+        self._check_not_running()
         try:
             self._robot.open_gripper()
         except OSError:
@@ -641,11 +1465,59 @@ class RoboticSystem:
         """
         Open gripper (Pin 11).
         """
+        self._check_not_running()
         try:
             self._robot.close_gripper()
         except OSError:
             raise
 
+    def read_inputs(self, max_age: float = None) -> dict:
+        """
+        Get every digital input of the robot, read by a single job with no other command in between.
+
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: state of each input pin
+        """
+        try:
+            inputs, _ = self._robot.read_inputs(max_age)
+        except OSError:
+            raise
+        return {pin: bool(inputs >> pin & 1) for pin in INPUT_PINS}
+
+    def get_input(self, pin: int, max_age: float = None) -> bool:
+        """
+        Get the state of a digital input of the robot.
+
+        :param pin: number of the pin
+        :param max_age: largest age in seconds of the cached inputs, if None the inputs are always read
+        :return: True if the pin is on
+        """
+        try:
+            return self._robot.get_input(pin, max_age)
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
+    def set_outputs(self, states: dict, wait: bool = True) -> Future:
+        """
+        Set digital outputs of the robot in a single job, pins already in the requested state are not written.
+
+        :param states: state of each pin to write, True for on
+        :param wait: if True return once the outputs are written, otherwise return at once
+        :return: future with the number of pins written if not waiting
+        """
+        self._check_not_running()
+        try:
+            future = self._robot.write_outputs(states)
+            if not wait:
+                return future
+            future.result()
+        except ValueError:
+            raise
+        except OSError:
+            raise
+
     def hand_guide(self, weight_of_tool: float, centre_of_mass: list) -> None:
         """
         Start hand-guiding mode.
@@ -653,6 +1525,7 @@ class RoboticSystem:
         :param weight_of_tool: weight of the tool in Newtons
         :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
         """
+        self._check_not_running()
         try:
             self._robot.hand_guide(weight_of_tool, centre_of_mass)
         except OSError:
@@ -660,6 +1533,72 @@ class RoboticSystem:
         except ValueError:
             raise
 
+    def start_teaching(self, weight_of_tool: float, centre_of_mass: list) -> None:
+        """
+        Start a hand-guiding session recording the path of the robot until stop_teaching is called.
+
+        :param weight_of_tool: weight of the tool in Newtons
+        :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
+        """
+        self._check_not_running()
+        try:
+            self._robot.start_teaching(weight_of_tool, centre_of_mass)
+        except OSError:
+            raise
+        except ValueError:
+            raise
+
+    def stop_teaching(self, task_name: str, linear_velocity: float = 5, tolerance: float = None,
+                      prefix: str = "Path") -> list:
+        """
+        Stop the hand-guiding session and add the recorded path to the task as "move line" operations. The path is
+        simplified to the fewest positions keeping it within tolerance.
+
+        :param task_name: name of the task where the path is added
+        :param linear_velocity: velocity of the added operations in [mm/s]
+        :param tolerance: largest distance in [mm] between the recorded and the simplified path
+        :param prefix: prefix of the names of the added positions, followed by a number
+        :return: names of the added positions
+        """
+        # the teaching session (and NumPy with it) is only imported once a session is requested
+        from teaching_session import simplify_path, TEACH_TOLERANCE
+
+        try:
+            cartesian, joints = self._robot.stop_teaching()
+        except OSError:
+            raise
+        except ValueError:
+            raise
+
+        try:
+            existing = set(self.get_position_names(task_name))
+        except ValueError:
+            raise
+        prefix = self._validate_str(prefix)
+
+        # only the position of the EEF is simplified, its orientation follows the kept samples
+        names = []
+        number = 1
+        for index in simplify_path(cartesian[:, :3], TEACH_TOLERANCE if tolerance is None else tolerance):
+            while f"{prefix} {number}" in existing:
+                number += 1
+            name = self.add_position(task_name, f"{prefix} {number}", cartesian[index].tolist(),
+                                     joints[index].tolist())
+            existing.add(name)
+            names.append(name)
+
+            self.add_operation(task_name)
+            self.update_operation(task_name, -1, "move line", name, delay=0, linear_velocity=linear_velocity)
+        return names
+
+    def is_teaching(self) -> bool:
+        """
+        Check if a hand-guiding session is running.
+
+        :return: True if the path of the robot is being recorded
+        """
+        return self._robot.is_teaching()
+
     def get_tool_names(self) -> list:
         """
         Get names of existing tools.
@@ -0,0 +1,249 @@
+import numpy as np
+
+# operation types moving the robot, only these are reordered
+MOVE_TYPES = ("move line", "move joint")
+# EEF velocity in [mm/s] assumed for a move joint operation at full relative velocity, to estimate its duration
+JOINT_MOVE_VELOCITY = 1000.0
+# lowest velocity in [mm/s] used to estimate durations, so moves saved with no velocity don't take forever
+MIN_VELOCITY = 0.1
+# improvements in seconds smaller than this end the search
+MIN_IMPROVEMENT = 1e-6
+# largest number of improving moves applied to one run
+MAX_MOVES = 10000
+
+
+def transfer_times(exits: np.ndarray, entries: np.ndarray, velocities: np.ndarray) -> np.ndarray:
+    """
+    Estimate the time to go from the exit point of each item to the entry point of every other item.
+
+    :param exits: exit points [x, y, z], one per item
+    :param entries: entry points [x, y, z], one per item
+    :param velocities: velocity in [mm/s] at which each item is reached
+    :return: matrix of transfer times in seconds, from row item to column item
+    """
+    distances = np.linalg.norm(exits[:, None, :] - entries[None, :, :], axis=2)
+    return distances / np.maximum(velocities, MIN_VELOCITY)[None, :]
+
+
+def path_time(times: np.ndarray, order: list) -> float:
+    """
+    Get the transfer time along the given order.
+
+    :param times: transfer times between items
+    :param order: items in visiting order
+    :return: total transfer time in seconds
+    """
+    order = np.asarray(order, dtype=int)
+    return float(times[order[:-1], order[1:]].sum())
+
+
+def improve_order(times: np.ndarray, order: list) -> list:
+    """
+    Improve a path whose first and last items are fixed, with 2-opt (reversing a stretch of the path) and Or-opt
+    (moving a stretch of up to 3 items elsewhere) moves. Every move of a kind is evaluated at once and the best one
+    is applied, until no move shortens the path. Costs need not be symmetric.
+
+    :param times: transfer times between items
+    :param order: items in visiting order, the first and the last stay in place
+    :return: improved order
+    """
+    order = np.asarray(order, dtype=int)
+    size = len(order)
+    if size < 4:
+        return order.tolist()
+
+    for _ in range(MAX_MOVES):
+        forward = times[order[:-1], order[1:]]
+        backward = times[order[1:], order[:-1]]
+        forward_sum = np.concatenate(([0.0], np.cumsum(forward)))
+        backward_sum = np.concatenate(([0.0], np.cumsum(backward)))
+        best_gain, best_order = MIN_IMPROVEMENT, None
+
+        # 2-opt: reverse order[i:j + 1] for 1 <= i < j <= size - 2
+        i, j = np.triu_indices(size - 1, 1)
+        valid = i >= 1
+        i, j = i[valid], j[valid]
+        if len(i):
+            before = times[order[i - 1], order[i]] + forward_sum[j] - forward_sum[i] + times[order[j], order[j + 1]]
+            after = times[order[i - 1], order[j]] + backward_sum[j] - backward_sum[i] + times[order[i], order[j + 1]]
+            gains = before - after
+            best = int(np.argmax(gains))
+            if gains[best] > best_gain:
+                best_gain = gains[best]
+                best_order = np.concatenate((order[:i[best]], order[i[best]:j[best] + 1][::-1], order[j[best] + 1:]))
+
+        # Or-opt: move order[i:i + length] between order[k] and order[k + 1]
+        for length in (1, 2, 3):
+            starts = np.arange(1, size - length)
+            if not len(starts):
+                continue
+            ends = starts + length - 1
+            removal = (times[order[starts - 1], order[starts]] + times[order[ends], order[ends + 1]] -
+                       times[order[starts - 1], order[ends + 1]])
+            k = np.arange(size - 1)
+            insertion = (times[order[k][None, :], order[starts][:, None]] +
+                         times[order[ends][:, None], order[k + 1][None, :]] - times[order[k], order[k + 1]][None, :])
+            gains = removal[:, None] - insertion
+            # the stretch can not be inserted next to or inside itself
+            gains[(k[None, :] >= starts[:, None] - 1) & (k[None, :] <= ends[:, None])] = -np.inf
+            row, column = np.unravel_index(int(np.argmax(gains)), gains.shape)
+            if gains[row, column] > best_gain:
+                best_gain = gains[row, column]
+                stretch = order[starts[row]:ends[row] + 1]
+                rest = np.concatenate((order[:starts[row]], order[ends[row] + 1:]))
+                position = k[column] + 1 if k[column] < starts[row] else k[column] + 1 - length
+                best_order = np.concatenate((rest[:position], stretch, rest[position:]))
+
+        if best_order is None:
+            break
+        order = best_order
+    return order.tolist()
+
+
+def optimize_sequence(entries: np.ndarray, exits: np.ndarray, velocities: np.ndarray, fixed: list,
+                      start: list = None, pass_through: list = None) -> tuple[list, float, float]:
+    """
+    Reorder items to reduce the total transfer time. Fixed items keep their index, the free items between two
+    fixed items are reordered among themselves.
+
+    :param entries: entry points [x, y, z], one per item
+    :param exits: exit points [x, y, z], one per item
+    :param velocities: velocity in [mm/s] at which each item is reached
+    :param fixed: True for each item that keeps its index
+    :param start: point [x, y, z] the robot starts from, if None the first item keeps its index
+    :param pass_through: True for each item without points, reached at no cost and left from where the robot was,
+    these items keep their index
+    :return: new order of the items, estimated transfer time of the current and of the new order
+    """
+    count = len(entries)
+    pass_through = list(pass_through) if pass_through is not None else [False] * count
+    fixed = [item_fixed or item_passing for item_fixed, item_passing in zip(fixed, pass_through)]
+    if count and start is None:
+        fixed[0] = True
+
+    # a start node and an end node, with no cost to leave an open end
+    entries = np.vstack((entries.reshape(-1, 3), np.zeros((2, 3))))
+    exits = np.vstack((exits.reshape(-1, 3), [start if start is not None else [0.0, 0.0, 0.0]], [[0.0, 0.0, 0.0]]))
+    times = transfer_times(exits, entries, np.append(np.asarray(velocities, dtype=float), [1.0, 1.0]))
+    times[:, count:] = 0.0
+    if start is None:
+        times[count, :] = 0.0
+    times[:, np.flatnonzero(pass_through)] = 0.0
+    current = [count] + list(range(count)) + [count + 1]
+    current_times = _leave_from_predecessors(times, current, pass_through)
+
+    # each run of free items is reordered between the fixed items around it
+    order = [count]
+    run = []
+    for item in list(range(count)) + [count + 1]:
+        if item < count and not fixed[item]:
+            run.append(item)
+            continue
+        # a run before pass-through items is ordered towards the item after them, where the robot goes next
+        end = item
+        if item < count and pass_through[item]:
+            end = next((following for following in range(item + 1, count) if not pass_through[following]), count + 1)
+        order.extend(improve_order(times, [order[-1]] + run + [end])[1:-1] if run else [])
+        order.append(item)
+        run = []
+
+        # the items after a pass-through item are reached from the item before it, known once its run is ordered
+        if item < count and pass_through[item]:
+            times[item] = times[order[-2]]
+
+    # the item after pass-through items may be moved by its own run, so the new order is kept only if it is better
+    current_time, new_time = path_time(current_times, current), path_time(times, order)
+    if new_time > current_time:
+        return current[1:-1], current_time, current_time
+    return order[1:-1], current_time, new_time
+
+
+def _leave_from_predecessors(times: np.ndarray, order: list, pass_through: list) -> np.ndarray:
+    """
+    Get the transfer times along an order where each pass-through item is left from where its predecessor was left.
+
+    :param times: transfer times between items
+    :param order: items in visiting order
+    :param pass_through: True for each item without points
+    :return: transfer times with the rows of the pass-through items replaced
+    """
+    times = times.copy()
+    for previous, item in zip(order[:-1], order[1:]):
+        if item < len(pass_through) and pass_through[item]:
+            times[item] = times[previous]
+    return times
+
+
+def _operation_items(operations: list, positions: dict) -> tuple:
+    """
+    Get the points and velocities of the move operations of a task.
+
+    :param operations: operations of the task
+    :param positions: positions of the task
+    :return: indices of the move operations, their points and the velocities at which they are reached
+    """
+    indices = [i for i, operation in enumerate(operations) if operation["type"] in MOVE_TYPES]
+    points = np.array([positions[operations[i]["position"]]["cartesian"][:3] for i in indices],
+                      dtype=float).reshape(-1, 3)
+    velocities = np.array([operations[i]["linear_velocity"] if operations[i]["type"] == "move line" else
+                           operations[i].get("relative_velocity", 1.0) * JOINT_MOVE_VELOCITY for i in indices],
+                          dtype=float)
+    return indices, points, velocities
+
+
+def optimize_task(operations: list, positions: dict, start: list = None) -> tuple[list, float, float]:
+    """
+    Reorder the move operations of a task to reduce the estimated travel time. Operations that are not moves, moves
+    waiting for input or with a delay and the move right before any of them stay in place, since the robot must be
+    at that position when they run. Other moves are reordered among the moves between two fixed operations.
+
+    :param operations: operations of the task
+    :param positions: positions of the task
+    :param start: point [x, y, z] the robot starts from, if None the first move stays first
+    :return: new order of the operations as indices, estimated travel time in seconds of the current and new order
+    """
+    indices, points, velocities = _operation_items(operations, positions)
+
+    # a move is fixed if it waits or if the next operation does something at its position
+    fixed = []
+    for i in indices:
+        following = operations[i + 1] if i + 1 < len(operations) else None
+        fixed.append(operations[i]["wait"] or operations[i]["delay"] > 0 or
+                     (following is not None and following["type"] not in MOVE_TYPES))
+
+    moves, current_time, new_time = optimize_sequence(points, points, velocities, fixed, start)
+    order = list(range(len(operations)))
+    for index, move in zip(indices, moves):
+        order[index] = indices[move]
+    return order, current_time, new_time
+
+
+def optimize_program(tasks: list, start: list = None) -> tuple[list, float, float]:
+    """
+    Reorder the tasks of a program to reduce the estimated travel between them. A task is reached at the position
+    of its first move and left at the position of its last move. Tasks that wait for input or hand-guide, tasks
+    leaving the gripper closed, tasks run while the gripper is closed and tasks without moves stay in place. A task
+    without moves adds no travel, the robot goes on from where the task before it left.
+
+    :param tasks: operations and positions of each task of the program
+    :param start: point [x, y, z] the robot starts from, if None the first task stays first
+    :return: new order of the tasks as indices, estimated travel time in seconds of the current and new order
+    """
+    entries, exits, velocities, fixed, pass_through = [], [], [], [], []
+    closed = False
+    for operations, positions in tasks:
+        indices, points, move_velocities = _operation_items(operations, positions)
+        grips = [operation["type"] for operation in operations if operation["type"] in ("open", "close")]
+        holds = closed
+        if grips:
+            closed = grips[-1] == "close"
+
+        fixed.append(not indices or holds or closed or
+                     any(operation["wait"] or operation["type"] == "hand-guide" for operation in operations))
+        pass_through.append(not indices)
+        entries.append(points[0] if indices else np.zeros(3))
+        exits.append(points[-1] if indices else np.zeros(3))
+        velocities.append(move_velocities[0] if indices else 1.0)
+
+    return optimize_sequence(np.array(entries).reshape(-1, 3), np.array(exits).reshape(-1, 3),
+                             np.array(velocities), fixed, start, pass_through)
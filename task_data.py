@@ -1,85 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Callable
+
 import schema
 
 from file_manager import FileManager
 
 from schema import Schema, Use, And, Or
 
+OPERATION_TYPES = ["move line", "move joint", "open", "close", "hand-guide"]
+# operation types moving the robot to one of the task's positions
+MOVE_TYPES = ["move line", "move joint"]
+# joint velocity of "move joint" operations, as a fraction of the maximum, used when an operation does not set it
+RELATIVE_VELOCITY = 0.2
+
+# schemas are built once at import and shared by every validation
+TASK_SCHEMA = Schema(
+    {
+        "operations": Use(list),
+        "positions": Use(dict)
+    }
+)
+
+OPERATION_SCHEMA = Schema(
+    {
+        "type": And(Use(str), lambda t: t in OPERATION_TYPES),
+        "position": Use(str),
+        "wait": Use(bool),
+        "delay": And(Or(Use(int), Use(float)), lambda d: d >= 0),
+        "linear_velocity": And(Or(Use(int), Use(float)), lambda d: d >= 0),
+        "tool": Use(str),
+        schema.Optional("relative_velocity"): And(Or(Use(int), Use(float)), lambda v: 0 < v <= 1)
+    }
+)
+
+POSITION_SCHEMA = Schema(
+    {
+        "joints": And(Use(list), lambda j: len(j) == 7),
+        "cartesian": And(Use(list), lambda c: len(c) == 6)
+    }
+)
+
+
+def _is_numeric(element) -> bool:
+    """
+    Check if element is an int or a float.
+
+    :param element: element to check
+    :return: True if element is numeric, False otherwise
+    """
+    return isinstance(element, int) or isinstance(element, float)
+
+
+def validate_task(task: dict) -> list:
+    """
+    Fully validate task. Every error found is reported instead of stopping at the first one.
+
+    :param task: task to validate
+    :return: list of error messages, empty if task is valid
+    """
+
+    # validate task
+    try:
+        task = TASK_SCHEMA.validate(task)
+    except schema.SchemaError:
+        return ["Task file doesn't have the required structure"]
+
+    errors = []
+
+    # validate each operation
+    operations = []
+    for i, operation in enumerate(task["operations"]):
+        try:
+            operations.append(OPERATION_SCHEMA.validate(operation))
+        except schema.SchemaError:
+            errors.append(f"Operation {i} improperly defined")
+
+    # validate the structure of each position
+    names = []
+    rows = []
+    for name, position in task["positions"].items():
+        try:
+            POSITION_SCHEMA.validate(position)
+        except schema.SchemaError:
+            errors.append(f"Position {name} improperly defined")
+            continue
+        names.append(name)
+        rows.append(list(position["joints"]) + list(position["cartesian"]))
+
+    # NumPy is imported on first validation to keep it out of the application's startup
+    import numpy as np
+
+    # check every joint and cartesian coordinate with a single conversion, only inspect each element if it fails,
+    # nested lists of even length convert to a numeric array too but with more dimensions
+    try:
+        array = np.array(rows)
+        kind = array.dtype.kind if array.ndim == 2 else "O"
+    except (ValueError, TypeError, OverflowError):
+        kind = "O"
+    if rows and kind not in "biuf":
+        for name, row in zip(names, rows):
+            if not all(_is_numeric(element) for element in row[:7]):
+                errors.append(f"Joints improperly defined in position {name}")
+            if not all(_is_numeric(element) for element in row[7:]):
+                errors.append(f"Cartesian coordinates improperly defined in position {name}")
+
+    # validate if positions in operations exist
+    for i, operation in enumerate(operations):
+        if operation["type"] in MOVE_TYPES and operation["position"] not in task["positions"]:
+            errors.append(f"Position {operation['position']} referenced in operation {i} doesn't exist")
+
+    return errors
+
+
+def _read_task_file(file_manager: FileManager, encoded_name: str, known_digests: frozenset) -> tuple:
+    """
+    Read and validate a task file. Runs inside the workers of TaskData.load_all.
+
+    :param file_manager: file manager of the task directory
+    :param encoded_name: name of the task to read
+    :param known_digests: digests of files already validated, these are not validated again
+    :return: task, digest of the file's content and list of validation errors (None if validation was skipped)
+    """
+    task, digest = file_manager.load_file_and_hash(encoded_name)
+    errors = None if digest in known_digests else validate_task(task)
+    return task, digest, errors
+
 
 class TaskData:
     """Class that implements data management related to tasks"""
     def __init__(self, path):
-        self.task_saved = {}
         self.tasks = {}
+
+        # names of tasks with unsaved changes, global change counter and counter value of each task's last change
+        self.unsaved_tasks = set()
+        self.revision = 0
+        self.task_revision = {}
         self.file_manager = FileManager(path)
 
-    def _validate_task(self, task: dict) -> None:
+        # validation errors of previously validated files indexed by the hash of their content
+        self._validation_cache = {}
+
+        # spatial index of the positions of every loaded task, built on first use
+        self._position_index = None
+
+    def _mark_changed(self, encoded_name: str, saved: bool) -> None:
         """
-        Fully validate task loaded.
+        Register a change to a task. Every method that changes a task or its saved state must call it.
 
-        :param task: task to validate
+        :param encoded_name: name of the changed task
+        :param saved: True if the task is equal to its file after the change, False otherwise
         """
+        if saved:
+            self.unsaved_tasks.discard(encoded_name)
+        else:
+            self.unsaved_tasks.add(encoded_name)
+        self.revision += 1
+        self.task_revision[encoded_name] = self.revision
 
-        # task's schema
-        task_schema = Schema(
-            {
-                "operations": Use(list),
-                "positions": Use(dict)
-            }
-        )
-
-        # operation's schema
-        operation_schema = Schema(
-            {
-                "type": And(Use(str), lambda t: t in ["move line", "open", "close", "hand-guide"]),
-                "position": Use(str),
-                "wait": Use(bool),
-                "delay": And(Or(Use(int), Use(float)), lambda d: d >= 0),
-                "linear_velocity": And(Or(Use(int), Use(float)), lambda d: d >= 0),
-                "tool": Use(str)
-            }
-        )
+    def get_position_index(self):
+        """
+        Get the spatial index of the positions of every loaded task, kept up to date as positions change.
 
-        # position's schema
-        position_schema = Schema(
-            {
-                "joints": And(Use(list), lambda j: len(j) == 7),
-                "cartesian": And(Use(list), lambda c: len(c) == 6)
-            }
-        )
+        :return: index of positions by (encoded task name, encoded position name)
+        """
+        if self._position_index is None:
+            # the index (and NumPy with it) is only imported once positions are searched
+            from position_index import PositionIndex
 
-        # validate task
-        try:
-            task = task_schema.validate(task)
-        except schema.SchemaError:
-            raise ValueError("Task file doesn't have the required structure")
-
-        # validate each operation
-        for operation in task["operations"]:
-            try:
-                operation_schema.validate(operation)
-            except schema.SchemaError:
-                raise ValueError("Operation improperly defined")
-
-        # validate each position
-        for position in task["positions"]:
-            try:
-                position_schema.validate(task["positions"][position])
-            except schema.SchemaError as e:
-                raise ValueError("Position improperly defined")
-
-            for element in task["positions"][position]["joints"]:
-                if not isinstance(element, int) and not isinstance(element, float):
-                    raise ValueError("Joints improperly defined")
-
-            for element in task["positions"][position]["cartesian"]:
-                if not isinstance(element, int) and not isinstance(element, float):
-                    raise ValueError("Cartesian coordinates improperly defined")
-
-        # validate if positions in operations exist
-        for operation in task["operations"]:
-            if operation["type"] == "move line":
-                if operation["position"] not in task["positions"].keys():
-                    raise ValueError("Position referenced doesn't exist")
+            self._position_index = PositionIndex()
+            for encoded_name in self.tasks:
+                self._index_task(encoded_name)
+        return self._position_index
+
+    def _index_task(self, encoded_name: str) -> None:
+        """
+        Index every position of a task, if the index was built.
+
+        :param encoded_name: name of the task
+        """
+        if self._position_index is None:
+            return
+        self._position_index.remove_task(encoded_name)
+        for encoded_position, position in self.tasks.get(encoded_name, {"positions": {}})["positions"].items():
+            self._position_index.add(encoded_name, encoded_position, position["cartesian"])
+
+    def _validate_task(self, task: dict, digest: str = None) -> None:
+        """
+        Fully validate task loaded. If the digest of the file's content is given the result is cached,
+        so unchanged files are never validated twice.
+
+        :param task: task to validate
+        :param digest: hash of the file the task was loaded from
+        """
+        if digest is not None and digest in self._validation_cache:
+            errors = self._validation_cache[digest]
+        else:
+            errors = validate_task(task)
+            if digest is not None:
+                self._validation_cache[digest] = errors
+
+        if errors:
+            raise ValueError("; ".join(errors))
 
     def add_task(self, encoded_name: str) -> None:
         """
@@ -98,7 +219,7 @@ class TaskData:
             "positions": {}
         }
 
-        self.task_saved[encoded_name] = False
+        self._mark_changed(encoded_name, saved=False)
 
     def load_task(self, encoded_name: str) -> None:
         """
@@ -110,19 +231,69 @@ class TaskData:
         # check if file exists and load task
         if encoded_name not in self.tasks:
             if self.file_manager.file_exists(encoded_name):
-                task = self.file_manager.load_file(encoded_name)
+                task, digest = self.file_manager.load_file_and_hash(encoded_name)
                 try:
-                    self._validate_task(task)
+                    self._validate_task(task, digest)
                 except ValueError:
                     raise
 
                 self.tasks[encoded_name] = task
+                self._index_task(encoded_name)
             else:
                 raise FileNotFoundError(f"There is no file {encoded_name}.json")
         else:
             raise ValueError(f"A task {encoded_name} already exists")
 
-        self.task_saved[encoded_name] = True
+        self._mark_changed(encoded_name, saved=True)
+
+    def load_all(self, encoded_names: list = None, progress: Callable[[int, int], None] = None,
+                 max_workers: int = None, use_processes: bool = False) -> dict:
+        """
+        Load and validate several tasks in parallel. Tasks that are already loaded are skipped.
+
+        :param encoded_names: names of tasks to load, if None every task file in the directory is loaded
+        :param progress: called with the number of processed tasks and the total number of tasks
+        :param max_workers: maximum number of workers, if None the executor's default is used
+        :param use_processes: if True files are parsed and validated in a process pool, otherwise in a thread pool
+        :return: error message of each task that could not be loaded
+        """
+        if encoded_names is None:
+            encoded_names = self.file_manager.list_files()
+
+        # remove repeated names and tasks already loaded
+        pending = [name for name in dict.fromkeys(encoded_names) if name not in self.tasks]
+        total = len(pending)
+        failed = {}
+        if progress:
+            progress(0, total)
+        if not pending:
+            return failed
+
+        known_digests = frozenset(digest for digest, errors in self._validation_cache.items() if not errors)
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=max_workers) as executor:
+            futures = {executor.submit(_read_task_file, self.file_manager, name, known_digests): name
+                       for name in pending}
+
+            # results are merged in the calling thread, as soon as each one is available
+            for done, future in enumerate(as_completed(futures), start=1):
+                encoded_name = futures[future]
+                try:
+                    task, digest, errors = future.result()
+                    if errors is not None:
+                        self._validation_cache[digest] = errors
+                    self._validate_task(task, digest)
+                except (ValueError, OSError) as e:
+                    failed[encoded_name] = str(e)
+                else:
+                    self.tasks[encoded_name] = task
+                    self._index_task(encoded_name)
+                    self._mark_changed(encoded_name, saved=True)
+
+                if progress:
+                    progress(done, total)
+
+        return failed
 
     def delete_task(self, encoded_name: str, delete_file: bool) -> None:
         """
@@ -135,6 +306,10 @@ class TaskData:
         # delete task and file if requested
         if encoded_name in self.tasks:
             self.tasks.pop(encoded_name)
+            self._index_task(encoded_name)
+            self.unsaved_tasks.discard(encoded_name)
+            self.task_revision.pop(encoded_name, None)
+            self.revision += 1
             if delete_file:
                 self.file_manager.delete_file(encoded_name)
         else:
@@ -153,7 +328,7 @@ class TaskData:
         else:
             raise ValueError(f"There is no task {encoded_name}")
 
-        self.task_saved[encoded_name] = True
+        self._mark_changed(encoded_name, saved=True)
 
     def get_task_info(self, encoded_name: str) -> dict:
         """
@@ -199,28 +374,30 @@ class TaskData:
                 "delay": 0,
                 "wait": False,
                 "linear_velocity": 5,
-                "tool": ""
+                "tool": "",
+                "relative_velocity": RELATIVE_VELOCITY
             })
         else:
             raise ValueError(f"There is no task {encoded_name}")
 
-        self.task_saved[encoded_name] = False
+        self._mark_changed(encoded_name, saved=False)
         return self.get_operation(encoded_name, -1)
 
     def update_operation(self, encoded_name: str, index: int, operation_type: str, position: str = "",
                          wait_input: bool = False, delay: float = 1, linear_velocity: float = 5,
-                         tool: str = "") -> dict:
+                         tool: str = "", relative_velocity: float = RELATIVE_VELOCITY) -> dict:
         """
         Update operation in the given task.
 
         :param encoded_name: name of the task
         :param index: index of the operation to update
         :param operation_type: type of operation
-        :param position: position to move to (valid for "move line" tasks)
+        :param position: position to move to (valid for "move line" and "move joint" tasks)
         :param wait_input: if True task only completed when user gives input
         :param delay: time to wait before continuing to the next task
         :param linear_velocity: velocity to move at in [mm/s] (valid for "move line" tasks)
         :param tool: tool attached to robot (valid for hand-guide tasks)
+        :param relative_velocity: joint velocity as a fraction of the maximum, in ]0, 1] (valid for "move joint" tasks)
         :return: updated operation
         """
 
@@ -232,16 +409,33 @@ class TaskData:
                 "wait": wait_input,
                 "delay": delay,
                 "linear_velocity": linear_velocity,
-                "tool": tool
+                "tool": tool,
+                "relative_velocity": relative_velocity
             }
         elif encoded_name in self.tasks:
             raise ValueError(f"Operation with index {index} does not exist in task {encoded_name}")
         else:
             raise ValueError(f"There is no task {encoded_name}")
 
-        self.task_saved[encoded_name] = False
+        self._mark_changed(encoded_name, saved=False)
         return self.get_operation(encoded_name, index)
 
+    def reorder_operations(self, encoded_name: str, order: list) -> None:
+        """
+        Reorder the operations of a task.
+
+        :param encoded_name: name of the task
+        :param order: index of the current operation to place at each index
+        """
+        if encoded_name not in self.tasks:
+            raise ValueError(f"There is no task {encoded_name}")
+        operations = self.tasks[encoded_name]["operations"]
+        if sorted(order) != list(range(len(operations))):
+            raise ValueError(f"Order must contain each operation index of task {encoded_name} once")
+
+        self.tasks[encoded_name]["operations"] = [operations[index] for index in order]
+        self._mark_changed(encoded_name, saved=False)
+
     def delete_operation(self, encoded_name: str, index: int) -> None:
         """
         Delete operation from task.
@@ -256,7 +450,7 @@ class TaskData:
         else:
             raise ValueError(f"There is no task {encoded_name}")
 
-        self.task_saved[encoded_name] = False
+        self._mark_changed(encoded_name, saved=False)
 
     def add_position(self, encoded_task_name: str, encoded_position_name: str, cartesian, joints) -> None:
         """
@@ -272,10 +466,12 @@ class TaskData:
                 "cartesian": cartesian,
                 "joints": joints
             }
+            if self._position_index is not None:
+                self._position_index.add(encoded_task_name, encoded_position_name, cartesian)
         else:
             raise ValueError(f"There is no task {encoded_task_name}")
 
-        self.task_saved[encoded_task_name] = False
+        self._mark_changed(encoded_task_name, saved=False)
 
     def update_position(self, encoded_task_name: str, encoded_position_name: str, cartesian: list, joints: list) \
             -> None:
@@ -293,12 +489,14 @@ class TaskData:
                 "cartesian": cartesian,
                 "joints": joints
             }
+            if self._position_index is not None:
+                self._position_index.add(encoded_task_name, encoded_position_name, cartesian)
         elif encoded_task_name in self.tasks:
             raise ValueError(f"There is no position {encoded_position_name} in task {encoded_task_name}")
         else:
             raise ValueError(f"There is no task {encoded_task_name}")
 
-        self.task_saved[encoded_task_name] = False
+        self._mark_changed(encoded_task_name, saved=False)
 
     def delete_position(self, encoded_task_name: str, encoded_position_name: str) -> None:
         """
@@ -313,12 +511,14 @@ class TaskData:
                 if operation["position"] == encoded_position_name:
                     raise ValueError(f"Position {encoded_position_name} is being used in one operation")
             self.tasks[encoded_task_name]["positions"].pop(encoded_position_name)
+            if self._position_index is not None:
+                self._position_index.remove(encoded_task_name, encoded_position_name)
         elif encoded_task_name in self.tasks:
             raise ValueError(f"There is no position {encoded_position_name} in task {encoded_task_name}")
         else:
             raise ValueError(f"There is no task {encoded_task_name}")
 
-        self.task_saved[encoded_task_name] = False
+        self._mark_changed(encoded_task_name, saved=False)
 
     def get_position_names(self, encoded_task: str) -> list:
         """
@@ -349,7 +549,9 @@ class TaskData:
                 "wait": operation["wait"],
                 "delay": operation["delay"],
                 "linear_velocity": operation["linear_velocity"],
-                "tool": operation["tool"]
+                "tool": operation["tool"],
+                # tasks saved before "move joint" existed have no relative velocity
+                "relative_velocity": operation.get("relative_velocity", RELATIVE_VELOCITY)
             }
         if encoded_task in self.tasks:
             raise ValueError(f"Operation with index {operation_index} does not exist in task {encoded_task}")
@@ -377,13 +579,45 @@ class TaskData:
         :param encoded_task: task name
         :return: True if task is up to date, False otherwise
         """
-        if encoded_task in self.tasks and encoded_task in self.task_saved:
-            return self.task_saved[encoded_task]
-        elif encoded_task in self.tasks:
-            raise ValueError(f"Information about the status of task {encoded_task} does not exist")
+        if encoded_task in self.tasks:
+            return encoded_task not in self.unsaved_tasks
         else:
             raise ValueError(f"There is no task {encoded_task}")
 
+    def has_unsaved_tasks(self) -> bool:
+        """
+        Check if any task has unsaved changes.
+
+        :return: True if at least one task is not saved, False otherwise
+        """
+        return bool(self.unsaved_tasks)
+
+    def get_unsaved_tasks(self) -> list:
+        """
+        Get names of tasks with unsaved changes.
+
+        :return: list of task names
+        """
+        return list(self.unsaved_tasks)
+
+    def get_revision(self) -> int:
+        """
+        Get the change counter, incremented on every change to any task.
+
+        :return: current revision
+        """
+        return self.revision
+
+    def changed_since(self, encoded_task: str, revision: int) -> bool:
+        """
+        Check if task changed after the given revision.
+
+        :param encoded_task: task name
+        :param revision: revision to compare with
+        :return: True if task changed (or was deleted) after the revision, False otherwise
+        """
+        return self.task_revision.get(encoded_task, self.revision) > revision
+
     def task_exists(self, encoded_task: str) -> bool:
         """
         Check if task exists.
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import numpy as np
+
+# samples per second recorded while the operator guides the robot
+TEACH_RATE = 20
+# stiffness while teaching: translational [N/m], rotational [Nm/rad] and null space, low so the robot is easy to guide
+TEACH_STIFFNESS = (50, 5, 5)
+# largest distance in [mm] between the recorded path and the simplified path
+TEACH_TOLERANCE = 2.0
+# largest deviation in [rad] of a joint from the setpoint before the setpoint follows it, larger than the sag due to
+# an error in the load model, so the robot does not drift under its own weight
+TEACH_DEADBAND = 0.02
+
+# gravity in [m/s^2], tool weights are stored in Newtons while the controller expects kilograms
+GRAVITY = 9.81
+
+
+def simplify_path(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplify a path with the Ramer-Douglas-Peucker algorithm. The distances of all points of a segment are computed
+    at once, and segments are split with an explicit stack instead of recursion.
+
+    :param points: points of the path, one per row
+    :param tolerance: largest distance between a dropped point and the simplified path
+    :return: indices of the kept points, first and last included
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 3:
+        return np.arange(len(points))
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        # distance of every inner point to the segment joining the ends, clamped so closed loops are kept
+        segment = points[end] - points[start]
+        relative = points[start + 1:end] - points[start]
+        length = segment @ segment
+        along = np.clip(relative @ segment / length, 0, 1) if length > 0 else np.zeros(len(relative))
+        distances = np.linalg.norm(relative - along[:, None] * segment, axis=1)
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+class TeachingSession:
+    """
+    Class to record the path of the robot while the operator guides it. The robot is put in joint impedance mode
+    with low stiffness and the setpoint moves to the position the robot was pushed to once a joint leaves the
+    deadband around it, so it follows the operator's hand but not the sag of a wrong load model.
+    The pose and joint positions are recorded at a fixed rate until the session is released.
+    """
+
+    def __init__(self, weight_of_tool: float, centre_of_mass: list, rate: float = TEACH_RATE,
+                 stiffness: tuple = TEACH_STIFFNESS, deadband: float = TEACH_DEADBAND):
+        """
+        :param weight_of_tool: weight of the tool in Newtons
+        :param centre_of_mass: centre of mass of the tool [x, y, z] in [mm]
+        :param rate: samples per second
+        :param stiffness: translational, rotational and null space stiffness
+        :param deadband: largest deviation in [rad] of a joint from the setpoint before the setpoint follows it
+        """
+        self.weight_of_tool = weight_of_tool
+        self.centre_of_mass = centre_of_mass
+        self.period = 1 / rate
+        self.stiffness = stiffness
+        self.deadband = deadband
+
+        self.cartesian = []
+        self.joints = []
+
+        self._released = threading.Event()
+
+    def release(self) -> None:
+        """
+        Stop recording, the robot leaves impedance mode.
+        """
+        self._released.set()
+
+    def get_samples(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the recorded path.
+
+        :return: cartesian coordinates and joint positions, one sample per row
+        """
+        return np.array(self.cartesian, dtype=float).reshape(-1, 6), np.array(self.joints, dtype=float).reshape(-1, 7)
+
+    def __call__(self, connection) -> None:
+        """
+        Record the path until released, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        setpoint = connection.getJointsPos()
+        if len(setpoint) != 7:
+            raise OSError("Could not read the robot position")
+
+        connection.realTime_startImpedanceJoints(self.weight_of_tool / GRAVITY,
+                                                 *[value / 1000 for value in self.centre_of_mass], *self.stiffness)
+        try:
+            next_tick = time.perf_counter()
+            while not self._released.is_set():
+                # the robot is held at a fixed setpoint, moved where the operator pushed the robot once a joint
+                # leaves the deadband, small deviations such as a sag under the tool's weight are not followed
+                joints = connection.sendJointsPositionsGetActualJpos(setpoint)
+                cartesian = connection.sendJointsPositionsGetActualEEFpos(setpoint)
+                if len(joints) != 7 or len(cartesian) != 6:
+                    raise OSError("No reply from the robot")
+                self.joints.append(joints)
+                self.cartesian.append(cartesian)
+                if np.max(np.abs(np.subtract(joints, setpoint))) > self.deadband:
+                    setpoint = joints
+
+                # keep a fixed rate, without accumulating the time spent reading
+                next_tick += self.period
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    self._released.wait(delay)
+                else:
+                    next_tick = time.perf_counter()
+        finally:
+            connection.realTime_stopImpedanceJoints()
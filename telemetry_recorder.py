@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+import numpy as np
+
+from command_multiplexer import QUERY
+
+# channel name -> (connection getter, number of values)
+CHANNELS = {
+    "pose": ("getEEFPos", 6),
+    "joints": ("getJointsPos", 7),
+    "force": ("getEEF_Force", 3),
+    "moment": ("getEEF_Moment", 3),
+    "external_torques": ("getJointsExternalTorques", 7),
+    "measured_torques": ("getJointsMeasuredTorques", 7),
+}
+DEFAULT_CHANNELS = ("pose", "joints")
+
+# samples per second
+SAMPLE_RATE = 50
+# longest cycle in seconds, sets the number of records preallocated per cycle
+MAX_CYCLE_DURATION = 600
+
+
+def record_dtype(channels: tuple) -> np.dtype:
+    """
+    Get the record layout for the given channels.
+
+    :param channels: names of the recorded channels
+    :return: time, task index, operation index and one field per channel
+    """
+    for channel in channels:
+        if channel not in CHANNELS:
+            raise ValueError(f"There is no channel {channel}")
+    return np.dtype([("time", "f8"), ("task", "i4"), ("operation", "i4")] +
+                    [(channel, "f8", (CHANNELS[channel][1],)) for channel in channels])
+
+
+def read_cycle(data_file: str) -> tuple[np.ndarray, dict]:
+    """
+    Read a recorded cycle without loading it into memory.
+
+    :param data_file: .npy file of the cycle
+    :return: valid records and information of the cycle
+    """
+    with open(os.path.splitext(data_file)[0] + ".json") as file:
+        info = json.load(file)
+    return np.load(data_file, mmap_mode="r")[:info["count"]], info
+
+
+class TelemetryRecorder:
+    """
+    Class to record robot data during program runs. Each run is a cycle written to its own preallocated .npy file,
+    memory-mapped so memory use stays flat, with a JSON file next to it describing the cycle. Every record holds
+    the time, the task and operation being run and the value of each channel.
+    Samples are requests served by the connection thread between other commands: the robot does not answer while
+    a motion runs, so samples are taken before and after each motion rather than during it.
+    """
+
+    def __init__(self, submit: Callable[..., Future], directory: str, channels: tuple = DEFAULT_CHANNELS,
+                 rate: float = SAMPLE_RATE, max_cycle_duration: float = MAX_CYCLE_DURATION,
+                 tag: Callable[[], tuple] = None):
+        """
+        :param submit: function submitting a job, receiving the connection, to the thread owning the connection
+        :param directory: directory where cycles are written
+        :param channels: names of the recorded channels
+        :param rate: samples per second
+        :param max_cycle_duration: longest cycle in seconds, later samples are dropped
+        :param tag: function returning the indices of the task and operation being run
+        """
+        self.dtype = record_dtype(channels)
+        self.channels = tuple(channels)
+        self.period = 1 / rate
+        self.capacity = int(rate * max_cycle_duration)
+        self.directory = directory
+        self.tag = tag if tag is not None else lambda: (-1, -1)
+        self.cycles = 0
+
+        self._submit = submit
+        self._data = None
+        self._info = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(directory, exist_ok=True)
+
+    def start_cycle(self, name: str, tasks: list) -> str:
+        """
+        Start recording a new cycle.
+
+        :param name: name of the program run
+        :param tasks: names of the tasks of the program, task indices refer to this list
+        :return: path of the cycle's data file
+        """
+        if self._thread is not None:
+            self.end_cycle()
+
+        self.cycles += 1
+        start = time.time()
+        data_file = os.path.join(self.directory, f"{name}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(start))}_"
+                                                 f"{self.cycles:04d}.npy")
+        self._data = np.lib.format.open_memmap(data_file, mode="w+", dtype=self.dtype, shape=(self.capacity,))
+        self._info = {"program": name, "tasks": list(tasks), "channels": list(self.channels), "rate": 1 / self.period,
+                      "start": start, "duration": 0.0, "count": 0, "capacity": self.capacity, "skipped": 0,
+                      "dropped": 0, "data_file": os.path.basename(data_file)}
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_periodically, name="telemetry", daemon=True)
+        self._thread.start()
+        return data_file
+
+    def end_cycle(self) -> dict:
+        """
+        Stop recording the current cycle and write its information.
+
+        :return: information of the cycle
+        """
+        if self._thread is None:
+            raise ValueError("There is no cycle being recorded")
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+        self._info["duration"] = time.time() - self._info["start"]
+        self._data.flush()
+        self._data = None
+        with open(os.path.join(self.directory, os.path.splitext(self._info["data_file"])[0] + ".json"), "w") as file:
+            json.dump(self._info, file, indent=4)
+        return self._info
+
+    def _sample_periodically(self) -> None:
+        """
+        Request a sample every period. A request still waiting for the connection is not repeated, the sample is
+        counted as skipped.
+        """
+        pending = None
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            if pending is not None and not pending.done():
+                self._info["skipped"] += 1
+            else:
+                try:
+                    pending = self._submit(self._sample, priority=QUERY)
+                except OSError:
+                    pending = None
+                    self._info["skipped"] += 1
+
+            next_tick += self.period
+            self._stop.wait(max(next_tick - time.perf_counter(), 0))
+
+        # the last sample is written before the cycle closes
+        if pending is not None:
+            try:
+                pending.result()
+            except OSError:
+                pass
+
+    def _sample(self, connection) -> None:
+        """
+        Read every channel and write a record, meant to run on the thread owning the connection.
+
+        :param connection: robot connection
+        """
+        count = self._info["count"]
+        if count >= self.capacity:
+            self._info["dropped"] += 1
+            return
+
+        self._data["time"][count] = time.time()
+        self._data["task"][count], self._data["operation"][count] = self.tag()
+        for channel in self.channels:
+            getter, size = CHANNELS[channel]
+            values = getattr(connection, getter)()
+            if len(values) != size:
+                raise OSError(f"Could not read {channel}")
+            self._data[channel][count] = values
+        self._info["count"] = count + 1